@@ -0,0 +1,66 @@
+"""
+On-disk cache of parsed analyzer results. An entry is keyed by the analyzer, its version and the path, size and mtime
+of every input file. Re-analyzing an experiment only parses new or changed files, everything else comes from here.
+"""
+import hashlib
+import json
+import os
+import pickle
+from typing import List, Optional
+
+cache_dir = os.path.expanduser("~/issm-output/analyzer-cache")
+
+
+def file_stats(path: str) -> List[list]:
+    """
+    [path, size, mtime] of a file, or of every file in a directory (e.g. the Score-P experiment directory).
+    """
+    if os.path.isdir(path):
+        stats = []
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                stats.extend(file_stats(os.path.join(root, file)))
+        return sorted(stats)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return [[path, None, None]]
+    return [[path, stat.st_size, stat.st_mtime_ns]]
+
+
+class AnalysisCache:
+    """
+    One pickle file per entry. Pickle, not json: the results keep their types (int keys, tuples), as if they were
+    just parsed.
+    """
+
+    def __init__(self, directory: str = cache_dir):
+        self.directory = directory
+
+    @staticmethod
+    def key(analyzer: str, version: int, paths: List[str], salt: str = "") -> str:
+        """
+        :param analyzer: Name of the analyzer.
+        :param version: Version of the analyzer, bump it when its results change.
+        :param paths: The input files of the analyzer.
+        :param salt: Further input, that is not a file, e.g. the calibrated node peaks.
+        """
+        stats = []
+        for path in sorted(paths):
+            stats.extend(file_stats(path))
+        return hashlib.sha1(json.dumps([analyzer, version, stats, salt]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[tuple]:
+        try:
+            with open(f"{self.directory}/{key}.pickle", "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key: str, entry: tuple):
+        os.makedirs(self.directory, exist_ok=True)
+        # write and rename, a parallel analysis never reads a half written entry
+        path = f"{self.directory}/{key}.pickle"
+        with open(f"{path}.{os.getpid()}", "wb") as f:
+            pickle.dump(entry, f)
+        os.replace(f"{path}.{os.getpid()}", path)
@@ -1,10 +1,28 @@
-import copy
+import hashlib
+import json
 import os
-from typing import List, Union, Tuple, Callable
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Union, Tuple, Callable
 
 from Builder.builder import App, Resolution, Compiler
 from Analyzer.exceptions import *
+from Analyzer.analysis_cache import AnalysisCache
+from Analyzer.calibration import CalibrationCache, parse_calibration
+from Analyzer.callgrind import read_callgrind
+from Analyzer.cvr_comparator import CVRComparator
+from Analyzer.cvr_index import VectorizationIndex
+from Analyzer.gprof import parse_gprof, parse_gprof_lines
+from Analyzer.hot_loops import HotLoopCorrelator
 from Analyzer.mpi_comparator import MPIComparator
+from Analyzer.opt_remarks import read_remarks
+from Analyzer.pgo_comparator import PGOComparator
+from Analyzer.profile_diff import ProfileDiffComparator, profile_tools
+from Analyzer.roofline import Roofline, roofline_table, flop_metrics, traffic_metric
+from Analyzer.scaling_comparator import ScalingComparator
+from Analyzer.timesteps import TimestepParser
+from SLURM.accounting import parse_sacct, time_seconds
 
 default_out_dir = "/home/kurse/kurs00054/jo83xafu/issm-output/OUT"
 lichtenberg_defaults = {
@@ -20,18 +38,56 @@ lichtenberg_defaults = {
     "vector_bits": 512,
     "network": "Infiniband HDR100",
     "network_speed": 100,  # GBit/s
+    # node peaks: 96 cores * 2.3 GHz * 32 DP flop/cycle (2 AVX-512 FMA units), 2 * 12 channels DDR4-2933
+    "peak_gflops": 7065.6,  # GFlop/s, double precision
+    "peak_memory_bandwidth": 563.2,  # GB/s
 }
 
 
+def node_peaks(cpu: str = lichtenberg_defaults["cpu"]) -> dict:
+    """
+    The peaks of a node type: lichtenberg_defaults, overridden by the values of a CalibrationRun on this node type,
+    if they are not expired.
+    """
+    return CalibrationCache().peaks(cpu, lichtenberg_defaults)
+
+
 ### Helper classes ###
 
 
+def read_fingerprint(path: str) -> dict:
+    """
+    The ExperimentConfig fields of a .fingerprint file (written by Runs/fingerprint.py on the compute node).
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("config", {})
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Cannot read fingerprint {path}: {e}")
+        return {}
+
+
 class ExperimentConfig:
     """
     All Data of a run, to analyze and compare.
     This should hold every aspect that can have performance influence on the experiment.
     This should be used to compare experiments, to make sure the environment is equal, to make good comparisons.
+    Immutable value: replace() gives a changed copy. Configs with the same environment have the same hash, so they
+    can be grouped in one pass. The hash is stable over processes and python runs, environment_hash is its hex form.
     """
+    # the environment: these fields decide, if two runs are comparable
+    environment_fields = ("compiler", "mpi_num_ranks", "number_of_tasks", "number_of_cores_per_task", "nodes",
+                          "number_of_tasks_per_node", "distribution", "hint",
+                          "cpu_frequency_setting", "gcc_version", "llvm_version", "c_compiler_flags",
+                          "fortran_compiler_flags", "cxx_compiler_flags", "petsc_version", "scorep_instrumentation",
+                          "scorep_flags", "os", "os_version", "cpu", "cpu_cores", "cpu_count", "node_mem", "mem_type",
+                          "mem_frequency", "vector_type", "vector_bits", "network", "network_speed", "kernel",
+                          "numa_nodes", "cpu_governor", "cpu_max_mhz", "modules")
+    # job specific. The libraries differ between apps, only the ones both executables link are compared.
+    # The time limit and memory are predicted per job, they do not change what the job runs on.
+    job_fields = ("result_file", "job_id", "source_path", "app", "resolution", "node", "cpu_mhz", "libraries",
+                  "job_time_limit", "mem_per_cpu")
+    __slots__ = environment_fields + job_fields + ("_environment_key", "_environment_hash")
 
     def __init__(self, result_file: Union[str, None],
                  job_id: int,
@@ -52,6 +108,11 @@ class ExperimentConfig:
                  resolution: Resolution = None,
                  compiler: Compiler = None,
                  mpi_num_ranks: int = None,
+                 number_of_cores_per_task: int = None,
+                 nodes: int = None,
+                 number_of_tasks_per_node: int = None,
+                 distribution: str = None,
+                 hint: str = None,
                  os: str = lichtenberg_defaults["os"],
                  os_version: str = lichtenberg_defaults["os_version"],
                  cpu: str = lichtenberg_defaults["cpu"],
@@ -64,40 +125,60 @@ class ExperimentConfig:
                  vector_bits: int = lichtenberg_defaults["vector_bits"],
                  network: str = lichtenberg_defaults["network"],
                  network_speed: int = lichtenberg_defaults["network_speed"],  # GBit/s
+                 kernel: str = None,
+                 node: str = None,
+                 numa_nodes: int = None,
+                 cpu_governor: str = None,
+                 cpu_max_mhz: float = None,
+                 cpu_mhz: float = None,
+                 modules: List[str] = None,
+                 libraries: Dict[str, str] = None,
                  *args,  # just pipe more given stuff, to not get an error
                  **kwargs  # we do not have to use them
                  ):
-        self.result_file = result_file
-        self.job_id = job_id
-        self.source_path = source_path
-        self.app = app
-        self.resolution = resolution
-        self.compiler = compiler
-        self.mpi_num_ranks = mpi_num_ranks
-        self.job_time_limit = job_time_limit
-        self.mem_per_cpu = mem_per_cpu
-        self.number_of_tasks = number_of_tasks
-        self.cpu_frequency_setting = cpu_frequency_setting
-        self.gcc_version = gcc_version
-        self.llvm_version = llvm_version
-        self.c_compiler_flags = c_compiler_flags
-        self.fortran_compiler_flags = fortran_compiler_flags
-        self.cxx_compiler_flags = cxx_compiler_flags
-        self.petsc_version = petsc_version
-        self.scorep_instrumentation = scorep_instrumentation
-        self.scorep_flags = scorep_flags
-        self.os = os
-        self.os_version = os_version
-        self.cpu = cpu
-        self.cpu_cores = cpu_cores
-        self.cpu_count = cpu_count
-        self.node_mem = node_mem
-        self.mem_type = mem_type
-        self.mem_frequency = mem_frequency
-        self.vector_type = vector_type
-        self.vector_bits = vector_bits
-        self.network = network
-        self.network_speed = network_speed
+        arguments = locals()
+        for name in ExperimentConfig.environment_fields + ExperimentConfig.job_fields:
+            value = arguments[name]
+            if name == "modules" and value is not None:
+                # the load order does not matter
+                value = tuple(sorted(value))
+            elif name == "libraries" and value is not None:
+                value = tuple(sorted(dict(value).items()))
+            object.__setattr__(self, name, value)
+        self.__freeze()
+
+    def __freeze(self):
+        key = tuple(getattr(self, name) for name in ExperimentConfig.environment_fields)
+        object.__setattr__(self, "_environment_key", key)
+        digest = hashlib.sha1(json.dumps(key, default=str).encode("utf-8")).hexdigest()[:16]
+        object.__setattr__(self, "_environment_hash", digest)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"ExperimentConfig is immutable, use replace({name}=...).")
+
+    def __delattr__(self, name):
+        raise AttributeError("ExperimentConfig is immutable.")
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in ExperimentConfig.environment_fields + ExperimentConfig.job_fields}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        self.__freeze()
+
+    def replace(self, **changes) -> "ExperimentConfig":
+        """
+        A copy with the given fields changed.
+        """
+        fields = self.__getstate__()
+        fields["libraries"] = dict(self.libraries) if self.libraries is not None else None
+        fields.update(changes)
+        return ExperimentConfig(**fields)
+
+    @property
+    def environment_hash(self) -> str:
+        return self._environment_hash
 
     def is_comparable(self, other):
         """
@@ -106,66 +187,23 @@ class ExperimentConfig:
         USE WITH CARE!!
         There may be cases where it is useful to have other "equal" definitions. They must be implemented on their own.
         """
-        return \
-            self.compiler == other.compiler and \
-            self.mpi_num_ranks == other.mpi_num_ranks and \
-            self.job_time_limit == other.job_time_limit and \
-            self.mem_per_cpu == other.mem_per_cpu and \
-            self.number_of_tasks == other.number_of_tasks and \
-            self.cpu_frequency_setting == other.cpu_frequency_setting and \
-            self.gcc_version == other.gcc_version and \
-            self.llvm_version == other.llvm_version and \
-            self.c_compiler_flags == other.c_compiler_flags and \
-            self.fortran_compiler_flags == other.fortran_compiler_flags and \
-            self.cxx_compiler_flags == other.cxx_compiler_flags and \
-            self.petsc_version == other.petsc_version and \
-            self.scorep_instrumentation == other.scorep_instrumentation and \
-            self.scorep_flags == other.scorep_flags and \
-            self.os == other.os and \
-            self.os_version == other.os_version and \
-            self.cpu == other.cpu and \
-            self.cpu_cores == other.cpu_cores and \
-            self.cpu_count == other.cpu_count and \
-            self.node_mem == other.node_mem and \
-            self.mem_type == other.mem_type and \
-            self.mem_frequency == other.mem_frequency and \
-            self.vector_type == other.vector_type and \
-            self.vector_bits == other.vector_bits and \
-            self.network == other.network and \
-            self.network_speed == other.network_speed
+        return self._environment_key == other._environment_key and self.same_libraries(other)
+
+    def same_libraries(self, other) -> bool:
+        """
+        Libraries both executables link resolve to the same files. Different apps link different libraries,
+        only the common ones are compared.
+        """
+        mine, theirs = dict(self.libraries or ()), dict(other.libraries or ())
+        return all(mine[name] == theirs[name] for name in mine.keys() & theirs.keys())
 
     def as_dict(self, env=True):
         """
         env: Output stuff about environment, not job-specific stuff.
         """
-        res = {
-            "compiler": self.compiler,
-            "mpi_num_ranks": self.mpi_num_ranks,
-            "job_time_limit": self.job_time_limit,
-            "mem_per_cpu": self.mem_per_cpu,
-            "number_of_tasks": self.number_of_tasks,
-            "cpu_frequency_setting": self.cpu_frequency_setting,
-            "gcc_version": self.gcc_version,
-            "llvm_version": self.llvm_version,
-            "c_compiler_flags": self.c_compiler_flags,
-            "fortran_compiler_flags": self.fortran_compiler_flags,
-            "cxx_compiler_flags": self.cxx_compiler_flags,
-            "petsc_version": self.petsc_version,
-            "scorep_instrumentation": self.scorep_instrumentation,
-            "scorep_flags": self.scorep_flags,
-            "os": self.os,
-            "os_version": self.os_version,
-            "cpu": self.cpu,
-            "cpu_cores": self.cpu_cores,
-            "cpu_count": self.cpu_count,
-            "node_mem": self.node_mem,
-            "mem_type": self.mem_type,
-            "mem_frequency": self.mem_frequency,
-            "vector_type": self.vector_type,
-            "vector_bits": self.vector_bits,
-            "network": self.network,
-            "network_speed": self.network_speed
-        }
+        res = {name: getattr(self, name) for name in ExperimentConfig.environment_fields}
+        res["modules"] = list(self.modules) if self.modules is not None else None
+        res["libraries"] = dict(self.libraries) if self.libraries is not None else None
         if env:
             return res
         else:
@@ -175,6 +213,11 @@ class ExperimentConfig:
                 "source_path": self.source_path,
                 "app": self.app,
                 "model": self.resolution,
+                # differ from node to node and over time, job specific
+                "node": self.node,
+                "cpu_mhz": self.cpu_mhz,
+                "job_time_limit": self.job_time_limit,
+                "mem_per_cpu": self.mem_per_cpu,
             })
             return res
 
@@ -182,8 +225,14 @@ class ExperimentConfig:
         """
         Override equality with is_comparable.
         """
+        if not isinstance(other, ExperimentConfig):
+            return NotImplemented
         return self.is_comparable(other)
 
+    def __hash__(self):
+        # equal configs have equal environments, so equal hashes
+        return int(self._environment_hash, 16)
+
 
 class _FlatProfileEntry:
     """
@@ -244,14 +293,52 @@ class _CallGraphNode:
 ### Result Analyzer ###
 
 
+def _configs_of(files: dict) -> List[ExperimentConfig]:
+    """
+    The configs of the input files of an analyzer, flat. Lists of per rank files, like the gmon files of GProf or
+    the massif files, are part of it, so the cache key changes with every rank file.
+    """
+    configs = []
+    for value in files.values():
+        if isinstance(value, list):
+            configs.extend(value)
+        elif isinstance(value, ExperimentConfig):
+            configs.append(value)
+    return configs
+
+
+def _run_analyzer(analyzer, job_id: str, files: dict) -> Tuple[dict, dict]:
+    """
+    Runs one analyzer on the files of one job, in a worker process.
+    :return: The analyzed files by name, and the results.
+    """
+    # job steps of a batch allocation have ids like 1234.2, no int
+    _, configs, results = analyzer(job_id, **files).analyze()
+    return {name: cnf.result_file for name, cnf in configs.items()}, results
+
+
 class ResultAnalyzer:
     """
     Looks at all output files and calls the matching analyzers.
     """
 
     def __init__(self, experiments: List[Tuple[str, dict, dict]], out_dir: str = default_out_dir, config_equal_f:
-                 Callable[[ExperimentConfig, ExperimentConfig], bool] = None):
+                 Callable[[ExperimentConfig, ExperimentConfig], bool] = None, workers: int = None,
+                 cache: Union[AnalysisCache, None, bool] = None, steady_state_only: bool = False):
+        """
+        Constructor.
+        :param workers: Processes for the per job analyzers. Default: all cores. 1 runs them in this process.
+        :param cache: Cache of parsed results. Default: None, an AnalysisCache in its default directory. False parses
+        everything again.
+        :param steady_state_only: Average the element times and loop iterations of the std out files over the
+        steady-state steps only, without the warm-up steps.
+        """
         self.out_dir = out_dir
+        self.steady_state_only = steady_state_only
+        self.workers = workers if workers else os.cpu_count()
+        if cache is None:
+            cache = AnalysisCache()
+        self.cache = cache if cache is not False else None
         # tuple of: the out path, the build config, the job config
         self.experiments = experiments
         # callable for config comparison
@@ -268,184 +355,379 @@ class ResultAnalyzer:
             # opt
             # miss
             # all
+            # opt_yaml
         }
         self.callgrind_files = {
             # callgrind_out
         }
+        self.massif_files = {
+            # massif_outs
+        }
+        self.sampler_files = {
+            # samples
+        }
+        self.petsc_files = {
+            # petsc_log
+        }
+        self.scorep_files = {
+            # scorep_dir
+        }
+        self.calibration_files = {
+            # calibration
+        }
         self.mpi_compare = {
             # dict of MPI-NUM: results of std-out
         }
+        self.job_tools = {
+            # dict of job id: tool of the job
+        }
+        # configs of all result files
+        self.configs = []
+        # jobs, whose analyzers already ran
+        self.analyzed_jobs = set()
 
-        self.results = {}
+        self.results = {"environment": {}, "jobs": {}, "results": {}}
 
-    def analyze(self):
+    def environment_classes(self, configs: List[ExperimentConfig]) -> List[List[ExperimentConfig]]:
         """
-        Analyze all results for the given experiments.
+        Groups the configs into classes of comparable environments, in order of appearance. By hash in one pass,
+        with a config_equal_f by comparing with the first config of every class.
         """
-        # evaluate the files for configs
-        for experiment, build_config, slurm_config in self.experiments:
-            print(experiment)
-            print(build_config)
-            print(slurm_config)
-            exp_dir = f"{experiment}"
+        if not self.config_equal_f:
+            classes = {}
+            for config in configs:
+                classes.setdefault(config.environment_hash, []).append(config)
+            return list(classes.values())
+        classes = []
+        for config in configs:
+            for members in classes:
+                if self.config_equal_f(members[0], config):
+                    members.append(config)
+                    break
+            else:
+                classes.append([config])
+        return classes
+
+    def environment_report(self, configs: List[ExperimentConfig]) -> dict:
+        """
+        The environment classes with their jobs, and the fields that differ between the classes.
+        """
+        classes = self.environment_classes(configs)
+        environments = [members[0].as_dict() for members in classes]
+        differing = [name for name in environments[0] if any(env[name] != environments[0][name]
+                                                             for env in environments[1:])] if environments else []
+        report = {"classes": [], "differing_fields": differing}
+        all_equal = len(classes) <= 1
+        for members, environment in zip(classes, environments):
+            # the classes ignore the libraries, apps link different ones. A library both apps link has to match.
+            libraries = {}
+            for config in members:
+                for name, path in config.libraries or ():
+                    libraries.setdefault(name, set()).add(path)
+            conflicts = {name: sorted(paths) for name, paths in libraries.items() if len(paths) > 1}
+            if conflicts and not self.config_equal_f:
+                all_equal = False
+            report["classes"].append({
+                "hash": members[0].environment_hash,
+                "jobs": sorted({f"{config.job_id}" for config in members}),
+                "files": len(members),
+                "environment": {name: environment[name] for name in differing},
+                "library_conflicts": conflicts,
+            })
+        report["is_static"] = all_equal
+        if all_equal:
+            # only add environment if its static
+            report["static_environment"] = environments[0] if environments else None
+        return report
+
+    def run_analyzers(self, tasks: List[Tuple[type, str, dict]]) -> List[Tuple[str, dict, dict]]:
+        """
+        Runs the analyzers, one task per job and analyzer, in a process pool. Tasks, whose input files did not
+        change since an earlier analysis, are taken from the cache.
+        :param tasks: (analyzer class, job id, input files as keyword arguments of the analyzer).
+        :return: (job id, configs, results) per task, in task order.
+        """
+        done = [None] * len(tasks)
+        keys = {}
+        pending = []
+        for i, (analyzer, job_id, files) in enumerate(tasks):
+            if self.cache is not None and analyzer.cacheable:
+                keys[i] = self.cache.key(analyzer.__name__, analyzer.version, [c.result_file for c in _configs_of(files)],
+                                         analyzer.cache_salt(**files))
+                done[i] = self.cache.get(keys[i])
+            if done[i] is None:
+                pending.append(i)
+        if tasks:
+            print(f"Analyzing {len(pending)} of {len(tasks)} tasks, the others are cached.")
+        if self.workers == 1:
+            for i in pending:
+                done[i] = _run_analyzer(*tasks[i])
+        elif pending:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {i: pool.submit(_run_analyzer, *tasks[i]) for i in pending}
+                for i, future in futures.items():
+                    done[i] = future.result()
+        analyzed = []
+        for i, ((analyzer, job_id, files), (result_files, results)) in enumerate(zip(tasks, done)):
+            if i in keys and i in pending:
+                self.cache.put(keys[i], (result_files, results))
+            # the configs of this analysis, not the ones of the cached one
+            by_path = {cnf.result_file: cnf for cnf in _configs_of(files)}
+            analyzed.append((job_id, {name: by_path[path] for name, path in result_files.items()}, results))
+        return analyzed
+
+    def collect(self, experiment: str, build_config: dict, slurm_config: dict) -> Union[str, None]:
+        """
+        Evaluates the files of one job for their configs, and files them under their analyzers.
+        :return: The job id, None if the job did not finish its cleanup yet.
+        """
+        print(experiment)
+        print(build_config)
+        print(slurm_config)
+        exp_dir = f"{experiment}"
+        try:
+            experiment, job_id = experiment.split(".", 1)
+        except ValueError as e:
+            # in case a run has no job ID in folder name,
+            # this run has not done its cleanup yet, so is still running, or broken.
+            # therefore ignore this folder.
+            return None
+        files = os.listdir(exp_dir)
+        # what the job actually ran on, instead of the lichtenberg_defaults
+        fingerprint = {}
+        for file in files:
+            if file.split(".")[1:2] == ["fingerprint"]:
+                fingerprint = read_fingerprint(f"{exp_dir}/{file}")
+        exp_config = ExperimentConfig(result_file=None, job_id=job_id,
+                                      **{**build_config, **slurm_config, **fingerprint})
+        for file in files:
+            print(file)
+            file_path = f"{exp_dir}/{file}"
+            # split naming scheme
+            # Job name konvention: APP_RESOLUTION_COMPILER_MPI<NUM>[_TOOL/VANILLA][.fileextension][.job_id]
+            name, extension = file.split(".", 1)
+            file_job_id = None
             try:
-                experiment, job_id = experiment.split(".", 1)
+                extension, file_job_id = extension.split(".", 1)
             except ValueError as e:
-                # in case a run has no job ID in folder name,
-                # this run has not done its cleanup yet, so is still running, or broken.
-                # therefore ignore this folder.
-                break
-            exp_config = ExperimentConfig(result_file=None, job_id=job_id, **build_config, **slurm_config)
-            files = os.listdir(exp_dir)
-            for file in files:
-                print(file)
-                file_path = f"{exp_dir}/{file}"
-                this_file_exp_config = copy.deepcopy(exp_config)
-                this_file_exp_config.result_file = file_path
-                # split naming scheme
-                # Job name konvention: APP_RESOLUTION_COMPILER_MPI<NUM>[_TOOL/VANILLA][.fileextension][.job_id]
-                name, extension = file.split(".", 1)
-                file_job_id = None
-                try:
-                    extension, file_job_id = extension.split(".", 1)
-                except ValueError as e:
-                    pass
-                opts = name.split("_")
-                app_name, resolution, compiler, mpi, tool = opts[0], opts[1], opts[2], opts[3], opts[4]
-                # update this info to the config:
-                this_file_exp_config.app = App.get(app_name)
-                this_file_exp_config.resolution = Resolution.get(resolution)
-                this_file_exp_config.compiler = Compiler.get(compiler)
-                this_file_exp_config.mpi_num_ranks = int(mpi[3:])
-                print(this_file_exp_config.result_file)
-                if len(opts) > 5:
-                    raise NamingSchemeException(f"Too many items in file name: {file}")
-                if file_job_id:
-                    print(extension)
-                    # job std files
-                    if job_id not in self.std_files:
-                        self.std_files[job_id] = {}
-                    if extension == "out":
-                        if "VALGRIND" in tool:  # valgrind has different out files
-                            continue
-                        print(this_file_exp_config.result_file)
-                        self.std_files[job_id]["out"] = this_file_exp_config
-                        # add file to mpi compare for later mpi compare
-                        if tool == "MPI-COMPARE":
-                            self.mpi_compare.update({this_file_exp_config.mpi_num_ranks: None})
-                    elif extension == "err":
-                        if "VALGRIND" in tool:  # valgrind has different out files
-                            continue
-                        self.std_files[job_id]["err"] = this_file_exp_config
-                    elif extension == "job":
-                        # This is the jobfile. Not of interest here
+                pass
+            opts = name.split("_")
+            app_name, resolution, compiler, mpi, tool = opts[0], opts[1], opts[2], opts[3], opts[4]
+            # update this info to the config:
+            this_file_exp_config = exp_config.replace(result_file=file_path,
+                                                      app=App.get(app_name),
+                                                      resolution=Resolution.get(resolution),
+                                                      compiler=Compiler.get(compiler),
+                                                      mpi_num_ranks=int(mpi[3:]))
+            print(this_file_exp_config.result_file)
+            if len(opts) > 5:
+                raise NamingSchemeException(f"Too many items in file name: {file}")
+            self.job_tools[job_id] = tool
+            if extension == "samples":
+                # node samples, can be there for every tool
+                self.sampler_files[job_id] = {"samples": this_file_exp_config}
+            elif extension == "fingerprint":
+                # already in the config of every file of the job
+                continue
+            elif extension == "petsc-log":
+                # PETSc log view, can be there for every tool
+                self.petsc_files[job_id] = {"petsc_log": this_file_exp_config}
+            elif file_job_id:
+                print(extension)
+                # job std files
+                if job_id not in self.std_files:
+                    self.std_files[job_id] = {}
+                if extension == "out":
+                    if "VALGRIND" in tool:  # valgrind has different out files
+                        continue
+                    print(this_file_exp_config.result_file)
+                    self.std_files[job_id]["out"] = this_file_exp_config
+                    # add file to mpi compare for later mpi compare
+                    if tool == "MPI-COMPARE":
+                        self.mpi_compare.update({this_file_exp_config.mpi_num_ranks: None})
+                elif extension == "err":
+                    if "VALGRIND" in tool:  # valgrind has different out files
                         continue
-                elif tool == "COMPILER-VEC-REPORT":
-                    # CVR
-                    if job_id not in self.cvr_files:
-                        self.cvr_files[job_id] = {}
-                    if extension == "all":
-                        self.cvr_files[job_id]["all"] = this_file_exp_config
-                    elif extension == "opt":
-                        self.cvr_files[job_id]["opt"] = this_file_exp_config
-                    elif extension == "miss":
-                        self.cvr_files[job_id]["miss"] = this_file_exp_config
-                elif tool == "GPROF" and extension == "profile":
-                    # gprof
-                    if job_id not in self.gprof_files:
-                        self.gprof_files[job_id] = {}
-                    self.gprof_files[job_id]["profile"] = this_file_exp_config
-                elif tool == "VALGRIND-CALLGRIND":
-                    if job_id not in self.callgrind_files:
-                        self.callgrind_files[job_id] = {}
-                    if extension == "callgrind-out":
-                        self.callgrind_files[job_id]["callgrind_out"] = this_file_exp_config
-                    elif extension == "callgrind-vgcore":
-                        self.callgrind_files[job_id]["callgrind_vgcore"] = this_file_exp_config
-                elif tool == "VANILLA":
-                    pass
-                else:
+                    self.std_files[job_id]["err"] = this_file_exp_config
+                elif extension == "job":
+                    # This is the jobfile. Not of interest here
                     continue
-                del this_file_exp_config
-        # start the specific analyzers
-        all_configs = []
-        all_equal = True
-        if self.std_files is not {}:
-            for job_id in self.std_files.keys():
-                for config in self.std_files[job_id].values():
-                    all_configs.append(config)
-        if self.gprof_files is not {}:
-            for job_id in self.gprof_files.keys():
-                for config in self.gprof_files[job_id].values():
-                    all_configs.append(config)
-        if self.cvr_files is not {}:
-            for job_id in self.cvr_files.keys():
-                for config in self.cvr_files[job_id].values():
-                    all_configs.append(config)
-        if self.callgrind_files is not {}:
-            for job_id in self.callgrind_files.keys():
-                for config in self.callgrind_files[job_id].values():
-                    all_configs.append(config)
-        for i in range(len(all_configs) - 1):
-            if self.config_equal_f:
-                if not self.config_equal_f(all_configs[i], all_configs[i + 1]):
-                    all_equal = False
+                elif extension == "cancel":
+                    # the watchdog cancelled the job
+                    self.std_files[job_id]["cancel"] = this_file_exp_config
+                elif extension == "sacct":
+                    # SLURM accounting: elapsed time and peak memory
+                    self.std_files[job_id]["sacct"] = this_file_exp_config
+                elif extension == "step":
+                    # start, end and exit code of a run in a batch allocation
+                    self.std_files[job_id]["step"] = this_file_exp_config
+            elif tool == "COMPILER-VEC-REPORT":
+                # CVR
+                if job_id not in self.cvr_files:
+                    self.cvr_files[job_id] = {}
+                if extension == "all":
+                    self.cvr_files[job_id]["all"] = this_file_exp_config
+                elif extension == "opt":
+                    self.cvr_files[job_id]["opt"] = this_file_exp_config
+                elif extension == "miss":
+                    self.cvr_files[job_id]["miss"] = this_file_exp_config
+                elif extension == "opt-yaml":
+                    self.cvr_files[job_id]["opt_yaml"] = this_file_exp_config
+            elif tool == "GPROF" and extension == "profile":
+                # gprof
+                if job_id not in self.gprof_files:
+                    self.gprof_files[job_id] = {}
+                self.gprof_files[job_id]["profile"] = this_file_exp_config
+            elif tool == "GPROF" and extension == "symbols":
+                if job_id not in self.gprof_files:
+                    self.gprof_files[job_id] = {}
+                self.gprof_files[job_id]["symbols"] = this_file_exp_config
+            elif tool == "GPROF" and extension == "exe":
+                if job_id not in self.gprof_files:
+                    self.gprof_files[job_id] = {}
+                self.gprof_files[job_id]["executable"] = this_file_exp_config
+            elif tool == "GPROF" and extension.startswith("gmon-"):
+                # one gmon file per rank
+                if job_id not in self.gprof_files:
+                    self.gprof_files[job_id] = {}
+                self.gprof_files[job_id].setdefault("gmon_outs", []).append(this_file_exp_config)
+            elif tool == "VALGRIND-CALLGRIND":
+                if job_id not in self.callgrind_files:
+                    self.callgrind_files[job_id] = {}
+                if extension == "callgrind-out":
+                    self.callgrind_files[job_id]["callgrind_out"] = this_file_exp_config
+                elif extension == "callgrind-vgcore":
+                    self.callgrind_files[job_id]["callgrind_vgcore"] = this_file_exp_config
+            elif tool == "VALGRIND-MASSIF" and extension.startswith("massif-out"):
+                # one massif file per profiled rank
+                if job_id not in self.massif_files:
+                    self.massif_files[job_id] = {"massif_outs": []}
+                self.massif_files[job_id]["massif_outs"].append(this_file_exp_config)
+            elif tool == "SCORE-P" and extension.startswith("scorep"):
+                # the Score-P experiment directory
+                self.scorep_files[job_id] = {"scorep_dir": this_file_exp_config}
+            elif tool == "CALIBRATION" and extension == "calibration":
+                self.calibration_files[job_id] = {"calibration": this_file_exp_config}
+            elif tool == "VANILLA":
+                pass
             else:
-                if not all_configs[i].is_comparable(all_configs[i + 1]):
-                    all_equal = False
-        self.results["environment"] = {}
-        self.results["environment"]["is_static"] = all_equal
-        if all_equal:
-            # only add environment if its static
-            try:
-                self.results["environment"]["static_environment"] = all_configs[0].as_dict()
-            except IndexError:
-                self.results["environment"]["static_environment"] = None
-        self.results["jobs"] = {}
-        self.results["results"] = {}
+                continue
+            self.configs.append(this_file_exp_config)
+        return job_id
+
+    def analyze_jobs(self, job_ids: List[str] = None) -> dict:
+        """
+        The per job stage: runs the analyzers of the given jobs (default: all collected ones, that are not
+        analyzed yet) and merges their results.
+        :return: The results of these jobs, by job id.
+        """
+        if job_ids is None:
+            job_ids = [job_id for job_id in self.job_tools.keys() if job_id not in self.analyzed_jobs]
+        job_ids = set(job_ids)
+        self.analyzed_jobs.update(job_ids)
+
+        def tasks_of(analyzer, files_per_job):
+            return [(analyzer, job_id, files) for job_id, files in files_per_job.items() if job_id in job_ids]
+
+        # calibrations first, the analyzers of the other jobs use the measured peaks
+        tasks = tasks_of(CalibrationAnalyzer, self.calibration_files)
+        analyzed = self.run_analyzers(tasks)
+        other_tasks = tasks_of(StdFileAnalyzer, {job_id: dict(files, steady_state_only=self.steady_state_only)
+                                                 for job_id, files in self.std_files.items()})
+        other_tasks += tasks_of(GProfAnalyzer, self.gprof_files)
+        other_tasks += tasks_of(CompilerVectorizationReportAnalyzer, self.cvr_files)
+        other_tasks += tasks_of(CallgrindAnalyzer, self.callgrind_files)
+        other_tasks += tasks_of(SamplerAnalyzer, {job_id: dict(files, out=self.std_files.get(job_id, {}).get("out"))
+                                                  for job_id, files in self.sampler_files.items()})
+        other_tasks += tasks_of(PETScLogViewAnalyzer, self.petsc_files)
+        other_tasks += tasks_of(MassifAnalyzer, self.massif_files)
+        other_tasks += tasks_of(ScorePAnalyzer, self.scorep_files)
+        tasks += other_tasks
+        analyzed += self.run_analyzers(other_tasks)
         # TODO compare result data?
-        if self.std_files is not {}:
-            for job_id in self.std_files.keys():
-                std_analyzer = StdFileAnalyzer(int(job_id), **self.std_files[job_id])
-                job_id, configs, results = std_analyzer.analyze()
-                self.results["jobs"][f"{job_id}"] = {"analyzed": [], "settings": {}}
-                for name, cnf in configs.items():
-                    self.results["jobs"][f"{job_id}"]["analyzed"].append({f"{name}": cnf.result_file})
-                    self.results["jobs"][f"{job_id}"]["settings"].update(cnf.as_dict(env=False))
-                    # update results to mpi compare
-                    if cnf.mpi_num_ranks in self.mpi_compare:
-                        self.mpi_compare[cnf.mpi_num_ranks] = results
-                self.results["results"][f"{job_id}"] = {}
-                self.results["results"][f"{job_id}"].update(results)
-            # run mpi comparator
-            if self.mpi_compare != {}:
-                comparator = MPIComparator(self.mpi_compare)
-                self.results["results"].update(comparator.analyze())
-        if self.gprof_files is not {}:
-            for job_id in self.gprof_files.keys():
-                gprof_analyzer = GProfAnalyzer(int(job_id), **self.gprof_files[job_id])
-                job_id, configs, results = gprof_analyzer.analyze()
-                self.results["jobs"][f"{job_id}"]["analyzed"].append({f"profile": configs['profile'].result_file})
-                self.results["results"][f"{job_id}"].update(results)
-        if self.cvr_files is not {}:
-            for job_id in self.cvr_files.keys():
-                cvr_analyzer = CompilerVectorizationReportAnalyzer(int(job_id), **self.cvr_files[job_id])
-                job_id, configs, results = cvr_analyzer.analyze()
-                for name, cnf in configs.items():
-                    self.results["jobs"][f"{job_id}"]["analyzed"].append({f"{name}": cnf.result_file})
-                self.results["results"][f"{job_id}"].update(results)
-        if self.callgrind_files is not {}:
-            for job_id in self.callgrind_files.keys():
-                callgrind_analyzer = CallgrindAnalyzer(int(job_id), **self.callgrind_files[job_id])
-                job_id, configs, results = callgrind_analyzer.analyze()
-                if type(self.results["jobs"][f"{job_id}"]) != dict:
-                    self.results["jobs"][f"{job_id}"] = {"analyzed": [], "settings": {}}
-                if type(self.results["results"][f"{job_id}"]) != dict:
-                    self.results["results"][f"{job_id}"] = {}
+        for (analyzer, _, _), (job_id, configs, results) in zip(tasks, analyzed):
+            self.results["jobs"].setdefault(f"{job_id}", {"analyzed": [], "settings": {}})
+            self.results["results"].setdefault(f"{job_id}", {})
+            for name, cnf in configs.items():
                 if self.results["jobs"][f"{job_id}"]["settings"] == {}:
-                    self.results["jobs"][f"{job_id}"]["settings"].update(configs["callgrind_out"].as_dict(env=False))
-                self.results["jobs"][f"{job_id}"]["analyzed"].append({f"callgrind_out": configs['callgrind_out'].result_file})
-                self.results["results"][f"{job_id}"].update(results)
+                    self.results["jobs"][f"{job_id}"]["settings"].update(cnf.as_dict(env=False))
+                self.results["jobs"][f"{job_id}"]["analyzed"].append({f"{name}": cnf.result_file})
+                # update results to mpi compare
+                if analyzer is StdFileAnalyzer and cnf.mpi_num_ranks in self.mpi_compare:
+                    self.mpi_compare[cnf.mpi_num_ranks] = results
+            self.results["results"][f"{job_id}"].update(results)
+        for job_id in job_ids:
+            if f"{job_id}" in self.results["jobs"]:
+                self.results["jobs"][f"{job_id}"]["tool"] = self.job_tools[job_id]
+        return {f"{job_id}": self.results["results"][f"{job_id}"] for job_id in job_ids
+                if f"{job_id}" in self.results["results"]}
+
+    def compare(self):
+        """
+        The cross job stage: environment classes and the comparators, on the results of all analyzed jobs.
+        """
+        self.results["environment"] = self.environment_report(self.configs)
+        # run mpi comparator
+        if self.mpi_compare != {}:
+            comparator = MPIComparator(self.mpi_compare)
+            self.results["results"].update(comparator.analyze())
+        # GCC vs. LLVM vectorization of the same loops
+        if "COMPILER-VEC-REPORT" in self.job_tools.values():
+            comparator = CVRComparator(self.results["jobs"], self.results["results"])
+            self.results["results"].update(comparator.analyze())
+            # which of the loops consume the time
+            if {"VALGRIND-CALLGRIND", "GPROF"} & set(self.job_tools.values()):
+                correlator = HotLoopCorrelator(self.results["jobs"], self.results["results"])
+                self.results["results"].update(correlator.analyze())
+        # which functions got faster between app variants
+        if set(profile_tools) & set(self.job_tools.values()):
+            comparator = ProfileDiffComparator(self.results["jobs"], self.results["results"])
+            self.results["results"].update(comparator.analyze())
+        # run pgo comparator
+        if "PGO" in self.job_tools.values():
+            comparator = PGOComparator(self.results["jobs"], self.results["results"])
+            self.results["results"].update(comparator.analyze())
+        # inter-node scaling with the communication share
+        if set(ScalingComparator.tools) & set(self.job_tools.values()):
+            comparator = ScalingComparator(self.results["jobs"], self.results["results"])
+            self.results["results"].update(comparator.analyze())
+        return self.results
+
+    def add_experiment(self, experiment: Tuple[str, dict, dict]) -> dict:
+        """
+        Streaming: collects and analyzes one job, as soon as it finished its cleanup. compare() does the cross job
+        stage, when all jobs are there.
+        :param experiment: The out path, the build config and the job config, as returned by Run.do_run().
+        :return: The results of the job, by job id.
+        """
+        self.experiments.append(experiment)
+        job_id = self.collect(*experiment)
+        if job_id is None:
+            return {}
+        return self.analyze_jobs([job_id])
+
+    @staticmethod
+    def job_errors(job_results: dict) -> List[Tuple[str, str, str]]:
+        """
+        (job id, analyzer result, message) of every result with an error, e.g. ISSM did not run.
+        """
+        errors = []
+        for job_id, results in job_results.items():
+            if results.get("error"):
+                errors.append((job_id, "std", results.get("message")))
+            for name, result in results.items():
+                if isinstance(result, dict) and result.get("error"):
+                    errors.append((job_id, name, result.get("message")))
+        return errors
+
+    def analyze(self):
+        """
+        Analyze all results for the given experiments.
+        """
+        for experiment, build_config, slurm_config in self.experiments:
+            self.collect(experiment, build_config, slurm_config)
+        self.analyze_jobs()
+        self.compare()
         print(self.results)
         return self.results
 
@@ -458,9 +740,21 @@ class BaseAnalyzer:
     If you want to enable some functionality for all specific Analyzers, put it here.
     """
 
+    # bump the version, if the results of an analyzer change, cached results of older versions are not used
+    version = 1
+    # analyzers with side effects, or that are cheap, are not cached
+    cacheable = True
+
     def __init__(self, job_id: int):
         self.job_id = job_id
 
+    @staticmethod
+    def cache_salt(**files) -> str:
+        """
+        Input of the analyzer, that is not in its files, for the cache key.
+        """
+        return ""
+
     def analyze(self):
         pass
 
@@ -473,74 +767,98 @@ class StdFileAnalyzer(BaseAnalyzer):
     Analyzer for out and err file.
     """
 
-    def __init__(self, job_id: int, out: ExperimentConfig = None, err: ExperimentConfig = None):
+    def __init__(self, job_id: int, out: ExperimentConfig = None, err: ExperimentConfig = None,
+                 cancel: ExperimentConfig = None, sacct: ExperimentConfig = None, step: ExperimentConfig = None,
+                 steady_state_only: bool = False):
         """
         Constructor.
+        :param cancel: The reason, why the watchdog cancelled the job.
+        :param sacct: The sacct output of the job, written in the cleanup.
+        :param step: Start, end and exit code of the job step, for runs in a batch allocation.
+        :param steady_state_only: Compute the averages over the steady-state steps only, without the warm-up steps.
         """
         super().__init__(job_id)
         self.out_cnf = out
         self.err_cnf = err
+        self.cancel_cnf = cancel
+        self.sacct_cnf = sacct
+        self.step_cnf = step
+        self.steady_state_only = steady_state_only
         # results
         self.model_elements_avg = None
         self.model_loops_avg = None
         self.calculation_time = None
         self.setup_time = None
         self.total_time = None
+        self.timesteps = None
+
+    @staticmethod
+    def cache_salt(steady_state_only: bool = False, **kwargs) -> str:
+        return "steady_state_only" if steady_state_only else ""
+
+    @staticmethod
+    def _read_total_time(line):
+        """
+        Reads the total time line into a hh:mm:ss string.
+        """
+        # : 0 hrs 0 min 47 sec
+        hours = line.split(":")[1].split(" hrs ")
+        hours, rest = int(hours[0]), hours[1]
+        minutes = rest.split(" min ")
+        minutes, rest = int(minutes[0]), minutes[1]
+        seconds = int(rest.split(" sec")[0])
+        if len(str(hours)) == 1:
+            hours = f"0{hours}"
+        if len(str(minutes)) == 1:
+            minutes = f"0{minutes}"
+        if len(str(seconds)) == 1:
+            seconds = f"0{seconds}"
+        return f"{hours}:{minutes}:{seconds}"
+
+    def _average(self, parser: TimestepParser, name: str):
+        """
+        Mean of the element time or loop iterations per line, over every line or over the steady-state steps.
+        """
+        if self.steady_state_only:
+            return parser.series.steady_state_line_mean(name)
+        return parser.line_mean(name)
 
     def read_out_file(self, path):
         """
-        Reads the std_out file.
+        Reads the std_out file. The file is streamed, only the last lines are kept for the calculation time.
         """
+        parser = TimestepParser()
+        last_lines = deque(maxlen=3)
         with open(path, "r") as f:
-            lines = f.readlines()
-            # if job broke, there will just be the three std lines from the generator (plus maybe time output)
-            if len(lines) <= 4:
-                return False
-            try:
-                self.calculation_time = float(lines[-3].split(":", 1)[1][1:-1])
-            except Exception:
-                return False
-            model_elm_sum = 0.0
-            model_elm_cnt = 0.0
-            model_loop_sum = 0.0
-            model_loop_cnt = 0.0
-            for line in lines:
-                if line.startswith("FemModel"):
-                    model_elm_sum += float(line.split(",", 1)[0][18:-9])
-                    model_elm_cnt += 1
-                elif line.startswith(" -->"):
-                    model_loop_sum += float(line[12:-6])
-                    model_loop_cnt += 1
-                elif line.startswith("   FemModel initialization elapsed time"):
+            for line in f:
+                parser.feed(line)
+                last_lines.append(line)
+                if line.startswith("   FemModel initialization elapsed time"):
                     self.setup_time = float(line.split(":")[1][3:-1])
                 elif line.startswith("   Total elapsed time"):
-                    # : 0 hrs 0 min 47 sec
-                    hours = line.split(":")[1].split(" hrs ")
-                    hours, rest = int(hours[0]), hours[1]
-                    minutes = rest.split(" min ")
-                    minutes, rest = int(minutes[0]), minutes[1]
-                    seconds = int(rest.split(" sec")[0])
-                    if len(str(hours)) == 1:
-                        hours = f"0{hours}"
-                    if len(str(minutes)) == 1:
-                        minutes = f"0{minutes}"
-                    if len(str(seconds)) == 1:
-                        seconds = f"0{seconds}"
-                    self.total_time = f"{hours}:{minutes}:{seconds}"
-            self.setup_time = self.setup_time
-            self.model_elements_avg = model_elm_sum / model_elm_cnt
-            self.model_loops_avg = model_loop_sum / model_loop_cnt
+                    self.total_time = self._read_total_time(line)
+        # if job broke, there will just be the three std lines from the generator (plus maybe time output)
+        if parser.line_number <= 4:
+            return False
+        try:
+            self.calculation_time = float(last_lines[0].split(":", 1)[1][1:-1])
+        except Exception:
+            return False
+        self.timesteps = parser.series
+        self.model_elements_avg = self._average(parser, "element_time")
+        self.model_loops_avg = self._average(parser, "loop_iterations")
+        if self.model_elements_avg is None or self.model_loops_avg is None:
+            return False
         return True
 
     def read_out_file_418(self, path):
         """
         Reads the std_out file of real 4.18 issm app.
         """
+        parser = TimestepParser()
         with open(path, "r") as f:
-            lines = f.readlines()
-            if len(lines) <= 4:
-                return False
-            for line in lines:
+            for line in f:
+                parser.feed(line)
                 if line.startswith("   FemModel initialization elapsed time"):
                     self.setup_time = float(line.split(":")[1].strip())
                 elif line.startswith("   Total Core solution elapsed time"):
@@ -549,21 +867,58 @@ class StdFileAnalyzer(BaseAnalyzer):
                     except Exception:
                         self.calculation_time = None
                 elif line.startswith("   Total elapsed time"):
-                    # : 0 hrs 0 min 47 sec
-                    hours = line.split(":")[1].split(" hrs ")
-                    hours, rest = int(hours[0]), hours[1]
-                    minutes = rest.split(" min ")
-                    minutes, rest = int(minutes[0]), minutes[1]
-                    seconds = int(rest.split(" sec")[0])
-                    if len(str(hours)) == 1:
-                        hours = f"0{hours}"
-                    if len(str(minutes)) == 1:
-                        minutes = f"0{minutes}"
-                    if len(str(seconds)) == 1:
-                        seconds = f"0{seconds}"
-                    self.total_time = f"{hours}:{minutes}:{seconds}"
+                    self.total_time = self._read_total_time(line)
+        if parser.line_number <= 4:
+            return False
+        self.timesteps = parser.series
         return True
 
+    def read_cancel_file(self):
+        try:
+            with open(self.cancel_cnf.result_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"reason": "unknown"}
+
+    def read_sacct_file(self) -> dict:
+        """
+        Accounting of the job, with the share of the requested time and memory it used.
+        """
+        # a job step is accounted in the sacct output of its allocation, by its job name
+        step_name = os.path.basename(self.sacct_cnf.result_file).split(".")[0] if "." in str(self.job_id) else None
+        with open(self.sacct_cnf.result_file, "r") as f:
+            accounting = parse_sacct(f.read(), step_name=step_name,
+                                     cpus_per_task=self.sacct_cnf.number_of_cores_per_task)
+        limit = time_seconds(self.sacct_cnf.job_time_limit) if self.sacct_cnf.job_time_limit else None
+        if limit and accounting.get("elapsed_seconds") is not None:
+            accounting["time_limit_utilization"] = accounting["elapsed_seconds"] / limit
+        if self.sacct_cnf.mem_per_cpu and accounting.get("max_rss_mb_per_cpu") is not None:
+            accounting["mem_per_cpu_utilization"] = accounting["max_rss_mb_per_cpu"] / self.sacct_cnf.mem_per_cpu
+        return accounting
+
+    def read_step_file(self) -> dict:
+        """
+        The "key value" lines of the step file: index, start, exit_code and end.
+        """
+        values = {}
+        with open(self.step_cnf.result_file, "r") as f:
+            for line in f:
+                key, _, value = line.strip().partition(" ")
+                try:
+                    values[key] = float(value)
+                except ValueError:
+                    continue
+        step = {
+            "allocation_id": str(self.job_id).split(".")[0],
+            "index": int(values["index"]) if "index" in values else None,
+            "start": values.get("start"),
+            "end": values.get("end"),
+            "exit_code": int(values["exit_code"]) if "exit_code" in values else None,
+        }
+        step["seconds"] = step["end"] - step["start"] if step["start"] is not None and step["end"] is not None \
+            else None
+        return step
+
     def analyze(self):
         print(f"\n\nANALYZING STD OUT for job: {self.job_id}")
         configs = {}
@@ -571,17 +926,35 @@ class StdFileAnalyzer(BaseAnalyzer):
             configs["out"] = self.out_cnf
         if self.err_cnf:
             configs["err"] = self.err_cnf
+        cancelled = None
+        if self.cancel_cnf:
+            configs["cancel"] = self.cancel_cnf
+            cancelled = self.read_cancel_file()
+        accounting = None
+        if self.sacct_cnf:
+            configs["sacct"] = self.sacct_cnf
+            accounting = self.read_sacct_file()
+        step = None
+        if self.step_cnf:
+            configs["step"] = self.step_cnf
+            step = self.read_step_file()
         if self.out_cnf:
             if self.out_cnf.app != App.ISSM_4_18:
-                if not self.read_out_file(self.out_cnf.result_file):
-                    # return error in case of error
-                    return self.job_id, configs, {"error": True, "message": "ISSM did not run! Check with error file!",
-                                                  "error_file": None if not self.err_cnf else self.err_cnf.result_file}
+                ran = self.read_out_file(self.out_cnf.result_file)
             else:
-                if not self.read_out_file_418(self.out_cnf.result_file):
-                    # return error in case of error
-                    return self.job_id, configs, {"error": True, "message": "ISSM did not run! Check with error file!",
-                                                  "error_file": None if not self.err_cnf else self.err_cnf.result_file}
+                ran = self.read_out_file_418(self.out_cnf.result_file)
+            if not ran:
+                # return error in case of error
+                error = {"error": True, "message": "ISSM did not run! Check with error file!",
+                         "error_file": None if not self.err_cnf else self.err_cnf.result_file}
+                if cancelled:
+                    error["message"] = f"Cancelled by the watchdog: {cancelled.get('message', cancelled['reason'])}"
+                    error["cancelled"] = cancelled
+                if accounting:
+                    error["sacct"] = accounting
+                if step:
+                    error["step"] = step
+                return self.job_id, configs, error
         print(f"Calculation Time: {self.calculation_time}")
         print(f"Setup Time: {self.setup_time}")
         print(f"Total Time: {self.total_time}")
@@ -595,6 +968,20 @@ class StdFileAnalyzer(BaseAnalyzer):
             "model_element_count_average": self.model_elements_avg,
             "model_loops_count_average": self.model_loops_avg
         }
+        if cancelled:
+            results["cancelled"] = cancelled
+        if accounting:
+            results["sacct"] = accounting
+        if step:
+            results["step"] = step
+        if self.timesteps is not None and len(self.timesteps):
+            results["timesteps"] = {
+                "steps": len(self.timesteps),
+                "total_steps": self.timesteps.total_steps,
+                "steady_state_only": self.steady_state_only,
+                "summary": {name: self.timesteps.summary(name) for name in self.timesteps.present()},
+                "series": self.timesteps.as_dict(),
+            }
         return self.job_id, configs, results
 
 
@@ -603,124 +990,138 @@ class GProfAnalyzer(BaseAnalyzer):
     Analyzer for GProf results.
     """
 
-    def __init__(self, job_id: int, profile: ExperimentConfig, threshold_percentage: float = 0.01):
+    def __init__(self, job_id: int, profile: ExperimentConfig = None, symbols: ExperimentConfig = None,
+                 gmon_outs: List[ExperimentConfig] = None, executable: ExperimentConfig = None,
+                 threshold_percentage: float = 0.01, top_imbalanced: int = 20, parallel_ranks: int = None):
         """
         Constructor.
+        :param symbols: Output of nm -C -l for the executable, to find the source location of the functions.
+        :param gmon_outs: The per rank gmon files of a parallel_sum GProfRun.
+        :param executable: The executable the gmon files belong to.
+        :param top_imbalanced: Number of functions to report in the load imbalance.
+        :param parallel_ranks: Number of gprof processes for the per rank profiles. Default: number of cpus.
         """
         super().__init__(job_id)
         self.profile = profile
+        self.symbols = symbols
+        self.gmon_outs = gmon_outs if gmon_outs else []
+        self.executable = executable
+        self.top_imbalanced = top_imbalanced
+        self.parallel_ranks = parallel_ranks if parallel_ranks else os.cpu_count()
+        self.function_locations = {}
         self.threshold = threshold_percentage
         self.flat_profile = []
         self.call_graph = []
-        self.flat_profile_lines = []
-        self.cg_lines = []
+        # indexed profile, for queries on the call graph
+        self.gprof_profile = None
 
     def read_profile_file(self, path):
         """
         Reads the profile file into variables.
+        Entries under the threshold percentage are left out of the flat profile and call graph lists, the indexed
+        profile keeps all of them.
         """
-        with open(path, "r") as f:
-            lines = f.readlines()
-            i = 0
-            for i in range(5, len(lines)):
-                line = lines[i][:-1]
-                # print(line)
-                if line != "":
-                    # 19.81     10.22    10.22    62500     0.00     0.00  EnthalpyAnalysis::CreateKMatrixVolume(Element*)
-                    elms = line.split(" ")
-                    elms = [elm.strip() for elm in elms if elm.strip() != ""]
-                    if float(elms[0]) < self.threshold:
-                        continue
-                    try:
-                        entry = _FlatProfileEntry(
-                            percentage_total=float(elms[0]),
-                            cumulated_secs=float(elms[1]),
-                            self_secs=float(elms[2]),
-                            calls_to_this=int(elms[3]),
-                            self_ms_calls=float(elms[4]),
-                            cumulated_ms_calls=float(elms[5]),
-                            name=" ".join(elms[6:])
-                        )
-                    except (ValueError, IndexError):
-                        try:
-                            entry = _FlatProfileEntry(
-                                percentage_total=float(elms[0]),
-                                cumulated_secs=float(elms[1]),
-                                self_secs=float(elms[2]),
-                                calls_to_this=None,
-                                self_ms_calls=None,
-                                cumulated_ms_calls=None,
-                                name=" ".join(elms[3:])
-                            )
-                        except (ValueError, IndexError):
-                            entry = _FlatProfileEntry(
-                                percentage_total=None,
-                                cumulated_secs=None,
-                                self_secs=None,
-                                calls_to_this=None,
-                                self_ms_calls=None,
-                                cumulated_ms_calls=None,
-                                name=None
-                            )
-                    self.flat_profile.append(entry)
-                else:
-                    break
-            j = i + 40
-            while j < len(lines):
-                caller_lines = []
-                m = 0
-                elms = None
-                read = False
-                while "---------" not in lines[j + m]:
-                    if lines[j + m].startswith("["):
-                        # print("start [:")
-                        # print(lines[j + m][:-1])
-                        elms = [elm.strip() for elm in lines[j + m].split(" ") if elm.strip() != ""]
-                        read = True
-                    elif not read:
-                        # print("begginning line")
-                        # print(lines[j + m][:-1])
-                        caller_lines.append(lines[j + m][:-1].strip())
-                    m = m + 1
-                j = j + m
-                # print(elms)
-                # print(caller_lines)
-                # print("---------")
-                if float(elms[1]) < self.threshold:
-                    break
-                caller_ids = []
-                start = False
-                for caller_line in caller_lines:
-                    if caller_line == "<spontaneous>" or start:
-                        start = True
-                        caller_ids.append(None)
-                        called = None
-                        name = " ".join(elms[4:])
-                    else:
-                        caller_ids.append(int(caller_line.split("[")[1].split("]")[0]))
-                        called = float(elms[4])
-                        name = " ".join(elms[5:])
-                # [1]     98.1    0.00   50.61                 execute(int, char**, int, int, void (*)(FemModel*)) [1]
-                self.call_graph.append(
-                    _CallGraphNode(
-                        index=int(elms[0][1:-1]),
-                        total_time_percentage=float(elms[1]),
-                        self_time=float(elms[2]),
-                        child_time=float(elms[3]),
-                        called=called,
-                        name=name,
-                        parent_indexes=caller_ids
-                    )
-                )
-                j = j + 1
+        self.gprof_profile = parse_gprof(path)
+        for function in self.gprof_profile.flat:
+            if function.percentage < self.threshold:
+                continue
+            self.flat_profile.append(_FlatProfileEntry(
+                percentage_total=function.percentage,
+                cumulated_secs=function.cumulative_seconds,
+                self_secs=function.self_seconds,
+                calls_to_this=function.calls,
+                self_ms_calls=function.self_ms_call,
+                cumulated_ms_calls=function.total_ms_call,
+                name=function.name
+            ))
+        for function in self.gprof_profile.graph:
+            if function.total_percentage < self.threshold:
+                continue
+            self.call_graph.append(_CallGraphNode(
+                index=function.index,
+                total_time_percentage=function.total_percentage,
+                self_time=function.self_time,
+                child_time=function.children_time,
+                called=function.called,
+                name=function.name,
+                parent_indexes=[None] if function.spontaneous else [e.caller for e in function.callers]
+            ))
+
+    def read_symbols(self, path, names: set):
+        """
+        Reads the source location of the given functions from the nm -C -l output.
+        Lines look like "0000000000401136 T Node::foo(int)\t/path/src/c/classes/Node.cpp:10".
+        """
+        with open(path, "r", errors="replace") as f:
+            for line in f:
+                symbol, _, location = line.rstrip("\n").partition("\t")
+                if not location:
+                    continue
+                elms = symbol.split(" ", 2)
+                if len(elms) < 3 or elms[2] not in names:
+                    continue
+                file, _, source_line = location.rpartition(":")
+                try:
+                    self.function_locations[elms[2]] = {"file": file, "line": int(source_line)}
+                except ValueError:
+                    continue
+
+    def rank_profile(self, gmon_out: ExperimentConfig) -> Dict[str, float]:
+        """
+        Self seconds per function of one rank, from the flat profile of its gmon file.
+        """
+        res = subprocess.run(["gprof", "-b", "-p", self.executable.result_file, gmon_out.result_file],
+                             capture_output=True)
+        if res.returncode != 0:
+            print("gprof failed on", gmon_out.result_file, res.stderr.decode("utf-8"))
+            return {}
+        profile = parse_gprof_lines(res.stdout.decode("utf-8", "replace").splitlines())
+        return {f.name: f.self_seconds for f in profile.flat}
+
+    def rank_imbalance(self) -> dict:
+        """
+        Profiles every rank on its own, in parallel, and compares the self time of the functions over the ranks.
+        imbalance_ratio is max / mean: 1 is perfectly balanced. lost_seconds is max - mean, the time the other ranks
+        wait for the slowest one in this function, if they synchronize after it.
+        """
+        with ThreadPoolExecutor(max_workers=self.parallel_ranks) as pool:
+            ranks = list(pool.map(self.rank_profile, self.gmon_outs))
+        ranks = [rank for rank in ranks if rank]
+        names = set()
+        for rank in ranks:
+            names.update(rank.keys())
+        functions = []
+        for name in names:
+            # a function that is missing in a rank's profile took no time there
+            times = [rank.get(name, 0.0) for rank in ranks]
+            mean = sum(times) / len(times)
+            if mean <= 0:
+                continue
+            functions.append({
+                "name": name,
+                "min_seconds": min(times),
+                "max_seconds": max(times),
+                "mean_seconds": mean,
+                "imbalance_ratio": max(times) / mean,
+                "lost_seconds": max(times) - mean,
+            })
+        functions.sort(key=lambda f: -f["lost_seconds"])
+        return {
+            "ranks": len(ranks),
+            "functions": functions[:self.top_imbalanced],
+        }
 
     def analyze(self):
         """
         Analyze the results.
         """
         print("\n\nANALYZING GPROF!!")
+        configs = {"profile": self.profile} if self.profile else {}
         if self.profile:
             self.read_profile_file(self.profile.result_file)
+        if self.symbols:
+            configs["symbols"] = self.symbols
+            self.read_symbols(self.symbols.result_file, {e.name for e in self.flat_profile if e.name})
         for e in self.flat_profile:
             print(e.name, e.percentage_total)
         for e in self.call_graph:
@@ -731,7 +1132,21 @@ class GProfAnalyzer(BaseAnalyzer):
             "flat_profile": [fpe.as_dict() for fpe in self.flat_profile],
             "call_graph": [cgn.as_dict() for cgn in self.call_graph]
         }
-        return self.job_id, {"profile": self.profile}, results
+        if self.gprof_profile:
+            results["critical_path"] = [{
+                "name": f.name,
+                "identifier": f.index,
+                "inclusive_time": f.inclusive_time,
+                "individual_time": f.self_time,
+            } for f in self.gprof_profile.critical_path("main")]
+        if self.symbols:
+            results["function_locations"] = self.function_locations
+        if self.gmon_outs and self.executable:
+            configs["executable"] = self.executable
+            for gmon_out in self.gmon_outs:
+                configs[gmon_out.result_file.rsplit(".", 1)[-1]] = gmon_out
+            results["rank_imbalance"] = self.rank_imbalance()
+        return self.job_id, configs, results
 
 
 class CompilerVectorizationReportAnalyzer(BaseAnalyzer):
@@ -740,28 +1155,32 @@ class CompilerVectorizationReportAnalyzer(BaseAnalyzer):
     """
 
     def __init__(self, job_id: int, all: ExperimentConfig = None, opt: ExperimentConfig = None,
-                 miss: ExperimentConfig = None, limit_to="src/c"):
+                 miss: ExperimentConfig = None, opt_yaml: ExperimentConfig = None, limit_to="src/c"):
         """
         Constructor.
+        :param all: GCC report with optimized and missed loops.
+        :param opt: GCC report with the optimized loops.
+        :param miss: GCC report with the missed loops.
+        :param opt_yaml: LLVM optimization records of the loop vectorizer.
+        :param limit_to: Only report source files with this in their path.
         """
         super().__init__(job_id)
         self.all_cnf = all
         self.opt_cnf = opt
         self.miss_cnf = miss
+        self.opt_yaml_cnf = opt_yaml
         self.limit_to = limit_to
+        # results
+        self.index = None
 
-    def read_file(self, result_file) -> dict:
+    def read_file(self, result_file, index: VectorizationIndex = None) -> VectorizationIndex:
+        """
+        Reads a GCC report (-fopt-info-vec) line by line into the index.
+        Index entries are per loop: vectorized t/f, vector_bits if yes else None, reason (if not) else None.
+        """
+        index = index if index is not None else VectorizationIndex()
         with open(result_file, "r") as f:
-            results = {}
-            """ Dict: Keys are the files,
-                which hold lists of dicts like {
-                # line: line number of the loop
-                # column: column of the loop
-                # vectorized: t/f
-                # vector_bytes if yes else None
-                # reason (if not) else None
-            } """
-            for line in f.readlines():
+            for line in f:
                 try:
                     try:
                         source, line, column, result, rest = line.split(":", 4)
@@ -771,51 +1190,69 @@ class CompilerVectorizationReportAnalyzer(BaseAnalyzer):
                         continue
                     elif "missed" in result and "statement clobbers memory" in rest:
                         continue
-                    if source not in results:
-                        results[source] = []
+                    if self.limit_to and self.limit_to not in source:
+                        continue
                     if "missed" in result:
                         try:
                             reason = rest.split(":", 1)[1][:-1]
                         except IndexError:
                             reason = rest[:-1]
                         try:
-                            res = {
-                                "line": int(line),
-                                "column": int(column),
-                                "vectorized": False,
-                                "vector_bits": None,
-                                "reason": reason
-                            }
-                            if res not in results[source]:
-                                if (self.limit_to and self.limit_to in source) or not self.limit_to:
-                                    results[source].append(res)
+                            index.add(source, int(line), int(column), False, reason=reason)
                         except Exception as e:
                             print("Something went wrong reading CVR report: ", e,"::", type(e))
                     elif "optimized" in result:
                         try:
-                            res = {
-                                "line": int(line),
-                                "column": int(column),
-                                "vectorized": True,
-                                "vector_bits": 8*int(rest.split(" byte")[0].split(" ")[-1]),
-                                "reason": None,
-                            }
-                            if res not in results[source]:
-                                if (self.limit_to and self.limit_to in source) or not self.limit_to:
-                                    results[source].append(res)
+                            index.add(source, int(line), int(column), True,
+                                      vector_bits=8*int(rest.split(" byte")[0].split(" ")[-1]))
                         except Exception as e:
                             print("Something went wrong reading CVR report: ", e)
                     else:
                         continue
                 except IndexError:
                     continue
-            return results
+        return index
+
+    def read_opt_yaml(self, result_file, index: VectorizationIndex = None) -> VectorizationIndex:
+        """
+        Reads LLVM optimization records into the index, like read_file.
+        A loop can get several remarks: "Missed" says it was not vectorized, "Analysis" says why.
+        """
+        index = index if index is not None else VectorizationIndex()
+        loops = {}
+        for remark in read_remarks(result_file, passes={"loop-vectorize"}):
+            if not remark.loc:
+                continue
+            source, line, column = remark.loc
+            if self.limit_to and self.limit_to not in source:
+                continue
+            # the same loop can be inlined into several functions, with different results
+            loop = loops.setdefault((source, line, column, remark.function),
+                                    {"vectorized": False, "vectorization_factor": None, "reason": None})
+            message = remark.message()
+            if remark.kind == "Passed" and remark.name == "Vectorized":
+                loop["vectorized"] = True
+                loop["vectorization_factor"] = remark.vectorization_factor()
+            elif remark.kind == "Passed":
+                # interleaved only, not vectorized
+                loop["reason"] = message
+            elif remark.kind == "Analysis":
+                loop["reason"] = message.split("loop not vectorized: ", 1)[-1]
+            elif remark.kind == "Missed" and loop["reason"] is None:
+                loop["reason"] = message
+        for (source, line, column, function), loop in loops.items():
+            # the element width is not in the records, so the vector width in bits is not known
+            index.add(source, line, column, loop["vectorized"],
+                      vectorization_factor=loop["vectorization_factor"],
+                      reason=None if loop["vectorized"] else loop["reason"])
+        return index
 
     def analyze(self):
         print("\n\nANALYZING CVR!!")
         print(self.all_cnf)
         print(self.opt_cnf)
         print(self.miss_cnf)
+        print(self.opt_yaml_cnf)
         configs = {}
         if self.all_cnf:
             configs["all"] = self.all_cnf
@@ -823,33 +1260,693 @@ class CompilerVectorizationReportAnalyzer(BaseAnalyzer):
             configs["opt"] = self.opt_cnf
         if self.miss_cnf:
             configs["miss"] = self.miss_cnf
-        results = {}
-        if self.all_cnf:
-            results = self.read_file(self.all_cnf.result_file)
+        if self.opt_yaml_cnf:
+            configs["opt_yaml"] = self.opt_yaml_cnf
+        index = VectorizationIndex()
+        if self.opt_yaml_cnf:
+            self.read_opt_yaml(self.opt_yaml_cnf.result_file, index)
+        elif self.all_cnf:
+            self.read_file(self.all_cnf.result_file, index)
         elif self.opt_cnf and self.miss_cnf:
-            results = self.read_file(self.opt_cnf.result_file)
-            results.update(self.read_file(self.miss_cnf.result_file))
-        return self.job_id, configs, {"compiler_vectorization": results}
+            self.read_file(self.opt_cnf.result_file, index)
+            self.read_file(self.miss_cnf.result_file, index)
+        self.index = index
+        return self.job_id, configs, {"compiler_vectorization": index.as_dict()}
 
 
 class CallgrindAnalyzer(BaseAnalyzer):
     """
     Callgrind Analyzer.
     """
-    def __init__(self, job_id: int, callgrind_out: ExperimentConfig = None, callgrind_vgcore: ExperimentConfig = None):
+    def __init__(self, job_id: int, callgrind_out: ExperimentConfig = None, callgrind_vgcore: ExperimentConfig = None,
+                 min_share: float = 0.0001):
+        """
+        Constructor.
+        :param min_share: Lines and functions with less than this share of the total cost are not exported.
+        """
         super().__init__(job_id)
         self.callgrind_out = callgrind_out
         self.callgrind_vgcore = callgrind_vgcore
+        self.min_share = min_share
+
+    def costs(self) -> dict:
+        """
+        Self costs per function and per source line, of the first event.
+        """
+        profile = read_callgrind(self.callgrind_out.result_file)
+        total = profile.total
+        limit = total * self.min_share
+        functions = {}
+        for function, cost in sorted(profile.function_costs.items(), key=lambda item: -item[1]):
+            if cost < limit:
+                break
+            file, first, last = profile.function_lines[function]
+            functions[function] = {"cost": cost, "file": file, "first_line": first, "last_line": last}
+        return {
+            "event": profile.events[0] if profile.events else None,
+            "total": total,
+            "functions": functions,
+            # list of [file, line, cost]
+            "lines": [[file, line, cost] for (file, line), cost in profile.line_costs.items() if cost >= limit],
+        }
 
     def analyze(self):
-        print("\n\nANALYZING CVR!!")
+        print("\n\nANALYZING CALLGRIND!!")
         print(self.callgrind_out)
         configs = {
             "callgrind_out": self.callgrind_out,
         }
         results = {
             "callgrind_out": self.callgrind_out.result_file,
-            "callgrind_vgcore": self.callgrind_vgcore.result_file,
-            "examine_with_cmd": f"kcachegrind {self.callgrind_out.result_file}"
+            "callgrind_vgcore": self.callgrind_vgcore.result_file if self.callgrind_vgcore else None,
+            "examine_with_cmd": f"kcachegrind {self.callgrind_out.result_file}",
+            "callgrind": self.costs(),
+        }
+        return self.job_id, configs, results
+
+
+class MassifAnalyzer(BaseAnalyzer):
+    """
+    Valgrind massif Analyzer. Reads the heap snapshots of every profiled rank.
+    """
+
+    def __init__(self, job_id: int, massif_outs: List[ExperimentConfig] = None, top_sites: int = 10,
+                 site_depth: int = 3):
+        """
+        Constructor.
+        :param massif_outs: One config per massif out file (one per profiled rank).
+        :param top_sites: Number of allocation sites to report at the peak.
+        :param site_depth: Number of stack frames reported per allocation site.
+        """
+        super().__init__(job_id)
+        self.massif_outs = massif_outs if massif_outs else []
+        self.top_sites = top_sites
+        self.site_depth = site_depth
+
+    @staticmethod
+    def _parse_tree_line(line: str):
+        """
+        Parses a heap tree line like " n1: 600 0x4005A1: foo (a.c:10)" into (depth, bytes, frame).
+        """
+        depth = len(line) - len(line.lstrip(" "))
+        _, rest = line.strip().split(":", 1)
+        size, frame = rest.strip().split(" ", 1)
+        if frame.startswith("0x"):
+            # cut off the address
+            frame = frame.split(": ", 1)[1] if ": " in frame else frame
+        return depth, int(size), frame.strip()
+
+    def read_massif_file(self, path):
+        """
+        Reads a massif out file. Returns the time unit, the snapshots and the heap trees of the detailed snapshots.
+        """
+        time_unit = None
+        snapshots = []
+        trees = {}
+        current = None
+        with open(path, "r") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith("time_unit:"):
+                    time_unit = line.split(":", 1)[1].strip()
+                elif line.startswith("snapshot="):
+                    current = {"snapshot": int(line.split("=", 1)[1]), "tree": None}
+                    snapshots.append(current)
+                elif current is None or line.startswith("#"):
+                    continue
+                elif line.startswith("time="):
+                    current["time"] = int(line.split("=", 1)[1])
+                elif line.startswith("mem_heap_B="):
+                    current["mem_heap_B"] = int(line.split("=", 1)[1])
+                elif line.startswith("mem_heap_extra_B="):
+                    current["mem_heap_extra_B"] = int(line.split("=", 1)[1])
+                elif line.startswith("mem_stacks_B="):
+                    current["mem_stacks_B"] = int(line.split("=", 1)[1])
+                elif line.startswith("heap_tree="):
+                    current["tree"] = line.split("=", 1)[1]
+                    trees[current["snapshot"]] = []
+                elif line.lstrip().startswith("n") and current["snapshot"] in trees:
+                    try:
+                        trees[current["snapshot"]].append(self._parse_tree_line(line))
+                    except ValueError:
+                        continue
+        return time_unit, snapshots, trees
+
+    def allocation_sites(self, tree: list, heap_bytes: int) -> list:
+        """
+        Returns the biggest allocation sites of a heap tree. A site is a direct child of the root node,
+        reported with the stack of its biggest children, up to site_depth frames.
+        """
+        sites = []
+        for i, (depth, size, frame) in enumerate(tree):
+            if depth != 1 or "below massif's threshold" in frame:
+                continue
+            stack = [frame]
+            current_depth = depth
+            for sub_depth, sub_size, sub_frame in tree[i + 1:]:
+                if sub_depth <= depth or len(stack) >= self.site_depth:
+                    break
+                # the children are sorted by size, so the first one one level deeper is the biggest
+                if sub_depth == current_depth + 1:
+                    stack.append(sub_frame)
+                    current_depth = sub_depth
+            sites.append({
+                "bytes": size,
+                "share_of_heap": size / heap_bytes if heap_bytes else None,
+                "function": frame,
+                "stack": stack,
+            })
+        return sorted(sites, key=lambda site: site["bytes"], reverse=True)[:self.top_sites]
+
+    def analyze(self):
+        print("\n\nANALYZING MASSIF!!")
+        configs = {}
+        ranks = {}
+        peak_heap = 0
+        peak_rank = None
+        mem_per_cpu = None
+        for cnf in self.massif_outs:
+            pid = cnf.result_file.split("massif-out-")[-1]
+            configs[f"massif_out_{pid}"] = cnf
+            mem_per_cpu = cnf.mem_per_cpu
+            time_unit, snapshots, trees = self.read_massif_file(cnf.result_file)
+            if not snapshots:
+                ranks[pid] = {"error": True, "message": "Massif file has no snapshots."}
+                continue
+            # massif marks the peak, if the run was too short for that, take the biggest snapshot
+            peak = [s for s in snapshots if s["tree"] == "peak"]
+            if peak:
+                peak = peak[0]
+            else:
+                peak = max(snapshots, key=lambda s: s.get("mem_heap_B", 0) + s.get("mem_heap_extra_B", 0))
+            # closest detailed snapshot to the peak for the allocation sites
+            detailed = [s for s in snapshots if s["snapshot"] in trees and trees[s["snapshot"]]]
+            sites = []
+            if detailed:
+                closest = min(detailed, key=lambda s: abs(s["snapshot"] - peak["snapshot"]))
+                # the shares are of the heap of the same snapshot, the sites of another one would not add up
+                sites = self.allocation_sites(trees[closest["snapshot"]], closest.get("mem_heap_B", 0))
+            ranks[pid] = {
+                "time_unit": time_unit,
+                # time, heap, heap extra, stacks
+                "heap_series": [[s.get("time"), s.get("mem_heap_B"), s.get("mem_heap_extra_B"), s.get("mem_stacks_B")]
+                                for s in snapshots],
+                "peak": {key: peak.get(key) for key in
+                         ["snapshot", "time", "mem_heap_B", "mem_heap_extra_B", "mem_stacks_B"]},
+                "top_allocation_sites": sites,
+                "allocation_sites_snapshot": closest["snapshot"] if detailed else None,
+            }
+            heap = peak.get("mem_heap_B", 0) + peak.get("mem_heap_extra_B", 0)
+            if heap > peak_heap:
+                peak_heap = heap
+                peak_rank = pid
+        results = {
+            "massif": {
+                "ranks": ranks,
+                "peak_heap_B": peak_heap,
+                "peak_heap_MB": peak_heap / 1024 / 1024,
+                "peak_rank": peak_rank,
+                # how much of the requested memory per cpu is used by the heap at peak
+                "mem_per_cpu_utilization": peak_heap / 1024 / 1024 / mem_per_cpu if mem_per_cpu else None,
+            }
+        }
+        return self.job_id, configs, results
+
+
+class SamplerAnalyzer(BaseAnalyzer):
+    """
+    Analyzer for the node-level samples. Lines the samples up with the timestep markers of the std out file.
+    """
+
+    def __init__(self, job_id: int, samples: ExperimentConfig = None, out: ExperimentConfig = None,
+                 throttle_fraction: float = 0.9):
+        """
+        Constructor.
+        :param samples: Config of the samples file.
+        :param out: Config of the std out file, to align the samples with the timesteps.
+        :param throttle_fraction: A sample counts as throttled, if the mean core frequency is below this fraction
+        of the highest mean frequency seen in the job.
+        """
+        super().__init__(job_id)
+        self.samples_cnf = samples
+        self.out_cnf = out
+        self.throttle_fraction = throttle_fraction
+
+    @staticmethod
+    def read_samples(path) -> list:
+        """
+        Reads the samples CSV written by Runs/sampler.py.
+        """
+        samples = []
+        with open(path, "r") as f:
+            header = f.readline().strip().split(",")
+            for line in f:
+                row = dict(zip(header, line.rstrip("\n").split(",")))
+                try:
+                    rss = [int(entry.split(":")[1]) for entry in row["rss_kB"].split(";") if entry]
+                    freqs = [int(mhz) for mhz in row["freq_MHz"].split(";") if mhz and mhz != "0"]
+                    samples.append({
+                        "time": float(row["time"]),
+                        "stdout_lines": int(row["stdout_lines"]),
+                        "cpu_busy": float(row["cpu_busy"]),
+                        "idle_cores": int(row["idle_cores"]),
+                        "mem_used_kB": int(row["mem_total_kB"]) - int(row["mem_available_kB"]),
+                        "rss_total_kB": sum(rss),
+                        "rss_max_kB": max(rss) if rss else 0,
+                        "ranks": len(rss),
+                        "freq_MHz_mean": sum(freqs) / len(freqs) if freqs else None,
+                        "freq_MHz_min": min(freqs) if freqs else None,
+                    })
+                except (KeyError, ValueError, IndexError):
+                    # the last line may be cut off, if the sampler was killed while writing
+                    continue
+        return samples
+
+    @staticmethod
+    def read_markers(path) -> list:
+        """
+        Returns the line numbers of the timestep markers in the std out file.
+        """
+        return list(TimestepParser().feed_file(path).step_lines)
+
+    @staticmethod
+    def _slope(xs, ys):
+        """
+        Least squares slope of ys over xs.
+        """
+        if len(xs) < 2:
+            return None
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var = sum((x - mean_x) ** 2 for x in xs)
+        if var == 0:
+            return None
+        return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+    def analyze(self):
+        print("\n\nANALYZING NODE SAMPLES!!")
+        configs = {"samples": self.samples_cnf}
+        samples = self.read_samples(self.samples_cnf.result_file)
+        if not samples:
+            return self.job_id, configs, {"node_samples": {"error": True, "message": "No samples recorded."}}
+        markers = self.read_markers(self.out_cnf.result_file) if self.out_cnf else []
+        # step of a sample: number of markers already written, step 0 is the setup phase
+        phases = {}
+        marker_idx = 0
+        for s in samples:
+            while marker_idx < len(markers) and markers[marker_idx] < s["stdout_lines"]:
+                marker_idx += 1
+            phases.setdefault(marker_idx, []).append(s)
+        max_freq = max([s["freq_MHz_mean"] for s in samples if s["freq_MHz_mean"]], default=None)
+        per_step = []
+        for step, step_samples in sorted(phases.items()):
+            freqs = [s["freq_MHz_mean"] for s in step_samples if s["freq_MHz_mean"]]
+            per_step.append({
+                "step": step,
+                "samples": len(step_samples),
+                "cpu_busy_mean": sum(s["cpu_busy"] for s in step_samples) / len(step_samples),
+                "idle_cores_mean": sum(s["idle_cores"] for s in step_samples) / len(step_samples),
+                "rss_total_kB_max": max(s["rss_total_kB"] for s in step_samples),
+                "rss_rank_kB_max": max(s["rss_max_kB"] for s in step_samples),
+                "freq_MHz_mean": sum(freqs) / len(freqs) if freqs else None,
+                "freq_MHz_min": min([s["freq_MHz_min"] for s in step_samples if s["freq_MHz_min"]], default=None),
+            })
+        start = samples[0]["time"]
+        running = [s for s in samples if s["ranks"] > 0]
+        results = {
+            "node_samples": {
+                "samples": len(samples),
+                "duration": samples[-1]["time"] - start,
+                "timestep_markers": len(markers),
+                "per_step": per_step,
+                # memory growth of all ranks together over the run
+                "rss_growth_kB_per_s": self._slope([s["time"] - start for s in running],
+                                                   [s["rss_total_kB"] for s in running]),
+                "rss_rank_kB_max": max([s["rss_max_kB"] for s in samples], default=None),
+                "throttled_samples": len([s for s in samples if max_freq and s["freq_MHz_mean"] and
+                                          s["freq_MHz_mean"] < self.throttle_fraction * max_freq]),
+                "idle_cores_mean": sum(s["idle_cores"] for s in running) / len(running) if running else None,
+            }
+        }
+        return self.job_id, configs, results
+
+
+class PETScLogViewAnalyzer(BaseAnalyzer):
+    """
+    Analyzer for the PETSc -log_view performance summary.
+    """
+    # events of interest, Begin/End events are summed up into one group
+    event_groups = {
+        "KSPSolve": ["KSPSolve"],
+        "MatMult": ["MatMult"],
+        "PCApply": ["PCApply"],
+        "MatAssembly": ["MatAssemblyBegin", "MatAssemblyEnd"],
+        "VecScatter": ["VecScatterBegin", "VecScatterEnd"],
+    }
+    # events that are (mostly) communication, for the communication share
+    communication_events = ["VecScatterBegin", "VecScatterEnd", "SFBcastOpBegin", "SFBcastOpEnd", "SFReduceBegin",
+                            "SFReduceEnd", "SFPack", "SFUnpack", "BuildTwoSided", "BuildTwoSidedF"]
+
+    def __init__(self, job_id: int, petsc_log: ExperimentConfig = None):
+        super().__init__(job_id)
+        self.petsc_log = petsc_log
+        self.processors = None
+        self.total_time = None
+        self.stages = {}
+        self.events = {}
+
+    @staticmethod
+    def _floats(elms):
+        try:
+            return [float(e.rstrip("%")) for e in elms]
+        except ValueError:
+            return None
+
+    def read_log(self, path):
+        """
+        Reads the stage summary and the event table of every stage.
+        """
+        stage = None
+        in_stage_summary = False
+        with open(path, "r") as f:
+            for line in f:
+                stripped = line.strip()
+                if stripped.startswith("Memory usage"):
+                    # the object tables follow, they have event stages too, but no events
+                    break
+                if " with " in line and " processor" in line and self.processors is None:
+                    # ./exe on a  named mpsc0154 with 96 processors, by user ...
+                    try:
+                        self.processors = int(line.split(" with ")[1].split()[0])
+                    except (ValueError, IndexError):
+                        pass
+                elif stripped.startswith("Time (sec):"):
+                    values = self._floats(stripped.split(":", 1)[1].split())
+                    if values:
+                        self.total_time = values[0]
+                elif stripped.startswith("Summary of Stages:"):
+                    in_stage_summary = True
+                elif in_stage_summary and stripped == "" and self.stages:
+                    in_stage_summary = False
+                elif in_stage_summary and ":" in stripped and stripped.split(":", 1)[0].isdigit():
+                    # 0:      Main Stage: 1.2345e+01 100.0%  3.0e+09 100.0%  1.2e+04 100.0%  1.0e+03 100.0%  5.0e+01 100.0%
+                    _, name, values = stripped.split(":", 2)
+                    values = self._floats(values.split())
+                    if values and len(values) >= 10:
+                        self.stages[name.strip()] = {
+                            "time": values[0], "time_percentage": values[1],
+                            "flop": values[2], "flop_percentage": values[3],
+                            "messages": values[4], "messages_percentage": values[5],
+                            "message_length_avg": values[6], "message_length_percentage": values[7],
+                            "reductions": values[8], "reductions_percentage": values[9],
+                        }
+                elif stripped.startswith("--- Event Stage"):
+                    stage = stripped.split(":", 1)[1].strip()
+                    self.events.setdefault(stage, {})
+                elif stage is not None and stripped and not stripped.startswith("-"):
+                    elms = stripped.split()
+                    values = self._floats(elms[1:])
+                    if values is None or len(values) < 20:
+                        # not an event line
+                        continue
+                    # Count Max Ratio, Time Max Ratio, Flop Max Ratio, Mess, AvgLen, Reduct,
+                    # 5x global percentages, 5x stage percentages, Mflop/s
+                    self.events[stage][elms[0]] = {
+                        "count": values[0], "count_ratio": values[1],
+                        "time": values[2], "time_ratio": values[3],
+                        "flop": values[4], "flop_ratio": values[5],
+                        "messages": values[6], "message_length_avg": values[7], "reductions": values[8],
+                        "time_percentage": values[9], "flop_percentage": values[10],
+                        "messages_percentage": values[11], "message_length_percentage": values[12],
+                        "reductions_percentage": values[13],
+                        "mflops": values[-1],
+                    }
+
+    def summarize(self) -> dict:
+        """
+        Sums up the events of interest over all stages.
+        """
+        summary = {}
+        for group, names in self.event_groups.items():
+            entries = [events[name] for events in self.events.values() for name in names if name in events]
+            if not entries:
+                continue
+            time = sum(e["time"] for e in entries)
+            summary[group] = {
+                "count": sum(e["count"] for e in entries),
+                "time": time,
+                # max/min over the ranks, worst of the summed events
+                "time_ratio": max(e["time_ratio"] for e in entries),
+                "flop": sum(e["flop"] for e in entries),
+                # petscs total rate over all ranks, weighted by the time of the events
+                "mflops": sum(e["mflops"] * e["time"] for e in entries) / time if time > 0 else None,
+                "mflops_per_rank": sum(e["flop"] for e in entries) / time / 1e6 if time > 0 else None,
+                "messages": sum(e["messages"] for e in entries),
+                "reductions": sum(e["reductions"] for e in entries),
+                "time_share": time / self.total_time if self.total_time else None,
+            }
+        return summary
+
+    def communication_share(self) -> Union[float, None]:
+        """
+        Share of the run time in communication events.
+        """
+        if not self.total_time:
+            return None
+        time = sum(events[name]["time"] for events in self.events.values() for name in self.communication_events
+                   if name in events)
+        return time / self.total_time
+
+    def analyze(self):
+        print("\n\nANALYZING PETSC LOG VIEW!!")
+        configs = {"petsc_log": self.petsc_log}
+        self.read_log(self.petsc_log.result_file)
+        if not self.events:
+            return self.job_id, configs, {"petsc_log_view": {"error": True,
+                                                             "message": "No PETSc events found in log."}}
+        summary = self.summarize()
+        solve = summary.get("KSPSolve", {}).get("time")
+        assembly = summary.get("MatAssembly", {}).get("time")
+        results = {
+            "petsc_log_view": {
+                "processors": self.processors,
+                "total_time": self.total_time,
+                "stages": self.stages,
+                "summary": summary,
+                "solver_to_assembly_ratio": solve / assembly if solve is not None and assembly else None,
+                "communication_share": self.communication_share(),
+                # events with the highest message and reduction counts, where communication dominates
+                "most_communicating_events": sorted(
+                    [{"stage": stage, "event": name, "messages": e["messages"], "reductions": e["reductions"],
+                      "time": e["time"], "time_ratio": e["time_ratio"]}
+                     for stage, events in self.events.items() for name, e in events.items()
+                     if e["messages"] > 0 or e["reductions"] > 0],
+                    key=lambda e: e["messages"] + e["reductions"], reverse=True)[:10],
+                "events": self.events,
+            }
         }
         return self.job_id, configs, results
+
+
+class ScorePAnalyzer(BaseAnalyzer):
+    """
+    Score-P Analyzer. Reads the flat profile of the cube file of a Score-P run with cube_stat,
+    or with scorep-score, if cube_stat is not available.
+    """
+
+    def __init__(self, job_id: int, scorep_dir: ExperimentConfig = None, top_regions: int = 100000,
+                 roofline_regions: int = 20):
+        """
+        Constructor.
+        :param scorep_dir: The Score-P experiment directory, with the profile.cubex in it.
+        :param top_regions: Number of regions to read, the most expensive first.
+        :param roofline_regions: Number of hotspot regions to place on the roofline, if PAPI counters were recorded.
+        """
+        super().__init__(job_id)
+        self.scorep_dir = scorep_dir
+        self.top_regions = top_regions
+        self.roofline_regions = roofline_regions
+
+    @staticmethod
+    def cache_salt(scorep_dir: ExperimentConfig = None, **kwargs) -> str:
+        # the roofline depends on the calibrated peaks
+        peaks = node_peaks(scorep_dir.cpu)
+        return json.dumps([peaks["peak_gflops"], peaks["peak_memory_bandwidth"], peaks["calibration"]])
+
+    def papi_metrics(self) -> List[str]:
+        """
+        The PAPI metrics of the run, from the scorep.cfg in the experiment directory.
+        """
+        try:
+            with open(f"{self.scorep_dir.result_file}/scorep.cfg", "r") as f:
+                for line in f:
+                    if line.startswith("SCOREP_METRIC_PAPI="):
+                        value = line.split("=", 1)[1].strip().strip('"')
+                        return [m for m in value.split(",") if m]
+        except FileNotFoundError:
+            pass
+        return []
+
+    def read_metrics(self, profile: str, metrics: List[str], regions: dict):
+        """
+        Adds the values of the given metrics per region.
+        """
+        try:
+            res = subprocess.run(["cube_stat", "-t", str(self.top_regions), "-m", ",".join(["time"] + metrics),
+                                  profile], capture_output=True)
+        except FileNotFoundError:
+            return
+        if res.returncode != 0:
+            print("cube_stat failed on the PAPI metrics:", res.stderr.decode("utf-8", "replace"))
+            return
+        for name, region in self.parse_cube_stat(res.stdout.decode("utf-8", "replace").splitlines()).items():
+            if name in regions:
+                regions[name].setdefault("metrics", {}).update(region["metrics"])
+
+    @staticmethod
+    def parse_cube_stat(lines) -> dict:
+        """
+        Parses the flat profile table of cube_stat (csv or pretty printed). The columns are found by their header,
+        region names may contain the separator (C++ arguments), so they take all leading fields that are left over.
+        """
+        regions = {}
+        header, separator = None, None
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if header is None:
+                if "region" in line.lower() or "routine" in line.lower():
+                    separator = "," if "," in line else "|" if "|" in line else None
+                    header = [h.strip() for h in line.strip("|").split(separator) if h.strip()]
+                continue
+            raw = line.strip("|").split(separator)
+            fields = [f.strip() for f in raw]
+            values = len(header) - 1
+            if len(fields) <= values:
+                continue
+            name = (separator or " ").join(raw[:len(fields) - values]).strip()
+            region = {"exclusive_time": None, "inclusive_time": None, "visits": None, "metrics": {}}
+            try:
+                for column, value in zip(header[1:], fields[len(fields) - values:]):
+                    lower = column.lower()
+                    if "excl" in lower or lower == "time":
+                        region["exclusive_time"] = float(value)
+                    elif "incl" in lower:
+                        region["inclusive_time"] = float(value)
+                    elif "call" in lower or "visit" in lower:
+                        region["visits"] = int(float(value))
+                    else:
+                        # other metrics, e.g. PAPI counters
+                        region["metrics"][column] = float(value)
+            except ValueError:
+                continue
+            regions[name] = region
+        return regions
+
+    @staticmethod
+    def parse_scorep_score(lines) -> dict:
+        """
+        Parses the region list of scorep-score -r. Its time column is the exclusive time.
+        flt type max_buf[B] visits time[s] time[%] time/visit[us] region
+        """
+        regions = {}
+        groups = {"ALL", "USR", "MPI", "COM", "SCOREP", "OMP", "PTHREAD", "CUDA", "SHMEM", "MEMORY", "IO", "LIB"}
+        for line in lines:
+            elms = line.split()
+            types = [i for i, elm in enumerate(elms[:2]) if elm in groups]
+            if not types or len(elms) < types[0] + 7:
+                continue
+            i = types[0]
+            name = " ".join(elms[i + 6:])
+            if name in groups:
+                # summary line of a group
+                continue
+            try:
+                regions[name] = {
+                    "exclusive_time": float(elms[i + 3].replace(",", "")),
+                    "inclusive_time": None,
+                    "visits": int(elms[i + 2].replace(",", "")),
+                }
+            except ValueError:
+                continue
+        return regions
+
+    def analyze(self):
+        print("\n\nANALYZING SCORE-P!!")
+        profile = f"{self.scorep_dir.result_file}/profile.cubex"
+        source = "cube_stat"
+        try:
+            res = subprocess.run(["cube_stat", "-t", str(self.top_regions), profile], capture_output=True)
+            regions = self.parse_cube_stat(res.stdout.decode("utf-8", "replace").splitlines()) \
+                if res.returncode == 0 else {}
+        except FileNotFoundError:
+            regions = {}
+        if not regions:
+            source = "scorep-score"
+            try:
+                res = subprocess.run(["scorep-score", "-r", profile], capture_output=True)
+                regions = self.parse_scorep_score(res.stdout.decode("utf-8", "replace").splitlines())
+            except FileNotFoundError:
+                print("Neither cube_stat nor scorep-score found, cannot read", profile)
+        results = {
+            "scorep": {
+                "profile": profile,
+                "read_with": source,
+                "regions": regions,
+            }
+        }
+        metrics = self.papi_metrics()
+        if metrics and source == "cube_stat":
+            self.read_metrics(profile, metrics, regions)
+            if set(flop_metrics) & set(metrics) and traffic_metric in metrics:
+                peaks = node_peaks(self.scorep_dir.cpu)
+                roofline = Roofline.for_run(peaks, self.scorep_dir.mpi_num_ranks)
+                results["roofline"] = {
+                    "roof": roofline.as_dict(),
+                    # None: nominal peaks of lichtenberg_defaults
+                    "calibration": peaks["calibration"],
+                    "kernels": roofline_table(regions, roofline, self.roofline_regions,
+                                              locations=self.scorep_dir.mpi_num_ranks or 1),
+                }
+        return self.job_id, {"scorep_dir": self.scorep_dir}, results
+
+
+class CalibrationAnalyzer(BaseAnalyzer):
+    """
+    Reads the measured values of a CalibrationRun, compares them with the nominal values of lichtenberg_defaults,
+    and caches them for the node type, so the analyzers of later runs use them.
+    """
+    # it stores the calibration, that has to happen on every analysis
+    cacheable = False
+
+    def __init__(self, job_id: int, calibration: ExperimentConfig = None, cache: CalibrationCache = None):
+        """
+        Constructor.
+        :param calibration: The .calibration file of the run.
+        :param cache: The cache to store the values in. Default: the calibration cache in the home dir.
+        """
+        super().__init__(job_id)
+        self.calibration = calibration
+        self.cache = cache if cache else CalibrationCache()
+
+    def analyze(self):
+        print("\n\nANALYZING CALIBRATION!!")
+        with open(self.calibration.result_file, "r") as f:
+            measured = parse_calibration(f)
+        entry = self.cache.store(measured, job_id=self.job_id)
+        peaks = entry["peaks"] if entry else {}
+        # share of the nominal value, that was measured
+        of_nominal = {key: peaks[key] / lichtenberg_defaults[key] for key in ("peak_gflops", "peak_memory_bandwidth")
+                      if key in peaks and lichtenberg_defaults.get(key)}
+        results = {
+            "calibration": {
+                "node_type": measured.get("node_type"),
+                "node": measured.get("node"),
+                "measured": measured,
+                "peaks": peaks,
+                "of_nominal": of_nominal,
+                "cached": entry is not None,
+            }
+        }
+        return self.job_id, {"calibration": self.calibration}, results
@@ -0,0 +1,139 @@
+"""
+Calibrated node values: memory bandwidth, flop peak and MPI latencies as measured by a CalibrationRun. They are cached
+per node type in a json file, and expire after a while (BIOS, firmware or kernel updates change them). Without fresh
+values, the nominal values of lichtenberg_defaults are used.
+"""
+import json
+import os
+import re
+import time
+from typing import Iterable, Optional
+
+calibration_file = os.path.expanduser("~/issm-output/calibration.json")
+default_max_age_days = 30
+
+_vendor_marks = re.compile(r"\(r\)|\(tm\)|®|™|\bcpu\b|@.*$", re.IGNORECASE)
+# measured values, that are taken over as they are
+_mpi_values = ["mpi_pingpong_latency_us", "mpi_pingpong_bandwidth", "mpi_allreduce_latency_us"]
+
+
+def node_type(cpu: str) -> str:
+    """
+    Comparable name of a cpu model: "Intel(R) Xeon(R) Platinum 9242 CPU @ 2.30GHz" (lscpu) and
+    "Intel® Xeon® Platinum 9242" both are "intel xeon platinum 9242".
+    """
+    return " ".join(_vendor_marks.sub(" ", cpu or "").lower().split())
+
+
+def parse_calibration(lines: Iterable[str]) -> dict:
+    """
+    Reads the .calibration file of a CalibrationRun: one "key value" per line, as written by the kernels.
+    """
+    measured = {}
+    for line in lines:
+        key, _, value = line.strip().partition(" ")
+        value = value.strip()
+        if not key or not value:
+            continue
+        try:
+            number = float(value)
+            measured[key] = int(number) if number.is_integer() and "." not in value else number
+        except ValueError:
+            measured[key] = value
+    return measured
+
+
+def calibrated_peaks(measured: dict) -> dict:
+    """
+    The measured values under the keys of lichtenberg_defaults. The flop peak is scaled from the threads of the
+    kernel to all cores of the node. The bandwidth is taken as it is, it saturates before all cores are used.
+    """
+    peaks = {}
+    cores, sockets = measured.get("cpu_cores_total"), measured.get("cpu_count")
+    if measured.get("stream_triad_bandwidth"):
+        peaks["peak_memory_bandwidth"] = measured["stream_triad_bandwidth"]
+    if measured.get("peak_gflops"):
+        threads = measured.get("peak_threads")
+        scale = cores / threads if cores and threads and threads < cores else 1.0
+        peaks["peak_gflops"] = measured["peak_gflops"] * scale
+    if cores and sockets:
+        peaks["cpu_count"] = sockets
+        peaks["cpu_cores"] = cores // sockets
+    for key in _mpi_values:
+        if key in measured:
+            peaks[key] = measured[key]
+    return peaks
+
+
+class CalibrationCache:
+    """
+    The calibrated values per node type, in a json file.
+    """
+
+    def __init__(self, path: str = calibration_file, max_age_days: float = default_max_age_days):
+        """
+        Constructor.
+        :param path: The json file of the cache.
+        :param max_age_days: Calibrations older than this are ignored.
+        """
+        self.path = path
+        self.max_age_days = max_age_days
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def store(self, measured: dict, job_id=None) -> Optional[dict]:
+        """
+        Stores the values of a calibration run for its node type. Replaces an older calibration of the node type.
+        """
+        key = node_type(measured.get("node_type"))
+        if not key:
+            print("Calibration without node type, not cached.")
+            return None
+        entry = {
+            "node_type": measured.get("node_type"),
+            "node": measured.get("node"),
+            "job_id": job_id,
+            "measured_at": time.time(),
+            "peaks": calibrated_peaks(measured),
+            "measured": measured,
+        }
+        cache = self.load()
+        cache[key] = entry
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # write and rename, a reader never sees a half written cache
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(cache, f, indent=4)
+        os.replace(f"{self.path}.tmp", self.path)
+        return entry
+
+    def get(self, cpu: str) -> Optional[dict]:
+        """
+        The calibration of the node type of the cpu, None if there is none or it is expired.
+        """
+        entry = self.load().get(node_type(cpu))
+        if entry is None:
+            return None
+        age_days = (time.time() - entry["measured_at"]) / 86400
+        if age_days > self.max_age_days:
+            print(f"Calibration of {entry['node_type']} is {age_days:.0f} days old, using the nominal values. "
+                  f"Submit a CalibrationRun to renew it.")
+            return None
+        return entry
+
+    def peaks(self, cpu: str, defaults: dict) -> dict:
+        """
+        The defaults, overridden by the calibrated values of the node type. "calibration" tells where they are from.
+        """
+        peaks = dict(defaults)
+        entry = self.get(cpu)
+        peaks["calibration"] = None
+        if entry:
+            peaks.update(entry["peaks"])
+            peaks["calibration"] = {"job_id": entry["job_id"], "node": entry["node"],
+                                    "measured_at": entry["measured_at"]}
+        return peaks
@@ -0,0 +1,114 @@
+"""
+Streaming reader for callgrind out files (valgrind --tool=callgrind).
+Collects the self cost per source line and per function, for the first event (Ir, if not configured otherwise).
+Format: https://valgrind.org/docs/manual/cl-format.html
+"""
+from typing import Dict, Tuple
+
+
+class CallgrindProfile:
+    """
+    Self costs of a callgrind run.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.totals = None
+        # (file, line): self cost
+        self.line_costs: Dict[Tuple[str, int], int] = {}
+        # function: self cost
+        self.function_costs: Dict[str, int] = {}
+        # function: (file, first line with cost, last line with cost)
+        self.function_lines: Dict[str, Tuple[str, int, int]] = {}
+
+    @property
+    def total(self) -> int:
+        return self.totals if self.totals else sum(self.function_costs.values())
+
+
+def _compressed(names: dict, value: str) -> str:
+    """
+    Resolves name compression: "(3) name" defines id 3, "(3)" refers to it.
+    """
+    value = value.strip()
+    if value.startswith("("):
+        end = value.find(")")
+        key, name = value[1:end], value[end + 1:].strip()
+        if name:
+            names[key] = name
+            return name
+        return names.get(key, key)
+    return value
+
+
+def read_callgrind(path: str, event: int = 0) -> CallgrindProfile:
+    """
+    Reads a callgrind out file line by line.
+    :param path: The callgrind out file.
+    :param event: Index of the event in the "events:" line to collect.
+    """
+    profile = CallgrindProfile()
+    files, functions = {}, {}
+    file, function = None, None
+    positions = 1
+    last = [0]
+    skip_next_cost = False
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            if not line or line[0] == "#" or line == "\n":
+                continue
+            c = line[0]
+            if c.isdigit() or c in "+-*":
+                elms = line.split()
+                # positions, with relative compression
+                for i in range(positions):
+                    p = elms[i]
+                    if p == "*":
+                        continue
+                    if p[0] == "+":
+                        last[i] += int(p[1:], 0)
+                    elif p[0] == "-":
+                        last[i] -= int(p[1:], 0)
+                    else:
+                        last[i] = int(p, 0)
+                if skip_next_cost:
+                    # inclusive cost of a call, not self cost of this line. Its position still counts for the
+                    # relative positions of the next lines.
+                    skip_next_cost = False
+                    continue
+                if len(elms) <= positions + event:
+                    continue
+                cost = int(elms[positions + event])
+                if cost == 0:
+                    continue
+                source_line = last[positions - 1]
+                key = (file, source_line)
+                profile.line_costs[key] = profile.line_costs.get(key, 0) + cost
+                profile.function_costs[function] = profile.function_costs.get(function, 0) + cost
+                span = profile.function_lines.get(function)
+                if span is None:
+                    profile.function_lines[function] = (file, source_line, source_line)
+                elif span[0] == file and source_line > 0:
+                    profile.function_lines[function] = (file, min(span[1], source_line), max(span[2], source_line))
+                continue
+            key, _, value = line.rstrip("\n").partition("=")
+            if key in ("fl", "fi", "fe"):
+                file = _compressed(files, value)
+            elif key == "fn":
+                function = _compressed(functions, value)
+            elif key in ("cfi", "cfl"):
+                _compressed(files, value)
+            elif key == "cfn":
+                _compressed(functions, value)
+            elif key == "calls":
+                skip_next_cost = True
+            elif line.startswith("positions:"):
+                positions = len(line.split(":", 1)[1].split())
+                last = [0] * positions
+            elif line.startswith("events:"):
+                profile.events = line.split(":", 1)[1].split()
+            elif line.startswith("totals:") or line.startswith("summary:"):
+                values = line.split(":", 1)[1].split()
+                if len(values) > event:
+                    profile.totals = int(values[event])
+    return profile
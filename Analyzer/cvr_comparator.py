@@ -0,0 +1,88 @@
+from Analyzer.cvr_index import VectorizationIndex
+
+
+class CVRComparator:
+    """
+    Compares compiler vectorization reports loop by loop:
+    GCC and LLVM builds of the same app side by side, and every report with the first report of the same compiler
+    (another build or another app variant), as a diff.
+    """
+
+    def __init__(self, jobs: dict, results: dict):
+        """
+        Constructor.
+        :param jobs: The "jobs" part of the analyzer results, with settings and tool per job.
+        :param results: The "results" part of the analyzer results, per job.
+        """
+        self.jobs = jobs
+        self.analyzer_results = results
+        self.results = {}
+
+    def reports(self):
+        """
+        The reports as normalized index, with app and compiler, in job order.
+        """
+        reports = []
+        for job_id in sorted(self.jobs.keys(), key=str):
+            job = self.jobs[job_id]
+            if job.get("tool") != "COMPILER-VEC-REPORT":
+                continue
+            report = self.analyzer_results.get(job_id, {}).get("compiler_vectorization")
+            if report is None:
+                continue
+            settings = job["settings"]
+            reports.append((job_id, f"{settings.get('app')}", settings.get("compiler"),
+                            VectorizationIndex.from_dict(report)))
+        return reports
+
+    @staticmethod
+    def side_by_side(gcc: VectorizationIndex, llvm: VectorizationIndex) -> dict:
+        """
+        Loops are matched by file and line, the compilers do not always agree on the column.
+        """
+        gcc, llvm = gcc.by_line(), llvm.by_line()
+        rows = []
+        counts = {"both": 0, "gcc_only": 0, "llvm_only": 0, "neither": 0, "only_in_one_report": 0}
+        for key in sorted(set(gcc.loops) | set(llvm.loops)):
+            g, l = gcc.status(key), llvm.status(key)
+            rows.append({"file": key[0], "line": key[1],
+                         "gcc": g._asdict() if g else None, "llvm": l._asdict() if l else None})
+            if g is None or l is None:
+                counts["only_in_one_report"] += 1
+            elif g.vectorized and l.vectorized:
+                counts["both"] += 1
+            elif g.vectorized:
+                counts["gcc_only"] += 1
+            elif l.vectorized:
+                counts["llvm_only"] += 1
+            else:
+                counts["neither"] += 1
+        return {"vectorized": counts, "loops": rows}
+
+    def analyze(self):
+        print("CVR Compare!!")
+        reports = self.reports()
+        self.results["compiler_vectorization_side_by_side"] = {}
+        by_app = {}
+        for job_id, app, compiler, index in reports:
+            # with several reports of the same build, the last one is used
+            by_app.setdefault(app, {})[compiler] = (job_id, index)
+        for app, builds in by_app.items():
+            if "GCC" not in builds or "LLVM" not in builds:
+                continue
+            gcc_job, gcc = builds["GCC"]
+            llvm_job, llvm = builds["LLVM"]
+            result = {"gcc_job": gcc_job, "llvm_job": llvm_job}
+            result.update(self.side_by_side(gcc, llvm))
+            self.results["compiler_vectorization_side_by_side"][app] = result
+        self.results["compiler_vectorization_diff"] = {}
+        baselines = {}
+        for job_id, app, compiler, index in reports:
+            if compiler not in baselines:
+                baselines[compiler] = (job_id, app, index)
+                continue
+            base_job, base_app, base = baselines[compiler]
+            result = {"before_job": base_job, "before_app": base_app, "after_job": job_id, "after_app": app}
+            result.update(base.diff(index))
+            self.results["compiler_vectorization_diff"][f"{base_job}-{job_id}"] = result
+        return self.results
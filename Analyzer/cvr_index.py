@@ -0,0 +1,164 @@
+"""
+Keyed store for the loops of a compiler vectorization report, and diffs between two reports.
+"""
+import os
+from collections import namedtuple
+from typing import Dict, Iterator, Optional, Tuple
+
+
+def normalize_source(path: str, anchor: str = "src/c") -> str:
+    """
+    Makes source paths of different builds comparable: the path from the anchor on, e.g. src/c/classes/Node.cpp.
+    GCC reports paths relative to the build dir, LLVM absolute ones.
+    """
+    path = os.path.normpath(path)
+    index = path.find(anchor)
+    return path[index:] if index >= 0 else path
+
+
+class LoopReport(namedtuple("LoopReport", ["vectorized", "vector_bits", "vectorization_factor", "reason"])):
+    """
+    One report of the compiler for a loop. A tuple, so reports can be deduplicated in sets.
+    """
+    __slots__ = ()
+
+    @property
+    def width(self):
+        """
+        Vector width: bits for GCC, number of lanes for LLVM.
+        """
+        return self.vector_bits if self.vector_bits is not None else self.vectorization_factor
+
+
+class VectorizationIndex:
+    """
+    The loops of a vectorization report, keyed by (file, line, column).
+    Every key holds the set of distinct reports of the compiler for it: a loop in a header, or an inlined loop, can be
+    reported several times and with different results.
+    """
+
+    def __init__(self, normalize: bool = False, anchor: str = "src/c"):
+        """
+        Constructor.
+        :param normalize: Store the files normalized with normalize_source, so the index can be compared with the
+        index of another build.
+        :param anchor: Anchor for the normalization.
+        """
+        self.normalize = normalize
+        self.anchor = anchor
+        # (file, line, column): dict of LoopReport: None, a set with insertion order
+        self.loops: Dict[Tuple[str, int, int], Dict[LoopReport, None]] = {}
+
+    def __len__(self):
+        return len(self.loops)
+
+    def __contains__(self, key):
+        return key in self.loops
+
+    def add(self, source: str, line: int, column: int, vectorized: bool, vector_bits: int = None,
+            vectorization_factor: int = None, reason: str = None) -> bool:
+        """
+        Adds a report for a loop. Returns False, if the same report was there already.
+        """
+        if self.normalize:
+            source = normalize_source(source, self.anchor)
+        reports = self.loops.setdefault((source, line, column), {})
+        report = LoopReport(vectorized, vector_bits, vectorization_factor, reason)
+        if report in reports:
+            return False
+        reports[report] = None
+        return True
+
+    def reports(self, key) -> Iterator[LoopReport]:
+        return iter(self.loops.get(key, {}))
+
+    def status(self, key) -> Optional[LoopReport]:
+        """
+        One report for the loop: vectorized, if any report is, with the widest vector. Otherwise missed, with all
+        reasons given for it.
+        """
+        best = None
+        reasons = []
+        for report in self.loops.get(key, {}):
+            if best is None or (report.vectorized and not best.vectorized) or \
+                    (report.vectorized and best.vectorized and (report.width or 0) > (best.width or 0)):
+                best = report
+            if not report.vectorized and report.reason and report.reason.strip() not in reasons:
+                reasons.append(report.reason.strip())
+        if best is not None and not best.vectorized and len(reasons) > 1:
+            best = best._replace(reason="; ".join(reasons))
+        return best
+
+    def by_line(self) -> "VectorizationIndex":
+        """
+        A copy keyed by (file, line, 0). For comparing compilers, they do not always agree on the column.
+        """
+        index = VectorizationIndex(self.normalize, self.anchor)
+        for (source, line, column), reports in self.loops.items():
+            index.loops.setdefault((source, line, 0), {}).update(reports)
+        return index
+
+    def as_dict(self) -> dict:
+        """
+        The per-file schema of the analyzer results: file: list of dicts with line, column, vectorized, vector_bits,
+        vectorization_factor and reason.
+        """
+        results = {}
+        for (source, line, column), reports in self.loops.items():
+            entries = results.setdefault(source, [])
+            for report in reports:
+                entries.append({
+                    "line": line,
+                    "column": column,
+                    "vectorized": report.vectorized,
+                    "vector_bits": report.vector_bits,
+                    "vectorization_factor": report.vectorization_factor,
+                    "reason": report.reason,
+                })
+        return results
+
+    @classmethod
+    def from_dict(cls, results: dict, normalize: bool = True, anchor: str = "src/c") -> "VectorizationIndex":
+        """
+        Builds the index from the analyzer results (as_dict schema).
+        """
+        index = cls(normalize, anchor)
+        for source, entries in results.items():
+            for entry in entries:
+                index.add(source, entry["line"], entry["column"], entry["vectorized"], entry.get("vector_bits"),
+                          entry.get("vectorization_factor"), entry.get("reason"))
+        return index
+
+    @staticmethod
+    def _row(key, before: Optional[LoopReport], after: Optional[LoopReport], reason: Optional[str]) -> dict:
+        return {
+            "file": key[0],
+            "line": key[1],
+            "column": key[2],
+            "width_before": before.width if before else None,
+            "width_after": after.width if after else None,
+            "reason": reason,
+        }
+
+    def diff(self, other: "VectorizationIndex") -> dict:
+        """
+        Compares this index (before) with another one (after), loop by loop. Loops that are in only one of them
+        are counted, but not listed.
+        :return: Dict with newly_vectorized (with the reason it was missed before), stopped_vectorizing (with the
+        reason it is missed now) and width_changed.
+        """
+        result = {"newly_vectorized": [], "stopped_vectorizing": [], "width_changed": [],
+                  "only_before": 0, "only_after": 0}
+        for key in self.loops:
+            if key not in other.loops:
+                result["only_before"] += 1
+                continue
+            before, after = self.status(key), other.status(key)
+            if after.vectorized and not before.vectorized:
+                result["newly_vectorized"].append(self._row(key, before, after, before.reason))
+            elif before.vectorized and not after.vectorized:
+                result["stopped_vectorizing"].append(self._row(key, before, after, after.reason))
+            elif before.vectorized and after.vectorized and before.width != after.width:
+                result["width_changed"].append(self._row(key, before, after, None))
+        result["only_after"] = len([key for key in other.loops if key not in self.loops])
+        return result
@@ -0,0 +1,255 @@
+"""
+Single pass parser for the text output of gprof (flat profile and call graph), into an indexed call graph.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Union
+
+# 19.81     10.22    10.22    62500     0.00     0.00  EnthalpyAnalysis::CreateKMatrixVolume(Element*)
+# calls and the per call times are empty for functions without call counts
+_flat = re.compile(r"^\s*(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)(?:\s+(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+))?\s+(\S.*?)\s*$")
+# [2]    100.0    0.00    0.05       1+2       main [2]
+_primary = re.compile(r"^\[(\d+)\]\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(?:(\d+)(?:\+(\d+))?\s+)?(.+?)\s+\[(\d+)\]\s*$")
+#                 0.00    0.05       1/1           report [3]
+# recursive calls have no times:    2             report <cycle 1> [3]
+_edge = re.compile(r"^\s+(?:(\d+\.\d+)\s+(\d+\.\d+)\s+)?(\d+)(?:[/+](\d+))?\s+(.+?)\s+\[(\d+)\]\s*$")
+_cycle = re.compile(r"\s+<cycle \d+(?: as a whole)?>$")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Name without the cycle annotation of gprof.
+    """
+    return _cycle.sub("", name)
+
+
+class CallEdge:
+    """
+    A call from caller to callee, with the time the callee (and its children) spent for this caller.
+    """
+
+    def __init__(self, caller: Optional[int], callee: int, self_time: Optional[float], children_time: Optional[float],
+                 count: int, total_count: Optional[int]):
+        self.caller = caller
+        self.callee = callee
+        self.self_time = self_time
+        self.children_time = children_time
+        self.count = count
+        self.total_count = total_count
+
+    @property
+    def time(self) -> float:
+        return (self.self_time or 0.0) + (self.children_time or 0.0)
+
+    def as_dict(self):
+        return {
+            "caller": self.caller,
+            "callee": self.callee,
+            "self_time": self.self_time,
+            "children_time": self.children_time,
+            "count": self.count,
+            "total_count": self.total_count,
+        }
+
+
+class GProfFunction:
+    """
+    A function of the profile, with its flat profile values and its entry in the call graph.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.index = None
+        # flat profile
+        self.percentage = None
+        self.cumulative_seconds = None
+        self.self_seconds = None
+        self.calls = None
+        self.self_ms_call = None
+        self.total_ms_call = None
+        # call graph
+        self.total_percentage = None
+        self.self_time = None
+        self.children_time = None
+        self.called = None
+        self.called_recursive = None
+        self.spontaneous = False
+        self.callers: List[CallEdge] = []
+        self.callees: List[CallEdge] = []
+
+    @property
+    def inclusive_time(self) -> float:
+        """
+        Self time plus the time of the children, as gprof propagated it.
+        """
+        if self.self_time is None:
+            return self.self_seconds or 0.0
+        return self.self_time + (self.children_time or 0.0)
+
+
+class GProfProfile:
+    """
+    The parsed profile. Functions can be looked up by their call graph index and by name.
+    """
+
+    def __init__(self):
+        # functions in flat profile order
+        self.flat: List[GProfFunction] = []
+        self.by_index: Dict[int, GProfFunction] = {}
+        self.by_name: Dict[str, GProfFunction] = {}
+        # primary call graph entries, in order
+        self.graph: List[GProfFunction] = []
+
+    def _get(self, name: str) -> GProfFunction:
+        function = self.by_name.get(name)
+        if function is None:
+            # the call graph names functions in cycles "name <cycle N>", the flat profile does not
+            normalized = normalize_name(name)
+            function = self.by_name.get(normalized)
+            if function is None:
+                function = GProfFunction(name)
+                self.by_name[normalized] = function
+            self.by_name[name] = function
+        return function
+
+    def function(self, key: Union[int, str]) -> Optional[GProfFunction]:
+        if isinstance(key, int):
+            return self.by_index.get(key)
+        return self.by_name.get(key) or self.by_name.get(normalize_name(key))
+
+    @property
+    def total_time(self) -> float:
+        return sum(f.self_seconds or 0.0 for f in self.flat)
+
+    def inclusive_time(self, key: Union[int, str]) -> Optional[float]:
+        """
+        Inclusive time of the subtree of a function.
+        """
+        function = self.function(key)
+        return function.inclusive_time if function else None
+
+    def subtree(self, key: Union[int, str], max_depth: int = None) -> List[GProfFunction]:
+        """
+        All functions reachable from the given one, breadth first, each once.
+        """
+        start = self.function(key)
+        if start is None:
+            return []
+        seen = {start.index}
+        result = [start]
+        level, depth = [start], 0
+        while level and (max_depth is None or depth < max_depth):
+            next_level = []
+            for function in level:
+                for edge in function.callees:
+                    if edge.callee in seen or edge.callee not in self.by_index:
+                        continue
+                    seen.add(edge.callee)
+                    next_level.append(self.by_index[edge.callee])
+            result.extend(next_level)
+            level, depth = next_level, depth + 1
+        return result
+
+    def critical_path(self, start: Union[int, str] = "main") -> List[GProfFunction]:
+        """
+        Follows the most expensive call from start on, until a leaf (or a cycle) is reached.
+        """
+        function = self.function(start)
+        path = []
+        seen = set()
+        while function is not None and function.index not in seen:
+            path.append(function)
+            seen.add(function.index)
+            edges = [e for e in function.callees if e.callee not in seen and e.callee in self.by_index]
+            if not edges:
+                break
+            function = self.by_index[max(edges, key=lambda e: e.time).callee]
+        return path
+
+
+def parse_gprof(path: str) -> GProfProfile:
+    """
+    Reads a gprof text output file in one pass.
+    """
+    with open(path, "r", errors="replace") as f:
+        return parse_gprof_lines(f)
+
+
+def parse_gprof_lines(lines: Iterable[str]) -> GProfProfile:
+    """
+    Parses gprof text output line by line, e.g. from a file or the captured output of gprof.
+    """
+    profile = GProfProfile()
+    section = None
+    # lines of the current call graph block, before and after its primary line
+    callers, primary, spontaneous = [], None, False
+    for line in lines:
+        if section is None:
+            if line.lstrip().startswith("time   seconds"):
+                section = "flat"
+            elif line.startswith("index % time"):
+                section = "graph"
+            continue
+        if section == "flat":
+            match = _flat.match(line)
+            if not match:
+                # the flat profile ends with an empty line
+                section = None
+                continue
+            function = profile._get(match.group(7))
+            function.percentage = float(match.group(1))
+            function.cumulative_seconds = float(match.group(2))
+            function.self_seconds = float(match.group(3))
+            if match.group(4):
+                function.calls = int(match.group(4))
+                function.self_ms_call = float(match.group(5))
+                function.total_ms_call = float(match.group(6))
+            profile.flat.append(function)
+            continue
+        # call graph
+        if line.startswith("---"):
+            callers, primary, spontaneous = [], None, False
+            continue
+        if not line.strip():
+            if profile.graph:
+                section = None
+            continue
+        if line[0] == "[":
+            match = _primary.match(line)
+            if not match:
+                continue
+            primary = profile._get(match.group(7))
+            primary.index = int(match.group(8))
+            primary.total_percentage = float(match.group(2))
+            primary.self_time = float(match.group(3))
+            primary.children_time = float(match.group(4))
+            primary.called = int(match.group(5)) if match.group(5) else None
+            primary.called_recursive = int(match.group(6)) if match.group(6) else None
+            primary.spontaneous = spontaneous
+            profile.by_index[primary.index] = primary
+            profile.graph.append(primary)
+            for edge in callers:
+                edge.callee = primary.index
+                primary.callers.append(edge)
+            continue
+        if "<spontaneous>" in line:
+            spontaneous = True
+            continue
+        match = _edge.match(line)
+        if not match:
+            continue
+        edge = CallEdge(
+            caller=None,
+            callee=int(match.group(6)),
+            self_time=float(match.group(1)) if match.group(1) else None,
+            children_time=float(match.group(2)) if match.group(2) else None,
+            count=int(match.group(3)),
+            total_count=int(match.group(4)) if match.group(4) else None,
+        )
+        if primary is None:
+            # a caller of the coming primary entry
+            edge.caller = edge.callee
+            callers.append(edge)
+        else:
+            edge.caller = primary.index
+            primary.callees.append(edge)
+    return profile
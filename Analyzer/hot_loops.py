@@ -0,0 +1,170 @@
+from bisect import bisect_left, bisect_right
+
+from Analyzer.cvr_index import VectorizationIndex, normalize_source
+
+
+class HotLoopCorrelator:
+    """
+    Joins the compiler vectorization reports with the profiles of the same app: which loops consume the time, and
+    are they vectorized?
+    With a callgrind profile, the cost of a loop is the self cost of its source lines: from the loop line to the next
+    loop in the same function, or the end of the function. This is an approximation, nested loops share their lines.
+    With a gprof profile (and the nm symbols of the run), the self time of a function is split evenly over its loops.
+    """
+
+    def __init__(self, jobs: dict, results: dict, top_loops: int = 20):
+        """
+        Constructor.
+        :param jobs: The "jobs" part of the analyzer results, with settings and tool per job.
+        :param results: The "results" part of the analyzer results, per job.
+        :param top_loops: Number of hot unvectorized loops to report per app variant.
+        """
+        self.jobs = jobs
+        self.analyzer_results = results
+        self.top_loops = top_loops
+        self.results = {}
+
+    def _jobs_of(self, tool: str, result_key: str):
+        """
+        (job_id, app, compiler, result) of all jobs of the tool, that have the given result, in job order.
+        """
+        found = []
+        for job_id in sorted(self.jobs.keys(), key=str):
+            job = self.jobs[job_id]
+            result = self.analyzer_results.get(job_id, {}).get(result_key)
+            if job.get("tool") != tool or result is None:
+                continue
+            settings = job["settings"]
+            found.append((job_id, f"{settings.get('app')}", settings.get("compiler"), result))
+        return found
+
+    @staticmethod
+    def _loops_per_function(loops, function_of):
+        """
+        Groups the loop keys by function, sorted by line.
+        """
+        per_function = {}
+        for key in loops:
+            per_function.setdefault(function_of(key), []).append(key)
+        for keys in per_function.values():
+            keys.sort(key=lambda k: k[1])
+        return per_function
+
+    def callgrind_costs(self, loops, callgrind: dict):
+        """
+        Cost per loop, from the line costs of callgrind.
+        """
+        lines_per_file = {}
+        for file, line, cost in callgrind["lines"]:
+            lines_per_file.setdefault(normalize_source(file), []).append((line, cost))
+        # per file: sorted lines and prefix sums of their costs, to sum up line ranges fast
+        prefix = {}
+        for file, entries in lines_per_file.items():
+            entries.sort()
+            sums = [0]
+            for _, cost in entries:
+                sums.append(sums[-1] + cost)
+            prefix[file] = ([line for line, _ in entries], sums)
+        spans = [(name, normalize_source(f["file"]), f["first_line"], f["last_line"])
+                 for name, f in callgrind["functions"].items() if f["file"]]
+
+        def function_of(key):
+            best, width = None, None
+            for name, file, first, last in spans:
+                if file == key[0] and first <= key[1] <= last and (width is None or last - first < width):
+                    best, width = name, last - first
+            return best
+
+        def range_cost(file, first, last):
+            if file not in prefix:
+                return 0
+            lines, sums = prefix[file]
+            return sums[bisect_right(lines, last)] - sums[bisect_left(lines, first)]
+
+        functions = callgrind["functions"]
+        costs = {}
+        for function, keys in self._loops_per_function(loops, function_of).items():
+            for i, key in enumerate(keys):
+                if function is None:
+                    end = key[1]
+                elif i + 1 < len(keys):
+                    end = keys[i + 1][1] - 1
+                else:
+                    end = functions[function]["last_line"]
+                costs[key] = (function, range_cost(key[0], key[1], max(end, key[1])))
+        return costs, callgrind["total"]
+
+    def gprof_costs(self, loops, flat_profile: list, locations: dict):
+        """
+        Cost per loop, from the self time of the enclosing function in the flat profile.
+        The enclosing function is the one starting last before the loop, in the same file.
+        """
+        self_time = {e["name"]: e["individual_seconds"] or 0.0 for e in flat_profile if e["name"]}
+        starts = {}
+        for name, location in locations.items():
+            starts.setdefault(normalize_source(location["file"]), []).append((location["line"], name))
+        for entries in starts.values():
+            entries.sort()
+
+        def function_of(key):
+            entries = starts.get(key[0])
+            if not entries:
+                return None
+            i = bisect_right(entries, (key[1], chr(0x10ffff))) - 1
+            return entries[i][1] if i >= 0 else None
+
+        costs = {}
+        for function, keys in self._loops_per_function(loops, function_of).items():
+            for key in keys:
+                share = self_time.get(function, 0.0) / len(keys) if function else 0.0
+                costs[key] = (function, share)
+        return costs, sum(self_time.values())
+
+    def correlate(self, index: VectorizationIndex, costs: dict, total) -> dict:
+        covered, all_loops = 0, 0
+        unvectorized = []
+        for key, (function, cost) in costs.items():
+            status = index.status(key)
+            all_loops += cost
+            if status.vectorized:
+                covered += cost
+            elif cost > 0:
+                unvectorized.append({
+                    "file": key[0],
+                    "line": key[1],
+                    "function": function,
+                    "cost": cost,
+                    "share_of_total_percentage": 100 * cost / total if total else None,
+                    "reason": status.reason,
+                })
+        unvectorized.sort(key=lambda loop: -loop["cost"])
+        return {
+            # share of the time in loops, that is spent in vectorized loops
+            "vectorization_coverage_percentage": 100 * covered / all_loops if all_loops else None,
+            "loop_share_of_total_percentage": 100 * all_loops / total if total else None,
+            "hot_unvectorized_loops": unvectorized[:self.top_loops],
+        }
+
+    def analyze(self):
+        print("Hot loop correlation!!")
+        self.results["hot_loops"] = {}
+        callgrind = {app: (job_id, result) for job_id, app, _, result in
+                     self._jobs_of("VALGRIND-CALLGRIND", "callgrind")}
+        gprof = {app: (job_id, result) for job_id, app, _, result in self._jobs_of("GPROF", "flat_profile")}
+        for cvr_job, app, compiler, report in self._jobs_of("COMPILER-VEC-REPORT", "compiler_vectorization"):
+            index = VectorizationIndex.from_dict(report).by_line()
+            if app in callgrind:
+                profile_job, profile = callgrind[app]
+                costs, total = self.callgrind_costs(index.loops, profile)
+                source = "callgrind"
+            elif app in gprof and self.analyzer_results[gprof[app][0]].get("function_locations"):
+                profile_job, flat_profile = gprof[app]
+                costs, total = self.gprof_costs(index.loops, flat_profile,
+                                                self.analyzer_results[profile_job]["function_locations"])
+                source = "gprof"
+            else:
+                continue
+            result = {"cvr_job": cvr_job, "profile_job": profile_job, "profile": source}
+            result.update(self.correlate(index, costs, total))
+            self.results["hot_loops"][f"{app}_{compiler}"] = result
+        return self.results
@@ -0,0 +1,158 @@
+"""
+Streaming reader for LLVM optimization records (clang -fsave-optimization-record=yaml).
+The records are a stream of small YAML documents, one per remark. A full YAML parser is not needed for them and would
+load the whole (very large) file, so the documents are read line by line and yielded one by one.
+"""
+import re
+from typing import Iterator, Optional
+
+_file = re.compile(r"File:\s*('(?:[^']|'')*'|\"[^\"]*\"|[^,}]+)")
+_line = re.compile(r"Line:\s*(\d+)")
+_column = re.compile(r"Column:\s*(\d+)")
+_integer = re.compile(r"\d+")
+
+
+def _scalar(value: str) -> str:
+    """
+    Unquotes a YAML scalar. Single quoted strings escape ' as ''.
+    """
+    value = value.strip()
+    if len(value) >= 2 and value[0] == "'" and value[-1] == "'":
+        return value[1:-1].replace("''", "'")
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _debug_loc(value: str) -> Optional[tuple]:
+    """
+    Parses a flow mapping like { File: 'a.cpp', Line: 42, Column: 3 } to (file, line, column).
+    """
+    file, line = _file.search(value), _line.search(value)
+    if not file or not line:
+        return None
+    column = _column.search(value)
+    return _scalar(file.group(1)), int(line.group(1)), int(column.group(1)) if column else 0
+
+
+def _is_open(text: str) -> bool:
+    """
+    True, if a quoted string or a flow mapping is still open at the end of the text, so the next line continues it.
+    """
+    if "'" not in text and "{" not in text:
+        return False
+    quoted, depth = False, 0
+    for c in text:
+        if c == "'":
+            quoted = not quoted  # '' toggles twice, so escapes need no extra handling
+        elif not quoted and c == "{":
+            depth += 1
+        elif not quoted and c == "}":
+            depth -= 1
+    return quoted or depth > 0
+
+
+def _logical_lines(f) -> Iterator[str]:
+    """
+    Joins lines, that continue a quoted string or flow mapping of the line before.
+    """
+    pending = None
+    for line in f:
+        line = line.rstrip("\n")
+        if pending is not None:
+            pending += " " + line.strip()
+            if not _is_open(pending):
+                yield pending
+                pending = None
+        elif _is_open(line):
+            pending = line
+        else:
+            yield line
+    if pending is not None:
+        yield pending
+
+
+class Remark:
+    """
+    One optimization remark.
+    """
+
+    def __init__(self, kind: str):
+        # Passed, Missed or Analysis
+        self.kind = kind
+        self.pass_name = None
+        self.name = None
+        self.function = None
+        # (file, line, column) or None
+        self.loc = None
+        # list of (key, value) of the Args, in order
+        self.args = []
+
+    def arg(self, key: str) -> Optional[str]:
+        for k, v in self.args:
+            if k == key:
+                return v
+        return None
+
+    def message(self) -> str:
+        """
+        The remark text as the compiler prints it: all Args concatenated.
+        """
+        return "".join(v for k, v in self.args)
+
+    def vectorization_factor(self) -> Optional[int]:
+        """
+        Vectorization factor of a "Vectorized" remark. For scalable vectors ("vscale x 4"), the minimum factor.
+        """
+        value = self.arg("VectorizationFactor")
+        if value is None:
+            return None
+        match = _integer.search(value)
+        return int(match.group(0)) if match else None
+
+
+def read_remarks(path: str, passes: Optional[set] = None) -> Iterator[Remark]:
+    """
+    Yields the remarks of a YAML stream one by one.
+    :param path: The optimization record file. Several records can be concatenated into one file.
+    :param passes: Only yield remarks of these passes, e.g. {"loop-vectorize"}. Default: all.
+    """
+    remark = None
+    in_args = False
+    with open(path, "r", errors="replace") as f:
+        for line in _logical_lines(f):
+            if line.startswith("---"):
+                if remark and (not passes or remark.pass_name in passes):
+                    yield remark
+                tag = line[3:].strip()
+                remark = Remark(tag[1:] if tag.startswith("!") else tag)
+                in_args = False
+                continue
+            if remark is None:
+                continue
+            if line.startswith("..."):
+                if not passes or remark.pass_name in passes:
+                    yield remark
+                remark = None
+                continue
+            if not line.startswith(" "):
+                # top level key
+                in_args = False
+                key, _, value = line.partition(":")
+                if key == "Pass":
+                    remark.pass_name = _scalar(value)
+                elif key == "Name":
+                    remark.name = _scalar(value)
+                elif key == "Function":
+                    remark.function = _scalar(value)
+                elif key == "DebugLoc":
+                    remark.loc = _debug_loc(value)
+                elif key == "Args":
+                    in_args = True
+            elif in_args and line.lstrip().startswith("- "):
+                # an Args item; deeper indented lines belong to it (e.g. the DebugLoc of a callee) and are skipped
+                key, _, value = line.lstrip()[2:].partition(":")
+                if key.strip() != "DebugLoc":
+                    remark.args.append((key.strip(), _scalar(value)))
+    if remark and (not passes or remark.pass_name in passes):
+        yield remark
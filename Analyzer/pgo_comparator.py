@@ -0,0 +1,57 @@
+class PGOComparator:
+    """
+    Compares PGO runs with plain runs of the same app, resolution, compiler and rank count.
+    """
+
+    def __init__(self, jobs: dict, results: dict):
+        """
+        Constructor.
+        :param jobs: The "jobs" part of the analyzer results, with settings and tool per job.
+        :param results: The "results" part of the analyzer results, per job.
+        """
+        self.jobs = jobs
+        self.analyzer_results = results
+        self.results = {}
+
+    @staticmethod
+    def _median(values):
+        values = sorted(values)
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+    def group(self):
+        """
+        Groups the calculation times by configuration and by PGO/plain.
+        """
+        groups = {}
+        for job_id, job in self.jobs.items():
+            tool = job.get("tool")
+            if tool not in ["PGO", "VANILLA"]:
+                continue
+            time = self.analyzer_results.get(job_id, {}).get("calculation_time")
+            if time is None:
+                continue
+            settings = job["settings"]
+            key = f"{settings.get('app')}_{settings.get('model')}_{settings.get('compiler')}_MPI{settings.get('mpi_num_ranks')}"
+            groups.setdefault(key, {"PGO": {}, "VANILLA": {}})
+            groups[key][tool][job_id] = time
+        return groups
+
+    def analyze(self):
+        print("PGO Compare!!")
+        self.results["pgo_compare"] = {}
+        for key, group in self.group().items():
+            if not group["PGO"] or not group["VANILLA"]:
+                continue
+            pgo = self._median(list(group["PGO"].values()))
+            plain = self._median(list(group["VANILLA"].values()))
+            self.results["pgo_compare"][key] = {
+                "pgo_jobs": group["PGO"],
+                "plain_jobs": group["VANILLA"],
+                "pgo_calculation_time": pgo,
+                "plain_calculation_time": plain,
+                # > 1: the PGO build is faster
+                "pgo_speedup": plain / pgo if pgo else None,
+            }
+        print(self.results)
+        return self.results
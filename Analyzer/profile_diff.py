@@ -0,0 +1,276 @@
+"""
+Differential profiles: matches the functions of two sets of gprof, callgrind or Score-P results by their normalized
+name and compares their self and inclusive times. Repeated runs are compared as distributions (median and
+Mann-Whitney U test), not as single numbers.
+"""
+import math
+import re
+from typing import Dict, List, Optional
+
+_cycle = re.compile(r"\s+<cycle \d+(?: as a whole)?>$")
+# gcc clones: foo(int) [clone .constprop.0], foo.isra.0, foo.part.1, foo.cold
+_clone = re.compile(r"(?:\s*\[clone [^\]]*\])+$|(?:\.(?:constprop|isra|part|cold|lto_priv)(?:\.\d+)?)+$")
+# callgrind marks recursion levels: foo'2
+_recursion = re.compile(r"'\d+$")
+_space = re.compile(r"\s+")
+_pointer_space = re.compile(r"\s+([*&])")
+_comma_space = re.compile(r",\s+")
+
+profile_tools = {"GPROF": "gprof", "VALGRIND-CALLGRIND": "callgrind", "SCORE-P": "scorep"}
+
+
+def normalize_symbol(name: str, drop_arguments: bool = False) -> str:
+    """
+    Makes symbol names of different tools and builds comparable.
+    """
+    name = _cycle.sub("", name.strip())
+    name = _recursion.sub("", name)
+    name = _clone.sub("", name)
+    name = _space.sub(" ", name)
+    name = _comma_space.sub(",", _pointer_space.sub(r"\1", name))
+    if drop_arguments and "(" in name[1:]:
+        name = name[:name.index("(", 1)]
+    return name
+
+
+def function_times(tool: str, result: dict, drop_arguments: bool = False) -> Dict[str, dict]:
+    """
+    Self and inclusive time per normalized function name, from the analyzer results of a job.
+    Callgrind costs are in its event (Ir), not in seconds, and have no inclusive cost.
+    """
+    times = {}
+
+    def add(name, self_time, inclusive):
+        entry = times.setdefault(normalize_symbol(name, drop_arguments), {"self": 0.0, "inclusive": None})
+        entry["self"] += self_time or 0.0
+        if inclusive is not None:
+            entry["inclusive"] = (entry["inclusive"] or 0.0) + inclusive
+
+    if tool == "GPROF":
+        inclusive = {node["name"]: (node["individual_time"] or 0.0) + (node["in_children_time"] or 0.0)
+                     for node in result.get("call_graph", []) if node["name"]}
+        for entry in result.get("flat_profile", []):
+            if entry["name"]:
+                add(entry["name"], entry["individual_seconds"], inclusive.get(entry["name"]))
+    elif tool == "VALGRIND-CALLGRIND":
+        for name, function in result.get("callgrind", {}).get("functions", {}).items():
+            add(name, function["cost"], None)
+    elif tool == "SCORE-P":
+        for name, region in result.get("scorep", {}).get("regions", {}).items():
+            add(name, region["exclusive_time"], region["inclusive_time"])
+    return times
+
+
+def median(values: List[float]) -> Optional[float]:
+    values = sorted(values)
+    if not values:
+        return None
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def mann_whitney_u(a: List[float], b: List[float]) -> Optional[float]:
+    """
+    Two-sided p-value of the Mann-Whitney U test. Exact for small samples without ties, otherwise the normal
+    approximation with tie and continuity correction. None with less than two values on a side.
+    """
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return None
+    values = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    # ranks, ties get the mean rank
+    ranks = [0.0] * len(values)
+    tie_term = 0
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+    r1 = sum(rank for rank, (_, side) in zip(ranks, values) if side == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2
+    u = min(u1, n1 * n2 - u1)
+    if tie_term == 0 and n1 + n2 <= 20:
+        # exact: number of orderings with U <= u, counted over the placements of the first sample
+        counts = _u_distribution(n1, n2)
+        p = 2 * sum(counts[:int(u) + 1]) / sum(counts)
+        return min(p, 1.0)
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u1 - n1 * n2 / 2) - 0.5) / sigma
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def min_p_value(n1: int, n2: int) -> float:
+    """
+    Smallest two-sided p-value the Mann-Whitney U test can give for samples of size n1 and n2, all of one sample
+    below all of the other. E.g. 0.33 for 2 and 2 runs, 0.1 for 3 and 3, 0.057 for 3 and 4, 0.029 for 4 and 4.
+    """
+    return min(1.0, 2 / math.comb(n1 + n2, n1))
+
+
+def _u_distribution(n1: int, n2: int) -> List[int]:
+    """
+    Frequencies of U = 0..n1*n2 over all arrangements of two samples of size n1 and n2.
+    """
+    # table[i][j] is the distribution for samples of size i and j
+    table = [[None] * (n2 + 1) for _ in range(n1 + 1)]
+    for i in range(n1 + 1):
+        for j in range(n2 + 1):
+            if i == 0 or j == 0:
+                table[i][j] = [1]
+                continue
+            # the largest value is in the first sample (adds j to U) or in the second one
+            first, second = table[i - 1][j], table[i][j - 1]
+            dist = [0] * (i * j + 1)
+            for u, c in enumerate(first):
+                dist[u + j] += c
+            for u, c in enumerate(second):
+                dist[u] += c
+            table[i][j] = dist
+    return table[n1][n2]
+
+
+class ProfileDiff:
+    """
+    Compares function times before and after a change. Every side is a list of runs, each a dict of
+    name: {"self": ..., "inclusive": ...} as from function_times.
+    """
+
+    def __init__(self, before: List[Dict[str, dict]], after: List[Dict[str, dict]], regression_threshold: float = 0.05,
+                 alpha: float = 0.05, hotspot_share: float = 0.01, min_share: float = 0.001):
+        """
+        Constructor.
+        :param regression_threshold: Relative change of the median self time, that counts as regression/improvement.
+        :param alpha: Significance level, if both sides have enough repeated runs for the U test to reach it,
+        e.g. 4 each for 0.05. With fewer runs, only the regression threshold decides.
+        :param hotspot_share: Share of the total self time, from which a function is a hotspot.
+        :param min_share: Functions below this share on both sides are not listed.
+        """
+        self.before = before
+        self.after = after
+        self.regression_threshold = regression_threshold
+        self.alpha = alpha
+        self.hotspot_share = hotspot_share
+        self.min_share = min_share
+
+    @staticmethod
+    def _series(runs, name, key):
+        # a function missing in a run took no time there
+        values = [run[name][key] if name in run else 0.0 for run in runs]
+        return [v for v in values if v is not None]
+
+    def diff(self) -> dict:
+        total_before = median([sum(f["self"] for f in run.values()) for run in self.before]) or 0.0
+        total_after = median([sum(f["self"] for f in run.values()) for run in self.after]) or 0.0
+        names = set()
+        for run in self.before + self.after:
+            names.update(run.keys())
+        functions, regressions, improvements, new_hotspots, removed_hotspots = [], [], [], [], []
+        for name in names:
+            self_before = self._series(self.before, name, "self")
+            self_after = self._series(self.after, name, "self")
+            before, after = median(self_before) or 0.0, median(self_after) or 0.0
+            share_before = before / total_before if total_before else 0.0
+            share_after = after / total_after if total_after else 0.0
+            if share_before < self.min_share and share_after < self.min_share:
+                continue
+            inclusive_before = median(self._series(self.before, name, "inclusive"))
+            inclusive_after = median(self._series(self.after, name, "inclusive"))
+            p_value = mann_whitney_u(self_before, self_after)
+            if p_value is not None and min_p_value(len(self_before), len(self_after)) >= self.alpha:
+                # too few runs, the test can never be significant
+                p_value = None
+            relative = (after - before) / before if before else None
+            entry = {
+                "name": name,
+                "self_before": before,
+                "self_after": after,
+                "self_delta": after - before,
+                "self_relative": relative,
+                "inclusive_before": inclusive_before,
+                "inclusive_after": inclusive_after,
+                "inclusive_delta": inclusive_after - inclusive_before
+                if inclusive_before is not None and inclusive_after is not None else None,
+                "p_value": p_value,
+            }
+            functions.append(entry)
+            significant = p_value is None or p_value < self.alpha
+            if relative is not None and significant:
+                if relative > self.regression_threshold:
+                    regressions.append(name)
+                elif relative < -self.regression_threshold:
+                    improvements.append(name)
+            if share_after >= self.hotspot_share > share_before:
+                new_hotspots.append(name)
+            elif share_before >= self.hotspot_share > share_after:
+                removed_hotspots.append(name)
+        functions.sort(key=lambda f: -abs(f["self_delta"]))
+        return {
+            "runs_before": len(self.before),
+            "runs_after": len(self.after),
+            "total_self_before": total_before,
+            "total_self_after": total_after,
+            "regressions": regressions,
+            "improvements": improvements,
+            "new_hotspots": new_hotspots,
+            "removed_hotspots": removed_hotspots,
+            "functions": functions,
+        }
+
+
+class ProfileDiffComparator:
+    """
+    Diffs the profiles of app variants: per profiling tool, resolution, compiler and rank count, every app is
+    compared with the first app in job order. Repeated runs of an app are taken as distribution.
+    """
+
+    def __init__(self, jobs: dict, results: dict, drop_arguments: bool = False):
+        """
+        Constructor.
+        :param jobs: The "jobs" part of the analyzer results, with settings and tool per job.
+        :param results: The "results" part of the analyzer results, per job.
+        :param drop_arguments: Match functions by name without argument list.
+        """
+        self.jobs = jobs
+        self.analyzer_results = results
+        self.drop_arguments = drop_arguments
+        self.results = {}
+
+    def group(self):
+        groups = {}
+        for job_id in sorted(self.jobs.keys(), key=str):
+            job = self.jobs[job_id]
+            tool = job.get("tool")
+            if tool not in profile_tools or job_id not in self.analyzer_results:
+                continue
+            times = function_times(tool, self.analyzer_results[job_id], self.drop_arguments)
+            if not times:
+                continue
+            settings = job["settings"]
+            key = f"{profile_tools[tool]}_{settings.get('model')}_{settings.get('compiler')}_MPI{settings.get('mpi_num_ranks')}"
+            groups.setdefault(key, {}).setdefault(f"{settings.get('app')}", []).append((job_id, times))
+        return groups
+
+    def analyze(self):
+        print("Profile diff!!")
+        self.results["profile_diff"] = {}
+        for key, apps in self.group().items():
+            names = list(apps.keys())
+            base = names[0]
+            for app in names[1:]:
+                result = {
+                    "before_app": base,
+                    "before_jobs": [job_id for job_id, _ in apps[base]],
+                    "after_app": app,
+                    "after_jobs": [job_id for job_id, _ in apps[app]],
+                }
+                result.update(ProfileDiff([t for _, t in apps[base]], [t for _, t in apps[app]]).diff())
+                self.results["profile_diff"][f"{key}:{base}-vs-{app}"] = result
+        return self.results
@@ -0,0 +1,129 @@
+"""
+Roofline model: places kernels by their arithmetic intensity (flop per byte of memory traffic) under the node's peak
+flop rate and memory bandwidth, as memory-bound or compute-bound, with their distance to the roof.
+"""
+from typing import List, Optional
+
+# PAPI counters used for the roofline. The memory traffic is estimated from the last level cache misses, one cache
+# line each: the uncore counters, that count the DRAM traffic directly, are not available through PAPI presets.
+flop_metrics = ["PAPI_DP_OPS", "PAPI_SP_OPS"]
+traffic_metric = "PAPI_L3_TCM"
+cache_line_bytes = 64
+
+
+class Roofline:
+    """
+    Roofline of a node, or of the part of the node a run uses.
+    """
+
+    def __init__(self, peak_gflops: float, peak_bandwidth: float):
+        """
+        Constructor.
+        :param peak_gflops: Peak flop rate in GFlop/s.
+        :param peak_bandwidth: Peak memory bandwidth in GB/s.
+        """
+        self.peak_gflops = peak_gflops
+        self.peak_bandwidth = peak_bandwidth
+
+    @classmethod
+    def for_run(cls, peaks: dict, used_cores: int = None) -> "Roofline":
+        """
+        Roofline for a run on used_cores of a node. The flop peak scales with the cores, the memory bandwidth is
+        taken as the full node bandwidth, a few cores per socket already come close to saturating it.
+        :param peaks: Dict with cpu_cores, cpu_count, peak_gflops and peak_memory_bandwidth, as lichtenberg_defaults.
+        """
+        cores = peaks["cpu_cores"] * peaks["cpu_count"]
+        share = min(1.0, used_cores / cores) if used_cores else 1.0
+        return cls(peaks["peak_gflops"] * share, peaks["peak_memory_bandwidth"])
+
+    @property
+    def ridge_point(self) -> float:
+        """
+        Arithmetic intensity, from which a kernel can be compute-bound.
+        """
+        return self.peak_gflops / self.peak_bandwidth
+
+    def attainable(self, intensity: float) -> float:
+        return min(self.peak_gflops, self.peak_bandwidth * intensity)
+
+    def place(self, name: str, flops: float, traffic_bytes: float, seconds: float) -> Optional[dict]:
+        """
+        Places a kernel on the roofline. None, if it has no flops, no traffic or no time.
+        """
+        if not flops or not traffic_bytes or not seconds:
+            return None
+        intensity = flops / traffic_bytes
+        gflops = flops / seconds / 1e9
+        attainable = self.attainable(intensity)
+        return {
+            "name": name,
+            "seconds": seconds,
+            "gflops": gflops,
+            "arithmetic_intensity": intensity,
+            "bound": "memory" if intensity < self.ridge_point else "compute",
+            "attainable_gflops": attainable,
+            # 1 is on the roof
+            "fraction_of_roof": gflops / attainable,
+            # factor to the roof
+            "distance_to_roof": attainable / gflops,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "peak_gflops": self.peak_gflops,
+            "peak_memory_bandwidth": self.peak_bandwidth,
+            "ridge_point": self.ridge_point,
+        }
+
+
+def roofline_table(regions: dict, roofline: Roofline, top: int = 20, locations: int = 1) -> List[dict]:
+    """
+    Roofline placement of the hotspot regions, by exclusive time, that have the counters.
+    :param regions: name: {"exclusive_time": ..., "metrics": {PAPI_...: value}}, as from the ScorePAnalyzer.
+    :param locations: Number of locations (ranks) the times and counters are summed over. The time is divided by
+    it, so the flop rate is the one of all locations together, as the roofline of the run.
+    """
+    table = []
+    for name, region in sorted(regions.items(), key=lambda item: -(item[1]["exclusive_time"] or 0.0)):
+        metrics = region.get("metrics", {})
+        flops = sum(metrics.get(m) or 0.0 for m in flop_metrics)
+        traffic = (metrics.get(traffic_metric) or 0.0) * cache_line_bytes
+        seconds = region["exclusive_time"] / locations if region["exclusive_time"] else None
+        point = roofline.place(name, flops, traffic, seconds)
+        if point:
+            table.append(point)
+        if len(table) >= top:
+            break
+    return table
+
+
+def plot_roofline(roofline: dict, points: List[dict], path: str, title: str = None) -> Optional[str]:
+    """
+    Headless roofline plot (matplotlib, Agg backend). Returns the path, or None, if matplotlib is not installed.
+    :param roofline: Roofline.as_dict()
+    :param points: Rows of roofline_table.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed, no roofline plot.")
+        return None
+    peak, bandwidth, ridge = roofline["peak_gflops"], roofline["peak_memory_bandwidth"], roofline["ridge_point"]
+    intensities = [p["arithmetic_intensity"] for p in points] + [ridge]
+    low, high = min(intensities) / 10, max(intensities) * 10
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.plot([low, ridge, high], [bandwidth * low, peak, peak], color="black")
+    for p in points:
+        ax.scatter(p["arithmetic_intensity"], p["gflops"], color="tab:blue" if p["bound"] == "memory" else "tab:red")
+        ax.annotate(p["name"][:30], (p["arithmetic_intensity"], p["gflops"]), fontsize=6)
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("Arithmetic intensity [Flop/Byte]")
+    ax.set_ylabel("Performance [GFlop/s]")
+    if title:
+        ax.set_title(title)
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+    return path
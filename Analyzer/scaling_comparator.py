@@ -0,0 +1,94 @@
+from Analyzer.profile_diff import median
+
+
+class ScalingComparator:
+    """
+    Inter-node scaling of the SCALING-STRONG and SCALING-WEAK runs. Per study, app, compiler and rank placement
+    (ranks per node, cpus per rank, distribution and hint; and resolution for strong scaling), the node counts are
+    compared to the smallest one: speedup and parallel efficiency, and how the communication share of the run time
+    (from the PETSc log view) grows with the nodes.
+    """
+
+    tools = {"SCALING-STRONG": "strong", "SCALING-WEAK": "weak"}
+
+    def __init__(self, jobs: dict, results: dict):
+        """
+        Constructor.
+        :param jobs: The "jobs" part of the analyzer results, with settings and tool per job.
+        :param results: The "results" part of the analyzer results, per job.
+        """
+        self.jobs = jobs
+        self.analyzer_results = results
+        self.results = {}
+
+    def group(self) -> dict:
+        """
+        The runs by study and configuration, and by node count.
+        """
+        groups = {}
+        for job_id, job in self.jobs.items():
+            study = self.tools.get(job.get("tool"))
+            if study is None:
+                continue
+            results = self.analyzer_results.get(job_id, {})
+            if results.get("calculation_time") is None:
+                continue
+            settings = job["settings"]
+            key = f"{settings.get('app')}_{settings.get('compiler')}"
+            if study == "strong":
+                key = f"{settings.get('app')}_{settings.get('model')}_{settings.get('compiler')}"
+            # only runs of the same placement per node are one curve
+            key += f"_PPN{settings.get('number_of_tasks_per_node')}_CPT{settings.get('number_of_cores_per_task')}" \
+                   f"_{settings.get('distribution')}_{settings.get('hint')}"
+            group = groups.setdefault(f"{study}_{key}", {"study": study, "points": {}})
+            nodes = settings.get("nodes") or 1
+            group["points"].setdefault(nodes, []).append((job_id, settings, results))
+        return groups
+
+    @staticmethod
+    def point(runs: list) -> dict:
+        """
+        Medians over the runs of one node count.
+        """
+        settings = runs[0][1]
+        petsc = [results.get("petsc_log_view") or {} for _, _, results in runs]
+        shares = [p["communication_share"] for p in petsc if p.get("communication_share") is not None]
+        communication = [p["communication_share"] * p["total_time"] for p in petsc
+                         if p.get("communication_share") is not None and p.get("total_time")]
+        return {
+            "jobs": [job_id for job_id, _, _ in runs],
+            "model": settings.get("model"),
+            "mpi_num_ranks": settings.get("mpi_num_ranks"),
+            "ranks_per_node": settings.get("number_of_tasks_per_node"),
+            "network": settings.get("network"),
+            "calculation_time": median([results["calculation_time"] for _, _, results in runs]),
+            "communication_share": median(shares) if shares else None,
+            "communication_time": median(communication) if communication else None,
+        }
+
+    def analyze(self):
+        print("Scaling Compare!!")
+        self.results["scaling"] = {}
+        for key, group in self.group().items():
+            points = {nodes: self.point(runs) for nodes, runs in sorted(group["points"].items())}
+            base_nodes = min(points)
+            base = points[base_nodes]
+            for nodes, point in points.items():
+                time = point["calculation_time"]
+                speedup = base["calculation_time"] / time if time else None
+                if group["study"] == "strong":
+                    # the same problem on more nodes: ideal is a speedup by the node factor
+                    efficiency = speedup / (nodes / base_nodes) if speedup is not None else None
+                else:
+                    # a problem growing with the nodes: ideal is the same time
+                    efficiency = speedup
+                point.update({"speedup": speedup, "parallel_efficiency": efficiency})
+                if point["communication_share"] is not None and base["communication_share"] is not None:
+                    point["communication_share_change"] = point["communication_share"] - base["communication_share"]
+            self.results["scaling"][key] = {
+                "study": group["study"],
+                "base_nodes": base_nodes,
+                "points": {str(nodes): point for nodes, point in points.items()},
+            }
+        print(self.results)
+        return self.results
@@ -0,0 +1,247 @@
+"""
+Streaming parser for the per-timestep lines of the ISSM std out file.
+The parser is fed line by line, so it can be used on finished out files and on files that are still growing.
+"""
+import math
+import re
+from array import array
+from typing import Dict, List, Optional
+
+_number = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+# ISSM 4.18 transient: "iteration 3/100  time [yr]: 0.30 (time step: 0.10)"
+_iteration = re.compile(r"^\s*iteration\s+(\d+)\s*/\s*(\d+)")
+# PETSc with -ksp_converged_reason: "Linear solve converged due to CONVERGED_RTOL iterations 12"
+_linear_solve = re.compile(r"Linear solve (converged|did not converge) due to (\w+) iterations (\d+)")
+# ISSM: "   convergence criterion: norm(du)/norm(u)   0.0123 < 1 %"
+_criterion = re.compile(r"convergence criterion.*?\s([-+]?\d+\.?\d*(?:[eE][-+]?\d+)?)\s*[<>]")
+# per step core time, if the app prints it: "   Core solution elapsed time: 1.23"
+_core_time = re.compile(r"^\s*Core solution elapsed time\s*:\s*([-+]?\d+\.?\d*(?:[eE][-+]?\d+)?)")
+
+series_names = ["element_time", "loop_iterations", "linear_iterations", "linear_diverged", "convergence",
+                "core_time"]
+
+
+def _first_number(text: str) -> Optional[float]:
+    match = _number.search(text)
+    return float(match.group(0)) if match else None
+
+
+def percentile(values, p: float) -> Optional[float]:
+    """
+    Linear interpolated percentile, p in [0, 100].
+    """
+    values = sorted(v for v in values if not math.isnan(v))
+    if not values:
+        return None
+    k = (len(values) - 1) * p / 100
+    low, high = math.floor(k), math.ceil(k)
+    if low == high:
+        return values[int(k)]
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def warmup_length(values, tolerance: float = 0.1, max_fraction: float = 0.2) -> int:
+    """
+    Number of warm-up steps at the start of the series. A step is part of the warm-up, as long as it is more than
+    tolerance away from the median of the series. At most max_fraction of the steps count as warm-up.
+    """
+    median = percentile(values, 50)
+    if median is None or len(values) < 3:
+        return 0
+    limit = int(len(values) * max_fraction)
+    n = 0
+    while n < limit and (math.isnan(values[n]) or abs(values[n] - median) > tolerance * abs(median)):
+        n += 1
+    return n
+
+
+def trend(values) -> Optional[float]:
+    """
+    Relative change of the series over its length, from a least squares fit.
+    0.1 means the last step is 10% slower than the first one, following the fit.
+    """
+    points = [(i, v) for i, v in enumerate(values) if not math.isnan(v)]
+    if len(points) < 3:
+        return None
+    mean_x = sum(p[0] for p in points) / len(points)
+    mean_y = sum(p[1] for p in points) / len(points)
+    var = sum((p[0] - mean_x) ** 2 for p in points)
+    if var == 0 or mean_y == 0:
+        return None
+    slope = sum((p[0] - mean_x) * (p[1] - mean_y) for p in points) / var
+    return slope * (points[-1][0] - points[0][0]) / mean_y
+
+
+class TimestepSeries:
+    """
+    Per-timestep values of a run. Every series is stored as compact double array, one entry per step.
+    Missing values are NaN. Values of several lines of a step are summed up, counts holds the number of lines.
+    """
+
+    def __init__(self):
+        self.series: Dict[str, array] = {name: array("d") for name in series_names}
+        self.counts: Dict[str, array] = {name: array("l") for name in series_names}
+        # line number in the out file, where the step starts
+        self.step_lines = array("l")
+        self.total_steps = None
+
+    def __len__(self):
+        return len(self.step_lines)
+
+    def new_step(self, line_number: int):
+        self.step_lines.append(line_number)
+        for values in self.series.values():
+            values.append(math.nan)
+        for counts in self.counts.values():
+            counts.append(0)
+
+    def set(self, name: str, value: float, add: bool = False):
+        """
+        Sets the value of the current step. With add, the value is summed up with the values already there.
+        """
+        values = self.series[name]
+        if add and not math.isnan(values[-1]):
+            values[-1] += value
+            self.counts[name][-1] += 1
+        else:
+            values[-1] = value
+            self.counts[name][-1] = 1
+
+    def present(self) -> List[str]:
+        """
+        Names of the series that have at least one value.
+        """
+        return [name for name, values in self.series.items() if any(not math.isnan(v) for v in values)]
+
+    def summary(self, name: str, warmup_tolerance: float = 0.1) -> dict:
+        """
+        Percentiles, warm-up and steady-state split and trend of one series.
+        """
+        values = self.series[name]
+        warmup = warmup_length(values, tolerance=warmup_tolerance)
+        steady = [v for v in values[warmup:] if not math.isnan(v)]
+        return {
+            "steps": len([v for v in values if not math.isnan(v)]),
+            "min": percentile(values, 0),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": percentile(values, 100),
+            "warmup_steps": warmup,
+            "warmup_sum": sum(v for v in values[:warmup] if not math.isnan(v)),
+            "steady_state_mean": sum(steady) / len(steady) if steady else None,
+            "steady_state_sum": sum(steady),
+            "trend": trend(values[warmup:]),
+        }
+
+    def steady_state(self, name: str, warmup_tolerance: float = 0.1) -> List[float]:
+        """
+        The steady-state values of a series, without warm-up steps and missing values.
+        """
+        values = self.series[name]
+        warmup = warmup_length(values, tolerance=warmup_tolerance)
+        return [v for v in values[warmup:] if not math.isnan(v)]
+
+    def steady_state_line_mean(self, name: str, warmup_tolerance: float = 0.1) -> Optional[float]:
+        """
+        Mean per line of a series over the steady-state steps, e.g. the element time of every FemModel line.
+        """
+        values = self.series[name]
+        warmup = warmup_length(values, tolerance=warmup_tolerance)
+        steady = [(v, c) for v, c in zip(values[warmup:], self.counts[name][warmup:]) if not math.isnan(v)]
+        count = sum(c for _, c in steady)
+        return sum(v for v, _ in steady) / count if count else None
+
+    def as_dict(self) -> dict:
+        """
+        Series as lists for the json export, NaN is exported as None.
+        """
+        return {name: [None if math.isnan(v) else v for v in self.series[name]] for name in self.present()}
+
+
+class TimestepParser:
+    """
+    Streaming parser for the ISSM std out. Feed it line by line.
+    A step starts with an "iteration" line, for apps that print them (ISSM 4.18), otherwise with a "FemModel" line.
+    The element times and loop iterations of all lines, also the ones before the first step, are summed up in
+    line_totals.
+    """
+
+    def __init__(self):
+        self.series = TimestepSeries()
+        self.line_number = 0
+        self.__uses_iteration_lines = False
+        # name: [sum, count] over every line
+        self.line_totals = {"element_time": [0.0, 0], "loop_iterations": [0.0, 0]}
+
+    def line_mean(self, name: str) -> Optional[float]:
+        """
+        Mean over every line of the series, element_time or loop_iterations.
+        """
+        total, count = self.line_totals[name]
+        return total / count if count else None
+
+    def __add_line_value(self, name: str, value: float):
+        self.line_totals[name][0] += value
+        self.line_totals[name][1] += 1
+        if len(self.series):
+            self.series.set(name, value, add=True)
+
+    def __open_step(self):
+        self.series.new_step(self.line_number)
+
+    def feed(self, line: str) -> bool:
+        """
+        Parses one line. Returns True if the line started a new step.
+        """
+        new_step = False
+        match = _iteration.match(line)
+        if match:
+            self.__uses_iteration_lines = True
+            self.series.total_steps = int(match.group(2))
+            self.__open_step()
+            new_step = True
+        elif line.startswith("FemModel"):
+            if not self.__uses_iteration_lines:
+                self.__open_step()
+                new_step = True
+            try:
+                value = float(line.split(",", 1)[0][18:-9])
+            except ValueError:
+                value = _first_number(line.split(",", 1)[0])
+            if value is not None:
+                self.__add_line_value("element_time", value)
+        elif line.startswith(" -->"):
+            try:
+                value = float(line[12:-6])
+            except ValueError:
+                value = _first_number(line[4:])
+            if value is not None:
+                self.__add_line_value("loop_iterations", value)
+        elif len(self.series) == 0:
+            # setup phase, nothing per step yet
+            pass
+        elif "Linear solve" in line:
+            match = _linear_solve.search(line)
+            if match:
+                self.series.set("linear_iterations", float(match.group(3)), add=True)
+                self.series.set("linear_diverged", 0.0 if match.group(1) == "converged" else 1.0, add=True)
+        elif "convergence criterion" in line:
+            match = _criterion.search(line)
+            if match:
+                self.series.set("convergence", float(match.group(1)))
+        else:
+            match = _core_time.match(line)
+            if match:
+                self.series.set("core_time", float(match.group(1)))
+        self.line_number += 1
+        return new_step
+
+    def feed_file(self, path: str) -> "TimestepSeries":
+        """
+        Parses a whole file, without reading it into memory at once.
+        """
+        with open(path, "r") as f:
+            for line in f:
+                self.feed(line)
+        return self.series
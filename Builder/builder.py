@@ -232,6 +232,8 @@ class GProfBuilder(BaseBuilder):
 class CompilerVectorizationReportBuilder(BaseBuilder):
     """
     Builder for Runs with Compiler Vectorization Report enabled.
+    GCC writes its -fopt-info-vec reports to the given paths. LLVM writes an optimization record (YAML) next to each
+    object file, these have to be collected after the build.
     """
     def __init__(self, app: App, source_path: str, path_successful: str, path_unsuccessful: str, path_all: str = None, do_not_export_single_files: bool = False, gcc_flags: bool = True):
         self.path_successful = path_successful
@@ -249,12 +251,12 @@ class CompilerVectorizationReportBuilder(BaseBuilder):
                 additional_compiler_flags += f"-fopt-info-vec-all={self.path_all}"
             additional_gf_flags = "-O3 -march=native"
         else:
-            if not self.do_not_export_single_files:
-                additional_compiler_flags += f"-fopt-info-vec-optimized={self.path_successful} -fopt-info-vec-missed={self.path_unsuccessful}"
-            if self.path_all:
-                additional_compiler_flags += f"-fopt-info-vec-all={self.path_all}"
+            # LLVM: optimization records of the loop vectorizer only, they get very large otherwise
+            additional_compiler_flags = "-fvectorize -fsave-optimization-record=yaml " \
+                                        "-foptimization-record-passes=loop-vectorize"
             additional_gf_flags = "-O3 -march=native"
         super().__init__(app, source_path,
+                         compiler=Compiler.GCC if gcc_flags else Compiler.LLVM,
                          c_compiler_flags=f"'{build_defaults['c_compiler_flags']} {additional_compiler_flags}'",
                          cxx_compiler_flags=f"'{build_defaults['cxx_compiler_flags']} {additional_compiler_flags}'",
                          fortran_compiler_flags=f"'{additional_gf_flags}'"
@@ -300,3 +302,71 @@ class ScorePBuilder(BaseBuilder):
             subprocess.run(["bash", "-c", f"export SCOREP_METRIC_PAPI={self.papi_metrics}"])
             super().build(active=True)
             return
+
+
+class PGOBuilder(BaseBuilder):
+    """
+    Builder for profile guided optimization. In the "generate" phase it builds an instrumented binary, that writes
+    profile data, in the "use" phase it builds with the merged profile data.
+    """
+    GENERATE = "generate"
+    USE = "use"
+
+    def __init__(self, app: App, source_path: str, phase: str, profile_dir: str, compiler: Compiler = Compiler.GCC):
+        """
+        Constructor.
+        :param phase: PGOBuilder.GENERATE or PGOBuilder.USE.
+        :param profile_dir: Absolute directory for the profile data. Each rank writes into its own sub-directory,
+        the merged data is expected in the gcda sub-directory (GCC) or the merged.profdata file (LLVM).
+        :param compiler: GCC uses -fprofile-generate/-fprofile-use, LLVM -fprofile-instr-generate/-fprofile-instr-use.
+        """
+        self.phase = phase
+        self.profile_dir = profile_dir
+        if compiler == Compiler.LLVM:
+            if phase == PGOBuilder.GENERATE:
+                pgo_flags = "-fprofile-instr-generate"
+            else:
+                pgo_flags = f"-fprofile-instr-use={self.merged_profile(compiler)}"
+        else:
+            if phase == PGOBuilder.GENERATE:
+                pgo_flags = f"-fprofile-generate={self.merged_profile(compiler)}"
+            else:
+                # counters of 96 ranks are never fully consistent, -fprofile-correction smooths that
+                pgo_flags = f"-fprofile-use={self.merged_profile(compiler)} -fprofile-correction -Wno-missing-profile"
+        super().__init__(app, source_path,
+                         compiler=compiler,
+                         c_compiler_flags=f"'{build_defaults['c_compiler_flags']} {pgo_flags}'",
+                         cxx_compiler_flags=f"'{build_defaults['cxx_compiler_flags']} {pgo_flags}'",
+                         fortran_compiler_flags=f"'{build_defaults['fortran_compiler_flags']} {pgo_flags}'",
+                         )
+
+    def merged_profile(self, compiler: Compiler) -> str:
+        """
+        Path of the merged profile data, as it is given to the compiler.
+        """
+        if compiler == Compiler.LLVM:
+            return f"{self.profile_dir}/merged.profdata"
+        return f"{self.profile_dir}/gcda"
+
+
+class CalibrationBuilder(BaseBuilder):
+    """
+    Builder for calibration runs. The app is not built: the calibration kernels are compiled in the job, on the
+    compute node, with the compiler modules of the job script.
+    """
+    calibration_flags = "-O3 -march=native -fopenmp"
+
+    def __init__(self, app: App, compiler: Compiler = Compiler.GCC):
+        super().__init__(app, "", compiler=compiler, c_compiler_flags=CalibrationBuilder.calibration_flags)
+
+    def prepare_build(self):
+        pass
+
+    def build(self, active: bool = True):
+        return [""] if active else []
+
+    def cleanup_build(self):
+        pass
+
+    def load_modules(self, active: bool = True):
+        return [""] if active else []
@@ -0,0 +1,354 @@
+import itertools
+import math
+from abc import ABC, abstractmethod
+from typing import List, Dict, Tuple, Callable, Optional, Union
+
+from Builder.builder import App, Resolution, Compiler, BaseBuilder, build_defaults
+from Runs.run import BaseRun, source_path
+from Management.experiment import Experiment
+from Management.exporter import Exporter
+
+
+class BaseTuner(ABC):
+    """
+    Autotuning by successive halving. All candidates are screened on the first resolution (rung), only the best
+    keep_fraction of them are promoted to the next rung. Each rung is one Experiment.
+    If there is a baseline candidate, it runs on every rung, and the ranking reports the speedup over it.
+    Derive this and implement candidates() and make_run().
+    """
+
+    def __init__(self, name: str, app: App,
+                 rungs: List[Resolution] = None,
+                 keep_fraction: float = 0.5,
+                 repetitions: Union[int, List[int]] = 1):
+        """
+        Constructor.
+        :param name: Name of the tuning, the experiments of the rungs are named after it.
+        :param app: The app to tune.
+        :param rungs: Resolutions to run the rungs on, from small to big. Default: G4000, G16000, G64000.
+        :param keep_fraction: Fraction of the candidates promoted to the next rung. At least one is kept.
+        :param repetitions: Number of runs per candidate and rung, or a list with one number per rung.
+        The median time is used for ranking.
+        """
+        self.name = name
+        self.app = app
+        self.rungs = rungs if rungs else [Resolution.G4000, Resolution.G16000, Resolution.G64000]
+        self.keep_fraction = keep_fraction
+        self.repetitions = repetitions if isinstance(repetitions, list) else [repetitions] * len(self.rungs)
+        self.trials = []
+
+    def baseline(self) -> Optional[dict]:
+        """
+        The baseline candidate. None if there is no baseline.
+        """
+        return None
+
+    @abstractmethod
+    def candidates(self) -> List[dict]:
+        """
+        The search space. Every candidate is a dict, it is given to make_run() as is.
+        """
+
+    @abstractmethod
+    def make_run(self, candidate: dict, resolution: Resolution, rung: int) -> BaseRun:
+        """
+        Creates the run for a candidate.
+        """
+
+    def finished(self, candidate: dict, run: BaseRun, job_results: Optional[dict]):
+        """
+        Called for every run after its rung, e.g. to remember which builds succeeded.
+        """
+        pass
+
+    @staticmethod
+    def ran(job_results: Optional[dict]) -> bool:
+        """
+        Whether the app ran at all, independent of the validity of the candidate. Then its build is fine.
+        """
+        return bool(job_results) and not job_results.get("error") and job_results.get("calculation_time") is not None
+
+    @staticmethod
+    def candidate_key(candidate: dict) -> str:
+        """
+        Printable, unique key of a candidate.
+        """
+        return " ".join(f"{k}={v}" for k, v in sorted(candidate.items()) if v is not None)
+
+    @staticmethod
+    def job_id_of(run: BaseRun) -> Optional[str]:
+        """
+        The job id of a finished run. It is added to the job name in the runs cleanup.
+        """
+        parts = run.jobname_skeleton.split(".", 1)
+        return parts[1] if len(parts) > 1 else None
+
+    def evaluate(self, job_results: dict) -> Tuple[Optional[float], bool]:
+        """
+        Returns the time of a job and whether it is valid. Derive this for other validity criteria.
+        """
+        if not job_results or job_results.get("error") or job_results.get("calculation_time") is None:
+            return None, False
+        return job_results["calculation_time"], True
+
+    @staticmethod
+    def median(values: List[float]) -> float:
+        values = sorted(values)
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+    def run_rung(self, candidates: List[dict], resolution: Resolution, rung: int) -> Dict[str, List[float]]:
+        """
+        Runs all candidates on one rung. Returns the times of the valid runs per candidate key.
+        """
+        experiment = Experiment(name=f"{self.name}-RUNG{rung}-{resolution}")
+        runs = []
+        for candidate in candidates:
+            for repetition in range(self.repetitions[rung]):
+                run = self.make_run(candidate, resolution, rung)
+                experiment.add_run(run)
+                runs.append((candidate, repetition, run))
+        results = experiment.do_run()
+        times = {}
+        for candidate, repetition, run in runs:
+            key = self.candidate_key(candidate)
+            job_id = self.job_id_of(run)
+            job_results = results["results"].get(f"{job_id}") if job_id else None
+            time, valid = self.evaluate(job_results)
+            self.finished(candidate, run, job_results)
+            self.trials.append({
+                "rung": rung,
+                "resolution": resolution,
+                "candidate": candidate,
+                "key": key,
+                "repetition": repetition,
+                "job_id": job_id,
+                "calculation_time": time,
+                "valid": valid,
+            })
+            times.setdefault(key, [])
+            if valid:
+                times[key].append(time)
+        return times
+
+    def tune(self) -> dict:
+        """
+        Runs the successive halving. Returns the best candidate, its time, the ranked table of all candidates
+        and the full trial log.
+        """
+        baseline = self.baseline()
+        baseline_key = self.candidate_key(baseline) if baseline is not None else None
+        survivors = [c for c in self.candidates() if self.candidate_key(c) != baseline_key]
+        ranking = []
+        # best ranking of the last rung with a valid candidate
+        best_ranking, best_rung = [], None
+        # candidate key: last rung, resolution, median time and speedup over baseline there
+        table = {}
+        for rung, resolution in enumerate(self.rungs):
+            print(f"Tuning {self.name}: rung {rung} on {resolution} with {len(survivors)} candidates.")
+            times = self.run_rung(survivors + ([baseline] if baseline is not None else []), resolution, rung)
+            baseline_time = self.median(times[baseline_key]) if baseline_key and times.get(baseline_key) else None
+            ranking = sorted([(self.median(times[self.candidate_key(c)]), c) for c in survivors
+                              if times.get(self.candidate_key(c))], key=lambda entry: entry[0])
+            for time, candidate in ranking:
+                table[self.candidate_key(candidate)] = {
+                    "candidate": candidate,
+                    "rung": rung,
+                    "resolution": resolution,
+                    "median_time": time,
+                    "speedup_over_baseline": baseline_time / time if baseline_time else None,
+                }
+            if baseline_time:
+                table[baseline_key] = {"candidate": baseline, "rung": rung, "resolution": resolution,
+                                       "median_time": baseline_time, "speedup_over_baseline": 1.0}
+            if not ranking:
+                if best_ranking:
+                    print(f"Tuning {self.name}: no valid candidate left on rung {rung}, the best is the one of rung "
+                          f"{best_rung}.")
+                else:
+                    print(f"Tuning {self.name}: no valid candidate left on rung {rung}.")
+                break
+            best_ranking, best_rung = ranking, rung
+            if rung < len(self.rungs) - 1:
+                keep = max(1, math.ceil(len(ranking) * self.keep_fraction))
+                survivors = [candidate for _, candidate in ranking[:keep]]
+        # the further a candidate made it, the better, then by time
+        ranked_table = sorted(table.values(), key=lambda entry: (-entry["rung"], entry["median_time"]))
+        print(f"Tuning {self.name} finished:")
+        for entry in ranked_table:
+            speedup = entry["speedup_over_baseline"]
+            print(f"{entry['resolution']:>8} {entry['median_time']:>12.3f} "
+                  f"{'-' if speedup is None else f'{speedup:.3f}':>8}  {self.candidate_key(entry['candidate'])}")
+        result = {
+            "tuning": self.name,
+            "app": self.app,
+            "best": best_ranking[0][1] if best_ranking else None,
+            "best_time": best_ranking[0][0] if best_ranking else None,
+            "best_rung": best_rung,
+            "baseline": baseline,
+            "ranked_table": ranked_table,
+            "trials": self.trials,
+        }
+        exporter = Exporter(result, f"{self.name}-TUNING")
+        exporter.prepare()
+        exporter.export()
+        exporter.commit_and_push()
+        return result
+
+
+class PETScOptionTuner(BaseTuner):
+    """
+    Tunes PETSc runtime options of an ISSM run. The options are given to the app on the command line.
+    Only candidates whose linear solves all converge count, -ksp_converged_reason is added to every run for this.
+    Be aware: options that the models toolkit settings set too may be overwritten by ISSM.
+    """
+
+    def __init__(self, name: str, app: App, option_space: Dict[str, list],
+                 constraint: Callable[[dict], bool] = None, own_build: bool = True, *args, **kwargs):
+        """
+        Constructor.
+        :param option_space: PETSc option name to list of values, e.g. {"-ksp_type": ["gmres", "bcgs"],
+        "-pc_type": ["bjacobi", "asm"], "-ksp_rtol": [1e-6, 1e-8]}. A value of None leaves the option out.
+        The search space is the cross product of all values.
+        :param constraint: Optional filter for candidates, e.g. to allow -pc_factor_mat_solver_type only with
+        -pc_type lu.
+        :param own_build: Build the app once, bevor the first run. All other runs reuse this build.
+        """
+        super().__init__(name, app, *args, **kwargs)
+        self.option_space = option_space
+        self.constraint = constraint
+        self.own_build = own_build
+        # the build ran successfully, or a run of the current rung builds it
+        self.__built = False
+        self.__building = False
+
+    def candidates(self) -> List[dict]:
+        names = list(self.option_space.keys())
+        candidates = [dict(zip(names, values)) for values in
+                      itertools.product(*[self.option_space[name] for name in names])]
+        if self.constraint:
+            candidates = [c for c in candidates if self.constraint(c)]
+        return candidates
+
+    @staticmethod
+    def options_string(candidate: dict) -> str:
+        return " ".join(f"{option} {value}" for option, value in candidate.items() if value is not None)
+
+    def baseline(self) -> Optional[dict]:
+        # no options, PETSc and ISSM defaults
+        return {option: None for option in self.option_space.keys()}
+
+    def make_run(self, candidate: dict, resolution: Resolution, rung: int) -> BaseRun:
+        # until a run of the build ran, every rung builds again with its first run
+        run = BaseRun(app=self.app, resolution=resolution, vanilla=False,
+                      own_build=self.own_build and not self.__built and not self.__building, cleanup_build=False)
+        self.__building = True
+        run.add_tool("PETSC-TUNING")
+        run.add_app_argument(f"{self.options_string(candidate)} -ksp_converged_reason")
+        return run
+
+    def finished(self, candidate: dict, run: BaseRun, job_results: Optional[dict]):
+        self.__building = False
+        if self.ran(job_results):
+            self.__built = True
+
+    def evaluate(self, job_results: dict) -> Tuple[Optional[float], bool]:
+        time, valid = super().evaluate(job_results)
+        if not valid:
+            return time, False
+        diverged = job_results.get("timesteps", {}).get("series", {}).get("linear_diverged", [])
+        if any(d for d in diverged if d):
+            return time, False
+        return time, True
+
+
+default_flag_space = {
+    "optimization": ["-O2", "-O3", "-Ofast"],
+    "march": [None, "-march=native", "-march=cascadelake"],
+    "lto": [None, "-flto"],
+    "unroll": [None, "-funroll-loops"],
+    "vector_width": [None, "-mprefer-vector-width=256", "-mprefer-vector-width=512"],
+    "compiler": [Compiler.GCC, Compiler.LLVM],
+}
+
+
+class CompilerFlagTuner(BaseTuner):
+    """
+    Tunes the compiler and its flags. Every candidate is a build, candidates with the same flag set are built once.
+    The baseline is the default build (GCC with build_defaults flags). Screens on G4000 and re-evaluates the best
+    candidates on G64000 with repetitions by default.
+    """
+
+    def __init__(self, name: str, app: App, flag_space: Dict[str, list] = None,
+                 constraint: Callable[[dict], bool] = None,
+                 rungs: List[Resolution] = None, repetitions: Union[int, List[int]] = None, *args, **kwargs):
+        """
+        Constructor.
+        :param flag_space: Dimension name to list of flags, None leaves the dimension out. The special dimension
+        "compiler" holds Compiler values. Default: default_flag_space.
+        :param constraint: Optional filter for candidates.
+        """
+        rungs = rungs if rungs else [Resolution.G4000, Resolution.G64000]
+        repetitions = repetitions if repetitions else [1] + [3] * (len(rungs) - 1)
+        super().__init__(name, app, rungs=rungs, repetitions=repetitions, *args, **kwargs)
+        self.flag_space = flag_space if flag_space else default_flag_space
+        self.constraint = constraint
+        # flag set key: True if a run of its build ran, False if not, None while its rung runs
+        self.__builds: Dict[str, Optional[bool]] = {}
+        # key of the build in the source tree, all builds of the app go there
+        self.__installed = None
+
+    @staticmethod
+    def flags_of(candidate: dict) -> str:
+        return " ".join(flag for dimension, flag in sorted(candidate.items())
+                        if dimension != "compiler" and flag is not None)
+
+    @classmethod
+    def candidate_key(cls, candidate: dict) -> str:
+        # the flag set, independent of the dimensions and order, decides which build it is
+        flags = sorted(set(cls.flags_of(candidate).split()))
+        return f"{candidate.get('compiler', build_defaults['compiler'])} {' '.join(flags)}"
+
+    def baseline(self) -> Optional[dict]:
+        return {"compiler": build_defaults["compiler"], "optimization": build_defaults["c_compiler_flags"]}
+
+    def candidates(self) -> List[dict]:
+        names = list(self.flag_space.keys())
+        candidates = {}
+        for values in itertools.product(*[self.flag_space[name] for name in names]):
+            candidate = dict(zip(names, values))
+            if self.constraint and not self.constraint(candidate):
+                continue
+            # deduplicate by flag set
+            candidates.setdefault(self.candidate_key(candidate), candidate)
+        return list(candidates.values())
+
+    def make_run(self, candidate: dict, resolution: Resolution, rung: int) -> BaseRun:
+        compiler = candidate.get("compiler", build_defaults["compiler"])
+        flags = self.flags_of(candidate)
+        builder = BaseBuilder(self.app, source_path[self.app], compiler=compiler,
+                              c_compiler_flags=f"'{flags}'",
+                              cxx_compiler_flags=f"'{flags}'",
+                              fortran_compiler_flags=f"'{flags}'")
+        # runs are executed in order, the build in the source tree is reused unless it failed
+        key = self.candidate_key(candidate)
+        reuse = key == self.__installed and self.__builds.get(key) is not False
+        run = BaseRun(app=self.app, resolution=resolution, builder=builder, compiler=compiler, vanilla=False,
+                      own_build=not reuse, cleanup_build=False)
+        if not reuse:
+            self.__installed = key
+            self.__builds[key] = None
+        run.add_tool("FLAG-TUNING")
+        return run
+
+    def run_rung(self, candidates: List[dict], resolution: Resolution, rung: int) -> Dict[str, List[float]]:
+        # the candidate of the installed build first, it needs no build
+        candidates = sorted(candidates, key=lambda c: self.candidate_key(c) != self.__installed)
+        return super().run_rung(candidates, resolution, rung)
+
+    def finished(self, candidate: dict, run: BaseRun, job_results: Optional[dict]):
+        key = self.candidate_key(candidate)
+        if self.ran(job_results):
+            self.__builds[key] = True
+        elif self.__builds.get(key) is None:
+            self.__builds[key] = False
@@ -1,6 +1,7 @@
 from typing import List
 
 from Runs.run import BaseRun
+from Runs.batch import BatchAllocation, own_job_reason
 from Analyzer.analyzer import ResultAnalyzer
 from Management.exporter import Exporter
 
@@ -12,14 +13,21 @@ class Experiment:
     Put jobs in a Swarm you want to compare with each other.
     This class opens the same interface as a Run, so call "do_run()" to start it.
     """
-    def __init__(self, name, runs=None):
+    def __init__(self, name, runs=None, batch_allocation: dict = None, steady_state_only: bool = False):
         """
         Constructor.
+        :param batch_allocation: If given, the runs are job steps of one allocation, instead of one job each
+        (Runs.batch.BatchAllocation). The dict holds its options, e.g. {"nodes": 1, "concurrent": True}, {} for the
+        defaults. PGO, massif and parallel_sum GProf runs still run as their own jobs. Default: None.
+        :param steady_state_only: Average the element times and loop iterations over the steady-state time steps
+        only, without the warm-up steps. Default: False, over every step.
         """
         if runs is None:
             runs = []
         self.name = name
         self.runs = runs
+        self.batch_allocation = batch_allocation
+        self.steady_state_only = steady_state_only
         self.__run_res_tuples = []
 
     def add_run(self, run: BaseRun):
@@ -27,18 +35,12 @@ class Experiment:
 
     def do_run(self):
         """
-        Start the experiment.
+        Start the experiment. Every job is analyzed as soon as its run is done, the partial results are written after
+        each job, so errors show up while the other jobs are still running. Only the comparisons between the jobs
+        wait for all of them.
+        :return: The analyzer results, as exported.
         """
         print(f"Starting experiment: {self.name}")
-        for run in self.runs:
-            print(f"Starting run {run.jobname_skeleton} from experiment {self.name}")
-            try:
-                out_dir, builder_config, job_config = run.do_run()
-                self.__run_res_tuples.append((out_dir, builder_config, job_config))
-            except Exception as e:
-                print(f"Exception in run {run}, starting next one! Stack Trace: {e}")
-        print(f"Starting analyzing on experiment: {self.name}")
-
         """ 
         Configs are compared on equality of their options while analyzing. 
         You may need to have your own definition of what "equal" is in the context of your experiment.
@@ -46,12 +48,43 @@ class Experiment:
         with the config_equal_f parameter. This way you can overwrite the default comparison method used otherwise,
         which can be found in Analyzer/analyzer.py:ExperimentConfig:is_comparable(self, other)
         """
-        analyzer = ResultAnalyzer(self.__run_res_tuples, config_equal_f=None)
-        results = analyzer.analyze()
+        analyzer = ResultAnalyzer([], config_equal_f=None, steady_state_only=self.steady_state_only)
+        exporter = Exporter(analyzer.results, self.name)
+        exporter.prepare()
+        runs = self.runs
+        if self.batch_allocation is not None:
+            steps = [run for run in self.runs if not own_job_reason(run)]
+            runs = [run for run in self.runs if own_job_reason(run)]
+            if steps:
+                # the allocation stands in for its runs
+                runs.insert(0, BatchAllocation(self.name, steps, **self.batch_allocation))
+        for run in runs:
+            name = run.job_name if isinstance(run, BatchAllocation) else run.jobname_skeleton
+            print(f"Starting run {name} from experiment {self.name}")
+            try:
+                run_results = run.do_run()
+                # some runs (e.g. PGORun) run more than one job
+                if not isinstance(run_results, list):
+                    run_results = [run_results]
+                self.__run_res_tuples.extend(run_results)
+            except Exception as e:
+                print(f"Exception in run {run}, starting next one! Stack Trace: {e}")
+                continue
+            for run_result in run_results:
+                try:
+                    job_results = analyzer.add_experiment(run_result)
+                except Exception as e:
+                    print(f"Exception analyzing {run_result[0]}, analyzing next one! Stack Trace: {e}")
+                    continue
+                for job_id, name, message in analyzer.job_errors(job_results):
+                    print(f"Error in job {job_id} ({name}): {message}")
+                exporter.export_partial()
+        print(f"Starting comparing on experiment: {self.name}")
+        results = analyzer.compare()
 
         print(f"Starting exporting on experiment: {self.name}")
-        exporter = Exporter(results, self.name)
-        exporter.prepare()
         exporter.export()
+        exporter.export_plots()
         exporter.commit_and_push()
         print(f"Finished experiment: {self.name}")
+        return results
@@ -2,6 +2,7 @@ import json
 import os
 import subprocess
 
+from Analyzer.roofline import plot_roofline
 from SLURM.exceptions import CommandExecutionException
 
 default_out_dir = "issm-output/RESULTS"
@@ -33,12 +34,40 @@ class Exporter:
             raise CommandExecutionException(f"mkdir -p {self.home_dir}/{default_out_dir}/{self.experiment_name}-{self.suffix}")
         self.out_file = f"{self.home_dir}/{default_out_dir}/{self.experiment_name}-{self.suffix}/{self.experiment_name}.json"
 
+    @property
+    def partial_file(self):
+        return f"{os.path.splitext(self.out_file)[0]}.partial.json"
+
     def export(self):
         """
-        Run the exporter.
+        Run the exporter. Replaces the partial results.
         """
         with open(self.out_file, "w") as f:
             f.write(json.dumps(self.results, indent=4))
+        if os.path.isfile(self.partial_file):
+            os.remove(self.partial_file)
+
+    def export_partial(self):
+        """
+        Writes the results so far, while the experiment still runs. Written and renamed, a reader never sees a half
+        written file.
+        """
+        with open(f"{self.partial_file}.tmp", "w") as f:
+            f.write(json.dumps(self.results, indent=4))
+        os.replace(f"{self.partial_file}.tmp", self.partial_file)
+
+    def export_plots(self):
+        """
+        Exports the plots of the results next to the json, e.g. the roofline of Score-P runs with PAPI counters.
+        Needs matplotlib, without it no plots are made.
+        """
+        out_dir = os.path.dirname(self.out_file)
+        for job_id, results in self.results.get("results", {}).items():
+            if "roofline" not in results:
+                continue
+            plot_roofline(results["roofline"]["roof"], results["roofline"]["kernels"],
+                          f"{out_dir}/{self.experiment_name}-roofline-{job_id}.png",
+                          title=f"{self.experiment_name} job {job_id}")
 
     def commit_and_push(self):
         """
@@ -0,0 +1,99 @@
+"""
+History of earlier runs: the results of all experiments exported to the RESULTS dir. Gives the baseline of a
+configuration (app, model, compiler, ranks), e.g. for the watchdog, that cancels jobs, which are far slower than it.
+"""
+import glob
+import json
+import os
+from typing import Dict, List, Optional
+
+from Analyzer.profile_diff import median
+
+results_dir = os.path.expanduser("~/issm-output/RESULTS")
+
+
+class History:
+    """
+    The jobs of all exported experiments. The result files are read once, on first access.
+    """
+
+    def __init__(self, directory: str = results_dir):
+        """
+        Constructor.
+        :param directory: The RESULTS dir of the exporter.
+        """
+        self.directory = directory
+        self.__jobs: Optional[Dict[str, dict]] = None
+
+    def result_files(self) -> List[str]:
+        files = glob.glob(f"{self.directory}/**/*.json", recursive=True)
+        # results of experiments, that are still running, are not final
+        return sorted(f for f in files if not f.endswith(".partial.json"))
+
+    def jobs(self) -> Dict[str, dict]:
+        """
+        job id: {"job_id", "file", "tool", "settings", "results"}. A job exported by more than one experiment file is
+        taken once, from the newest file.
+        """
+        if self.__jobs is None:
+            self.__jobs = {}
+            for path in sorted(self.result_files(), key=os.path.getmtime):
+                try:
+                    with open(path, "r") as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Skipping result file {path}: {e}")
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                for job_id, job in data.get("jobs", {}).items():
+                    self.__jobs[job_id] = {
+                        "job_id": job_id,
+                        "file": path,
+                        "tool": job.get("tool"),
+                        "settings": job.get("settings", {}),
+                        "results": data.get("results", {}).get(job_id, {}),
+                    }
+        return self.__jobs
+
+    def matching(self, tools: List[str] = None, **settings) -> List[dict]:
+        """
+        The jobs with the given settings, e.g. matching(app="ISSM-MINIAPP-THERMAL", mpi_num_ranks=96).
+        Settings given as None match every job.
+        :param tools: Only jobs of these tools. Default: all tools.
+        """
+        jobs = []
+        for job in self.jobs().values():
+            if tools is not None and job["tool"] not in tools:
+                continue
+            if all(value is None or job["settings"].get(key) == value for key, value in settings.items()):
+                jobs.append(job)
+        return jobs
+
+    def baseline(self, app: str, model: str, compiler: str, mpi_num_ranks: int,
+                 tools: List[str] = None) -> Optional[dict]:
+        """
+        Medians over the successful earlier runs of the configuration. None, if there are none.
+        :param tools: Only runs of these tools. Default: VANILLA and MPI-COMPARE, the runs without tool overhead.
+        """
+        if tools is None:
+            tools = ["VANILLA", "MPI-COMPARE"]
+        runs = [job for job in self.matching(tools=tools, app=app, model=model, compiler=compiler,
+                                             mpi_num_ranks=mpi_num_ranks)
+                if not job["results"].get("error") and job["results"].get("calculation_time") is not None]
+        if not runs:
+            return None
+        per_step, steps = [], []
+        for job in runs:
+            job_steps = job["results"].get("timesteps", {}).get("steps")
+            if job_steps:
+                steps.append(job_steps)
+                per_step.append(job["results"]["calculation_time"] / job_steps)
+        return {
+            "jobs": [job["job_id"] for job in runs],
+            "calculation_time": median([job["results"]["calculation_time"] for job in runs]),
+            "setup_time": median([job["results"]["setup_time"] for job in runs
+                                  if job["results"].get("setup_time") is not None]),
+            "steps": median(steps),
+            "seconds_per_step": median(per_step),
+        }
@@ -0,0 +1,98 @@
+"""
+Walltime and memory of a job, predicted from earlier runs of the same app, model, tool, ranks and compiler.
+Tight requests get through the scheduler faster (backfilling), and long tool runs do not hit their time limit.
+Without earlier runs, the defaults of DefaultPEngSlurmConfig are used.
+"""
+import math
+from typing import List, Optional
+
+from Management.history import History
+from SLURM.accounting import time_seconds, time_str
+from SLURM.default_slurm import default_time_str, default_mem_per_cpu
+
+
+class ResourcePredictor:
+    """
+    Predicts --time and --mem-per-cpu as the largest value of the earlier runs, times a safety margin.
+    """
+
+    def __init__(self, history: History = None, time_margin: float = 1.5, mem_margin: float = 1.3,
+                 min_time_str: str = "00:05:00", max_time_str: str = None, min_mem_per_cpu: int = 500,
+                 max_mem_per_cpu: int = None):
+        """
+        Constructor.
+        :param history: The earlier runs. Default: History() on the RESULTS dir.
+        :param time_margin: Factor on the longest earlier run. Default: 1.5.
+        :param mem_margin: Factor on the largest memory per cpu of the earlier runs. Default: 1.3.
+        :param min_time_str: The time limit is at least this. Default: "00:05:00".
+        :param max_time_str: The time limit is at most this, e.g. the limit of the partition. Default: None.
+        :param min_mem_per_cpu: Memory per cpu in MB is at least this. Default: 500.
+        :param max_mem_per_cpu: Memory per cpu in MB is at most this, e.g. node memory / cores. Default: None.
+        """
+        self.history = history if history is not None else History()
+        self.time_margin = time_margin
+        self.mem_margin = mem_margin
+        self.min_seconds = time_seconds(min_time_str)
+        self.max_seconds = time_seconds(max_time_str) if max_time_str else None
+        self.min_mem_per_cpu = min_mem_per_cpu
+        self.max_mem_per_cpu = max_mem_per_cpu
+
+    @staticmethod
+    def elapsed_seconds(results: dict) -> Optional[float]:
+        """
+        Run time of an earlier job: from sacct, else the total time the app printed, else setup plus calculation.
+        """
+        accounting = results.get("sacct") or {}
+        if accounting.get("elapsed_seconds"):
+            return accounting["elapsed_seconds"]
+        if results.get("total_time"):
+            return time_seconds(results["total_time"])
+        if results.get("calculation_time") is not None:
+            return (results.get("setup_time") or 0.0) + results["calculation_time"]
+        return None
+
+    def observed_seconds(self, jobs: List[dict]) -> List[float]:
+        seconds = []
+        for job in jobs:
+            results = job["results"]
+            accounting = results.get("sacct") or {}
+            if accounting.get("state") == "TIMEOUT":
+                # ran out of time: it needs more than its limit, how much more is not known
+                limit = accounting.get("time_limit_seconds") or time_seconds(job["settings"].get("job_time_limit"))
+                if limit:
+                    seconds.append(2 * limit)
+                continue
+            if results.get("error") or results.get("cancelled"):
+                continue
+            elapsed = self.elapsed_seconds(results)
+            if elapsed:
+                seconds.append(elapsed)
+        return seconds
+
+    @staticmethod
+    def observed_mem_per_cpu(jobs: List[dict]) -> List[float]:
+        return [job["results"]["sacct"]["max_rss_mb_per_cpu"] for job in jobs
+                if (job["results"].get("sacct") or {}).get("max_rss_mb_per_cpu")]
+
+    def predict(self, app: str, model: str, tool: str, mpi_num_ranks: int, compiler: str) -> dict:
+        """
+        :return: {"time_str", "mem_per_cpu", "jobs", "time_predicted", "mem_predicted"}.
+        """
+        jobs = self.history.matching(tools=[tool], app=app, model=model, compiler=compiler,
+                                     mpi_num_ranks=mpi_num_ranks)
+        prediction = {"time_str": default_time_str, "mem_per_cpu": default_mem_per_cpu,
+                      "jobs": [job["job_id"] for job in jobs], "time_predicted": False, "mem_predicted": False}
+        seconds = self.observed_seconds(jobs)
+        if seconds:
+            limit = max(self.min_seconds, math.ceil(max(seconds) * self.time_margin / 60) * 60)
+            if self.max_seconds:
+                limit = min(limit, self.max_seconds)
+            prediction.update({"time_str": time_str(limit), "time_predicted": True})
+        mem = self.observed_mem_per_cpu(jobs)
+        if mem:
+            # whole 100 MB
+            mem_per_cpu = max(self.min_mem_per_cpu, int(math.ceil(max(mem) * self.mem_margin / 100) * 100))
+            if self.max_mem_per_cpu:
+                mem_per_cpu = min(mem_per_cpu, self.max_mem_per_cpu)
+            prediction.update({"mem_per_cpu": mem_per_cpu, "mem_predicted": True})
+        return prediction
@@ -0,0 +1,71 @@
+"""
+Inter-node scaling studies: the app on a growing number of nodes, connected by InfiniBand HDR100. Strong scaling keeps
+the resolution, weak scaling grows it with the nodes. The analyzer reports speedup, parallel efficiency and the
+communication share of the run time per node count (Analyzer/scaling_comparator.py).
+"""
+from typing import Dict, List
+
+from Builder.builder import App, Resolution
+from Runs.run import ScalingRun
+from Management.experiment import Experiment
+
+# node counts for the weak scaling, with about the same elements per rank
+default_weak_resolutions = {1: Resolution.G4000, 4: Resolution.G16000, 16: Resolution.G64000}
+
+
+class ScalingStudy:
+    """
+    One experiment with a ScalingRun per node count and repetition. The app is built once, bevor the first run.
+    """
+
+    def __init__(self, name: str, app: App, study: str = "strong", node_counts: List[int] = None,
+                 resolution: Resolution = Resolution.G64000, weak_resolutions: Dict[int, Resolution] = None,
+                 ranks_per_node: int = 96, repetitions: int = 1, batch_allocation: dict = None, *args, **kwargs):
+        """
+        Constructor.
+        :param name: Name of the experiment.
+        :param study: "strong" or "weak".
+        :param node_counts: Node counts of the strong scaling. Default: 1, 2, 4, 8.
+        :param resolution: Resolution of the strong scaling. Default: G64000.
+        :param weak_resolutions: Node count to resolution for the weak scaling. Default: default_weak_resolutions.
+        :param ranks_per_node: MPI ranks per node. Default: 96, a full node.
+        :param repetitions: Runs per node count, the medians are compared.
+        :param batch_allocation: Options of a batch allocation for the runs, as for Experiment. It needs as many
+        nodes as the largest run, and one repetition, the steps of an allocation need different names.
+        Default: None (one job per run).
+        Further arguments are given to every ScalingRun, e.g. compiler or distribution.
+        """
+        if study not in ["strong", "weak"]:
+            raise ValueError(f"Unknown scaling study: {study}")
+        self.name = name
+        self.app = app
+        self.study = study
+        if study == "strong":
+            self.points = {nodes: resolution for nodes in (node_counts if node_counts else [1, 2, 4, 8])}
+        else:
+            self.points = dict(weak_resolutions if weak_resolutions else default_weak_resolutions)
+        self.ranks_per_node = ranks_per_node
+        self.repetitions = repetitions
+        self.batch_allocation = batch_allocation
+        self.__args = args
+        self.__kwargs = kwargs
+
+    def runs(self) -> List[ScalingRun]:
+        runs = []
+        for nodes, resolution in sorted(self.points.items()):
+            for repetition in range(self.repetitions):
+                first = not runs
+                last = nodes == max(self.points) and repetition == self.repetitions - 1
+                runs.append(ScalingRun(self.app, resolution, nodes=nodes, ranks_per_node=self.ranks_per_node,
+                                       study=self.study, own_build=first, cleanup_build=last,
+                                       *self.__args, **self.__kwargs))
+        return runs
+
+    def do_run(self) -> dict:
+        """
+        Runs the study.
+        :return: The scaling results, by configuration.
+        """
+        experiment = Experiment(name=self.name, runs=self.runs(), batch_allocation=self.batch_allocation)
+        results = experiment.do_run()
+        return results["results"].get("scaling", {})
@@ -0,0 +1,264 @@
+"""
+Batch allocation: one job on one or a few nodes, the runs of an experiment are srun job steps in it, one after the
+other or side by side. The runs pass the queue once, instead of once each.
+Every run keeps its own OUT dir, std out, err and sacct files. Its job id is ALLOCATION_ID.INDEX, so the naming
+scheme and the analyzer see one job per run. The start, end and exit code of every step go into a .step file.
+"""
+import os
+import subprocess
+from typing import List, Optional, Tuple
+
+from Runs.run import BaseRun, PGORun, MassifRun, GProfRun, is_active, default_out_dir
+from SLURM import accounting
+from SLURM.advisor import SchedulerAdvisor
+from SLURM.default_slurm import DefaultPEngSlurmConfig
+from SLURM.exceptions import CommandExecutionException
+from SLURM.progress import JobProgress, board as progress_board
+
+
+def own_job_reason(run: BaseRun) -> Optional[str]:
+    """
+    Why the run can not be a job step and needs its own job, None if it can be one.
+    """
+    if isinstance(run, PGORun):
+        return "PGO runs can not be job steps, their phases are separate jobs"
+    if isinstance(run, MassifRun):
+        return "massif runs can not be job steps, srun would take their MPMD command line for a heterogeneous job"
+    if isinstance(run, GProfRun) and run.par_sum:
+        return ("parallel_sum GProf runs can not be job steps, their mpirun -x flag is --exclude for srun and the "
+                "steps would sum each other's gmon files in the shared model dir")
+    return None
+
+
+class BatchAllocation:
+    """
+    Runs a list of runs as job steps of one allocation. Same interface as a run: call do_run().
+    """
+
+    def __init__(self, name: str, runs: List[BaseRun], nodes: int = 1, cores_per_node: int = 96,
+                 concurrent: bool = False, mpi: str = "pmix", targets: List[dict] = None):
+        """
+        Constructor.
+        :param name: Name of the allocation, e.g. the experiment name. The job is called BATCH_<name>.
+        :param runs: The runs. PGORuns, MassifRuns and parallel_sum GProfRuns are not possible, see own_job_reason.
+        :param nodes: Nodes of the allocation.
+        :param cores_per_node: Cores per node. Default: 96, a Lichtenberg MPI node.
+        :param concurrent: Start all steps at once. Steps, that do not fit into the free cores, wait for them
+        (srun --exclusive). Default: False, one after the other.
+        :param mpi: The --mpi plugin of srun. Default: pmix.
+        :param targets: Candidate partitions/reservations, as for BaseRun.
+        """
+        self.name = name
+        self.runs = runs
+        self.nodes = nodes
+        self.cores_per_node = cores_per_node
+        self.concurrent = concurrent
+        self.mpi = mpi
+        self.home_dir = os.path.expanduser('~')
+        self.job_name = f"BATCH_{name}"
+        self.advisor = SchedulerAdvisor(targets) if targets else None
+        self.advice = None
+        self.slurm_configuration = None
+
+    @property
+    def cores(self) -> int:
+        return self.nodes * self.cores_per_node
+
+    def validate(self):
+        """
+        Checks, that the runs can share the allocation. Runs of the same sources need the same build, the steps run
+        after all builds are done. The same build is only built once.
+        """
+        skeletons = set()
+        builds = {}
+        for run in self.runs:
+            reason = own_job_reason(run)
+            if reason:
+                raise ValueError(f"{run.jobname_skeleton}: {reason}. Run them on their own.")
+            if run.jobname_skeleton in skeletons:
+                raise ValueError(f"{run.jobname_skeleton} is twice in the allocation, the runs would share their "
+                                 f"OUT dir.")
+            skeletons.add(run.jobname_skeleton)
+            if run.cores > self.cores or (run.nodes or 1) > self.nodes:
+                raise ValueError(f"{run.jobname_skeleton} needs {run.cores} cores on {run.nodes or 1} nodes, the "
+                                 f"allocation has {self.cores} on {self.nodes}.")
+            if not run.own_build:
+                continue
+            source = run.builder.source_path
+            if source not in builds:
+                builds[source] = run.builder.get_config()
+            elif builds[source] != run.builder.get_config():
+                raise ValueError(f"{run.jobname_skeleton} needs another build of {source} than an earlier run of "
+                                 f"the allocation. Put them into different allocations.")
+            else:
+                # already built by the earlier run
+                run.own_build = False
+        if self.concurrent:
+            resolutions = [run.resolution for run in self.runs]
+            if len(set(resolutions)) < len(resolutions):
+                print("Concurrent runs of the same resolution share the model dir, their ISSM output files may clash.")
+
+    def time_seconds(self) -> int:
+        """
+        Time limit of the allocation, from the time limits of the runs: their sum, or for concurrent steps, the end
+        of the last step, if each step starts as soon as there are enough free cores.
+        """
+        limits = [accounting.time_seconds(run.slurm_configuration.get_config()["job_time_limit"]) for run in self.runs]
+        if not self.concurrent:
+            return sum(limits)
+        # (end, cores) of the running steps
+        running = []
+        free, now = self.cores, 0
+        for run, limit in zip(self.runs, limits):
+            while free < run.cores:
+                running.sort()
+                now, cores = running.pop(0)
+                free += cores
+            running.append((now + limit, run.cores))
+            free -= run.cores
+        return max(end for end, _ in running)
+
+    def setup_slurm_config(self):
+        """
+        The allocation job: the steps of all runs. Call prepare() of the runs first.
+        """
+        time_str = accounting.time_str(self.time_seconds())
+        mem_per_cpu = max(run.slurm_configuration.get_config()["mem_per_cpu"] for run in self.runs)
+        self.slurm_configuration = DefaultPEngSlurmConfig(
+            job_name=self.job_name,
+            output_directory=default_out_dir,
+            job_file_directory=self.home_dir,
+            num_mpi_ranks=self.cores,
+            time_str=time_str,
+            mem_per_cpu=mem_per_cpu,
+            nodes=self.nodes,
+            ranks_per_node=self.cores_per_node
+        )
+        if self.advisor:
+            self.advice = self.advisor.advise(cores=self.cores, time_str=time_str)
+            if self.advice:
+                print(f"Submitting to partition {self.advice['partition']} (reservation "
+                      f"{self.advice.get('reservation')}), expected wait {self.advice['adjusted_wait']:.0f} s.")
+                self.slurm_configuration.set_target(partition=self.advice["partition"],
+                                                    reservation=self.advice.get("reservation"),
+                                                    account=self.advice.get("account"))
+            else:
+                print("No eligible target, submitting to the default target.")
+        for run in self.runs:
+            self.slurm_configuration.add_command(f"echo 'Step {run.step_index}: {run.jobname_skeleton}'")
+            commands = run.step_commands()
+            if self.concurrent:
+                commands[-1] += " &"
+            for command in commands:
+                self.slurm_configuration.add_command(command)
+        if self.concurrent:
+            self.slurm_configuration.add_command("wait")
+        self.slurm_configuration.make_dirs()
+        self.slurm_configuration.write_slurm_script()
+
+    def prepare(self):
+        """
+        Turns the runs into steps, builds them and writes the allocation script.
+        """
+        self.validate()
+        for index, run in enumerate(self.runs):
+            run.as_step(index, mpi=self.mpi)
+            run.prepare()
+        self.setup_slurm_config()
+
+    def step_state(self, run: BaseRun, job_id: int) -> str:
+        """
+        State of the step from its .step file: PENDING before its start, RUNNING, or COMPLETED with its exit code.
+        """
+        step_file = f"{run.out_path}/{run.jobname_skeleton}.step.{job_id}.{run.step_index}"
+        try:
+            with open(step_file, "r") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return "PENDING"
+        for line in lines:
+            if line.startswith("exit_code "):
+                return "COMPLETED" if line.split(" ", 1)[1] == "0" else "FAILED"
+        return "RUNNING" if any(line.startswith("start ") for line in lines) else "PENDING"
+
+    def run(self) -> int:
+        """
+        Submits the allocation and waits for it, with the progress of every step.
+        """
+        if is_active["run"]:
+            job_id = self.slurm_configuration.sbatch(active=True)
+        else:
+            sbatch_command = self.slurm_configuration.sbatch(active=False)
+            print("Sbatch command: ", sbatch_command)
+            res = subprocess.run(["bash", "-c", f"cd {self.home_dir}; {sbatch_command}"],
+                                 executable="/bin/bash",
+                                 env=os.environ.copy(),
+                                 stdout=subprocess.PIPE)
+            if res.returncode != 0:
+                raise CommandExecutionException(sbatch_command)
+            res = res.stdout.decode("utf-8")
+            print("Result: ", res)
+            res = res.split("Submitted batch job")[1]
+            job_id = int(res.split(" ")[1].split("\n")[0])
+        if self.advice:
+            self.advisor.record_submission(job_id, self.advice)
+        steps = {}
+        for run in self.runs:
+            config = run.slurm_configuration.get_config()
+            steps[f"{job_id}.{run.step_index}"] = (run, JobProgress(f"{config['std_out_path']}.{job_id}.{run.step_index}",
+                                                                   name=run.jobname_skeleton))
+
+        def progress_hook(allocation_id, state: str, waited: int):
+            # one status view for all steps, per check
+            for run, progress in steps.values():
+                progress.state = self.step_state(run, allocation_id) if state and "R" in state else state
+                progress.update()
+            progress_board.print()
+            return None
+
+        for step_id, (_, progress) in steps.items():
+            progress_board.add(step_id, progress)
+        try:
+            self.slurm_configuration.wait(job_id, hooks=[progress_hook])
+        finally:
+            for step_id in steps:
+                progress_board.remove(step_id)
+        return job_id
+
+    def cleanup(self, job_id: int):
+        """
+        The cleanup of every run, with its step id. The builds are removed once, after all steps.
+        """
+        for run in self.runs:
+            run.cleanup(f"{job_id}.{run.step_index}", remove_build=False)
+        removed = set()
+        for run in self.runs:
+            source = run.builder.source_path
+            if run.cleanup_build and source not in removed:
+                try:
+                    run.remove_build()
+                except OSError as e:
+                    print(f"Build of {source} not removed: {e}")
+                removed.add(source)
+        if self.advice:
+            try:
+                wait = accounting.parse_sacct(accounting.sacct(job_id)).get("wait_seconds")
+                if wait is not None:
+                    self.advisor.record_actual(job_id, wait)
+            except CommandExecutionException as e:
+                print(f"No accounting for job {job_id}: {e}")
+        # back up the allocation script next to its out files
+        slurm_path = self.slurm_configuration.get_slurm_file_path()
+        out_dir = os.path.dirname(self.slurm_configuration.get_config()["std_out_path"])
+        subprocess.run(["cp", f"{slurm_path}.sh", f"{out_dir}/{self.job_name}.job.{job_id}"])
+        os.remove(f"{slurm_path}.sh")
+
+    def do_run(self) -> List[Tuple[str, dict, dict]]:
+        """
+        Runs all runs in the allocation.
+        :return: Out path, builder config and slurm config of every run, as from BaseRun.do_run().
+        """
+        self.prepare()
+        job_id = self.run()
+        self.cleanup(job_id)
+        return [(run.out_path, run.builder.get_config(), run.slurm_configuration.get_config()) for run in self.runs]
@@ -0,0 +1,75 @@
+/*
+ * MPI latency and bandwidth: ping-pong between the first and the last rank, allreduce of one double over all ranks.
+ * Usage: mpi_bench [bandwidth message bytes] [repetitions]
+ * Prints the one way latency in us, the bandwidth in GB/s and the allreduce latency in us (slowest rank).
+ */
+#include <mpi.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+static double pingpong(char *buffer, int bytes, int repetitions, int rank, int peer) {
+    double t = 0.0;
+    /* the first round trips are warm up */
+    for (int r = -repetitions / 10; r < repetitions; r++) {
+        if (r == 0)
+            t = MPI_Wtime();
+        if (rank == 0) {
+            MPI_Send(buffer, bytes, MPI_CHAR, peer, 0, MPI_COMM_WORLD);
+            MPI_Recv(buffer, bytes, MPI_CHAR, peer, 0, MPI_COMM_WORLD, MPI_STATUS_IGNORE);
+        } else {
+            MPI_Recv(buffer, bytes, MPI_CHAR, 0, 0, MPI_COMM_WORLD, MPI_STATUS_IGNORE);
+            MPI_Send(buffer, bytes, MPI_CHAR, 0, 0, MPI_COMM_WORLD);
+        }
+    }
+    /* one way time */
+    return (MPI_Wtime() - t) / repetitions / 2;
+}
+
+int main(int argc, char **argv) {
+    MPI_Init(&argc, &argv);
+    int rank, size;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &size);
+    int bytes = argc > 1 ? atoi(argv[1]) : 1 << 22;
+    int repetitions = argc > 2 ? atoi(argv[2]) : 10000;
+    int peer = size - 1;
+
+    char name[MPI_MAX_PROCESSOR_NAME], peer_name[MPI_MAX_PROCESSOR_NAME];
+    int length;
+    memset(name, 0, sizeof(name));
+    MPI_Get_processor_name(name, &length);
+    if (rank == 0)
+        printf("mpi_ranks %d\n", size);
+    if (size > 1 && (rank == 0 || rank == peer)) {
+        if (rank == peer)
+            MPI_Send(name, MPI_MAX_PROCESSOR_NAME, MPI_CHAR, 0, 1, MPI_COMM_WORLD);
+        else
+            MPI_Recv(peer_name, MPI_MAX_PROCESSOR_NAME, MPI_CHAR, peer, 1, MPI_COMM_WORLD, MPI_STATUS_IGNORE);
+        char *buffer = calloc(bytes > 8 ? bytes : 8, 1);
+        double latency = pingpong(buffer, 8, repetitions, rank, peer);
+        /* large messages take longer, fewer round trips are enough */
+        double transfer = pingpong(buffer, bytes, repetitions / 100 > 10 ? repetitions / 100 : 10, rank, peer);
+        if (rank == 0) {
+            printf("mpi_pingpong_same_node %d\n", strcmp(name, peer_name) == 0);
+            printf("mpi_pingpong_latency_us %.3f\n", latency * 1e6);
+            printf("mpi_pingpong_bandwidth %.3f\n", bytes / transfer / 1e9);
+        }
+        free(buffer);
+    }
+
+    double value = rank, result, t;
+    for (int r = 0; r < repetitions / 10; r++)
+        MPI_Allreduce(&value, &result, 1, MPI_DOUBLE, MPI_SUM, MPI_COMM_WORLD);
+    MPI_Barrier(MPI_COMM_WORLD);
+    t = MPI_Wtime();
+    for (int r = 0; r < repetitions; r++)
+        MPI_Allreduce(&value, &result, 1, MPI_DOUBLE, MPI_SUM, MPI_COMM_WORLD);
+    t = (MPI_Wtime() - t) / repetitions;
+    double slowest;
+    MPI_Reduce(&t, &slowest, 1, MPI_DOUBLE, MPI_MAX, 0, MPI_COMM_WORLD);
+    if (rank == 0)
+        printf("mpi_allreduce_latency_us %.3f\n", slowest * 1e6);
+    MPI_Finalize();
+    return 0;
+}
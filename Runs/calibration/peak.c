@@ -0,0 +1,63 @@
+/*
+ * Flop peak kernel: independent chains of vector FMAs per thread, OpenMP parallel. There are enough chains to hide
+ * the FMA latency on two FMA ports, and few enough to stay in the vector registers.
+ * Compile with -O3 -march=native, so the compiler uses the widest FMA of the node.
+ * Usage: peak [iterations] [repetitions]
+ * Prints the best double precision rate of all repetitions in GFlop/s.
+ */
+#include <omp.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+#if defined(__AVX512F__)
+#define WIDTH 8
+#elif defined(__AVX__)
+#define WIDTH 4
+#else
+#define WIDTH 2
+#endif
+#define CHAINS 12
+
+int main(int argc, char **argv) {
+    long iterations = argc > 1 ? atol(argv[1]) : 200000000L;
+    int repetitions = argc > 2 ? atoi(argv[2]) : 5;
+    double best = 0.0, check = 0.0;
+    int threads = 1;
+    for (int r = 0; r < repetitions; r++) {
+        double sum = 0.0;
+        double t = omp_get_wtime();
+#pragma omp parallel reduction(+ : sum)
+        {
+#pragma omp single
+            threads = omp_get_num_threads();
+            double acc[CHAINS][WIDTH], x[WIDTH], y[WIDTH];
+            for (int w = 0; w < WIDTH; w++) {
+                /* acc converges to y / (1 - x): no overflow, no denormals */
+                x[w] = 0.999999 - 1e-9 * omp_get_thread_num();
+                y[w] = 1e-3 * (w + 1);
+                for (int c = 0; c < CHAINS; c++)
+                    acc[c][w] = c;
+            }
+            for (long i = 0; i < iterations; i++) {
+                for (int c = 0; c < CHAINS; c++) {
+#pragma omp simd
+                    for (int w = 0; w < WIDTH; w++)
+                        acc[c][w] = acc[c][w] * x[w] + y[w];
+                }
+            }
+            for (int c = 0; c < CHAINS; c++)
+                for (int w = 0; w < WIDTH; w++)
+                    sum += acc[c][w];
+        }
+        t = omp_get_wtime() - t;
+        double gflops = 2.0 * CHAINS * WIDTH * iterations * threads / t / 1e9;
+        if (gflops > best)
+            best = gflops;
+        check += sum;
+    }
+    fprintf(stderr, "peak: check %g\n", check);
+    printf("peak_threads %d\n", threads);
+    printf("peak_vector_width %d\n", WIDTH);
+    printf("peak_gflops %.3f\n", best);
+    return 0;
+}
@@ -0,0 +1,57 @@
+/*
+ * STREAM like memory bandwidth kernel, copy and triad, OpenMP parallel.
+ * Usage: stream [elements per array] [repetitions]
+ * Prints the best bandwidth of all repetitions in GB/s, counted like STREAM (without write allocate traffic).
+ */
+#include <omp.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+int main(int argc, char **argv) {
+    long n = argc > 1 ? atol(argv[1]) : 1L << 27;
+    int repetitions = argc > 2 ? atoi(argv[2]) : 10;
+    double *a = malloc(n * sizeof(double));
+    double *b = malloc(n * sizeof(double));
+    double *c = malloc(n * sizeof(double));
+    if (!a || !b || !c) {
+        fprintf(stderr, "stream: cannot allocate 3 arrays of %ld elements\n", n);
+        return 1;
+    }
+    /* first touch: the pages go to the memory of the thread, that uses them later */
+#pragma omp parallel for schedule(static)
+    for (long i = 0; i < n; i++) {
+        a[i] = 1.0;
+        b[i] = 2.0;
+        c[i] = 0.0;
+    }
+    const double scalar = 3.0;
+    double best_copy = 0.0, best_triad = 0.0;
+    for (int r = 0; r < repetitions; r++) {
+        double t = omp_get_wtime();
+#pragma omp parallel for schedule(static)
+        for (long i = 0; i < n; i++)
+            c[i] = a[i];
+        t = omp_get_wtime() - t;
+        if (2.0 * n * sizeof(double) / t > best_copy)
+            best_copy = 2.0 * n * sizeof(double) / t;
+        t = omp_get_wtime();
+#pragma omp parallel for schedule(static)
+        for (long i = 0; i < n; i++)
+            a[i] = b[i] + scalar * c[i];
+        t = omp_get_wtime() - t;
+        if (3.0 * n * sizeof(double) / t > best_triad)
+            best_triad = 3.0 * n * sizeof(double) / t;
+    }
+    /* use the results, so the loops cannot be optimized away */
+    double check = 0.0;
+    for (long i = 0; i < n; i += n / 16 + 1)
+        check += a[i] + c[i];
+    fprintf(stderr, "stream: check %g\n", check);
+    printf("stream_threads %d\n", omp_get_max_threads());
+    printf("stream_copy_bandwidth %.3f\n", best_copy / 1e9);
+    printf("stream_triad_bandwidth %.3f\n", best_triad / 1e9);
+    free(a);
+    free(b);
+    free(c);
+    return 0;
+}
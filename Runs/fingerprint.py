@@ -0,0 +1,162 @@
+"""
+Runtime environment fingerprint. Runs at the start of a SLURM job on the compute node and writes what the job actually
+runs on into a json file: lscpu, numactl -H, cpu frequency governor and frequencies, kernel, loaded modules,
+node name and the shared libraries (ldd) of the executable.
+The "config" part has the fields of the ExperimentConfig, the analyzer takes them instead of lichtenberg_defaults.
+Only uses the python standard library, because it runs on the compute node with whatever python3 is there.
+
+Usage: python3 fingerprint.py --out FILE [--executable EXECUTABLE]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import subprocess
+
+
+def run(command: list):
+    """
+    Output of a command, None if it is not there or fails.
+    """
+    try:
+        res = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=60)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    if res.returncode != 0:
+        return None
+    return res.stdout.decode("utf-8", "replace")
+
+
+def read_first(path: str):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except (FileNotFoundError, PermissionError, OSError):
+        return None
+
+
+def parse_lscpu(text: str) -> dict:
+    fields = {}
+    for line in (text or "").splitlines():
+        key, _, value = line.partition(":")
+        if value:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def parse_os_release() -> dict:
+    fields = {}
+    for line in (read_first("/etc/os-release") or "").splitlines():
+        key, _, value = line.partition("=")
+        fields[key] = value.strip('"')
+    return fields
+
+
+def parse_ldd(text: str) -> dict:
+    """
+    Library name: resolved path. Libraries without a path (vdso) are left out.
+    """
+    libraries = {}
+    for line in (text or "").splitlines():
+        match = re.match(r"^\s*(\S+)\s+=>\s+(\S+)", line)
+        if match and match.group(2).startswith("/"):
+            libraries[match.group(1)] = match.group(2)
+    return libraries
+
+
+def vector_extension(flags: set):
+    if "avx512f" in flags:
+        return "AVX", 512
+    if "avx2" in flags or "avx" in flags:
+        return "AVX", 256
+    if "sse2" in flags:
+        return "SSE", 128
+    if "asimd" in flags:
+        return "NEON", 128
+    return None, None
+
+
+def network():
+    """
+    The first infiniband port, e.g. ("Infiniband HDR", 100) for "100 Gb/sec (4X HDR)".
+    """
+    for rate_file in sorted(glob.glob("/sys/class/infiniband/*/ports/*/rate")):
+        rate = read_first(rate_file)
+        match = re.match(r"^(\d+(?:\.\d+)?)\s*Gb/sec(?:\s*\(\S+\s+(\w+)\))?", rate or "")
+        if match:
+            name = f"Infiniband {match.group(2)}" if match.group(2) else "Infiniband"
+            return name, float(match.group(1))
+    return None, None
+
+
+def fingerprint(executable: str = None) -> dict:
+    lscpu_text = run(["lscpu"])
+    numactl_text = run(["numactl", "-H"])
+    ldd_text = run(["ldd", executable]) if executable else None
+    lscpu = parse_lscpu(lscpu_text)
+    os_release = parse_os_release()
+    uname = platform.uname()
+    governors = {read_first(path) for path in glob.glob("/sys/devices/system/cpu/cpu*/cpufreq/scaling_governor")}
+    governors.discard(None)
+    frequencies = []
+    for path in glob.glob("/sys/devices/system/cpu/cpu*/cpufreq/scaling_cur_freq"):
+        value = read_first(path)
+        if value and value.isdigit():
+            frequencies.append(int(value) / 1000)
+    mem_total = None
+    for line in (read_first("/proc/meminfo") or "").splitlines():
+        if line.startswith("MemTotal:"):
+            mem_total = int(line.split()[1]) // 1024
+    numa_nodes = None
+    match = re.search(r"^available:\s*(\d+) nodes", numactl_text or "", re.MULTILINE)
+    if match:
+        numa_nodes = int(match.group(1))
+    vector_type, vector_bits = vector_extension(set(lscpu.get("Flags", "").split()))
+    network_name, network_speed = network()
+
+    def number(key, cast=int):
+        try:
+            return cast(lscpu[key])
+        except (KeyError, ValueError):
+            return None
+
+    config = {
+        "os": os_release.get("NAME"),
+        "os_version": os_release.get("VERSION_ID"),
+        "cpu": lscpu.get("Model name"),
+        "cpu_cores": number("Core(s) per socket"),
+        "cpu_count": number("Socket(s)"),
+        "node_mem": mem_total,
+        "vector_type": vector_type,
+        "vector_bits": vector_bits,
+        "network": network_name,
+        "network_speed": network_speed,
+        "kernel": uname.release,
+        "node": uname.node,
+        "numa_nodes": numa_nodes,
+        "cpu_governor": ",".join(sorted(governors)) if governors else None,
+        "cpu_max_mhz": number("CPU max MHz", float),
+        "cpu_mhz": sum(frequencies) / len(frequencies) if frequencies else None,
+        "modules": [m for m in os.environ.get("LOADEDMODULES", "").split(":") if m],
+        "libraries": parse_ldd(ldd_text),
+    }
+    return {
+        # fields, that could not be read, are left out: the analyzer keeps its defaults for them
+        "config": {key: value for key, value in config.items() if value is not None},
+        "raw": {
+            "lscpu": lscpu_text,
+            "numactl": numactl_text,
+            "ldd": ldd_text,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runtime environment fingerprint of the compute node.")
+    parser.add_argument("--out", required=True, help="json file to write the fingerprint to.")
+    parser.add_argument("--executable", default=None, help="The executable of the app, for its shared libraries.")
+    args = parser.parse_args()
+    with open(args.out, "w") as f:
+        json.dump(fingerprint(args.executable), f, indent=4)
@@ -1,11 +1,20 @@
+import glob
+import math
 import os
+import shutil
 import subprocess
-from typing import Tuple
+from typing import List, Tuple
 
 import SLURM.slurm
 from Builder.builder import BaseBuilder, App, Resolution, Compiler, GProfBuilder, CompilerVectorizationReportBuilder, \
-    CallgrindBuilder, ScorePBuilder
-from SLURM.default_slurm import DefaultPEngSlurmConfig
+    CallgrindBuilder, ScorePBuilder, PGOBuilder, CalibrationBuilder, build_defaults
+from SLURM import accounting
+from SLURM.advisor import SchedulerAdvisor
+from SLURM.default_slurm import DefaultPEngSlurmConfig, default_time_str
+from SLURM.progress import JobProgress, board as progress_board
+from SLURM.watchdog import Watchdog
+from Management.history import History
+from Management.predictor import ResourcePredictor
 
 # source and executable paths by app:
 from SLURM.exceptions import CommandExecutionException
@@ -48,6 +57,12 @@ default_runner = "mpirun"
 default_executable = "$ISSM_DIR/bin/issm.exe"
 default_run_command = "TransientSolution $PWD PAtransient_std_$FOLDER"
 default_out_dir = "/home/kurse/kurs00054/jo83xafu/issm-output/OUT"
+# the sampler script runs on the compute node, next to the app
+sampler_path = f"{os.path.dirname(os.path.abspath(__file__))}/sampler.py"
+# the fingerprint script runs on the compute node, at the start of the job
+fingerprint_path = f"{os.path.dirname(os.path.abspath(__file__))}/fingerprint.py"
+# the calibration kernels are compiled in the job, on the compute node
+calibration_path = f"{os.path.dirname(os.path.abspath(__file__))}/calibration"
 
 
 class BaseRun:
@@ -66,17 +81,68 @@ class BaseRun:
                  runner: str = default_runner,
                  run_command: str = default_run_command,
                  cleanup_build: bool = True,
-                 vanilla: bool = True):
+                 vanilla: bool = True,
+                 sample_interval: float = None,
+                 petsc_log_view: bool = False,
+                 watchdog: dict = None,
+                 predict_resources: bool = True,
+                 targets: List[dict] = None,
+                 nodes: int = None,
+                 ranks_per_node: int = None,
+                 cpus_per_rank: int = 1,
+                 distribution: str = None,
+                 hint: str = None):
+        """
+        Constructor.
+        :param sample_interval: If given, a node-level sampler runs next to the app and records cpu load, memory,
+        rank RSS and cpu frequency every sample_interval seconds. Default: None (no sampling).
+        :param petsc_log_view: Let PETSc write its -log_view performance summary into the OUT dir. Default: False.
+        :param watchdog: If given, a watchdog tails the out and err files while the job runs, and cancels it on a
+        crash, a stall, or timesteps far slower than the baseline of earlier runs. The dict holds the options of
+        SLURM.watchdog.Watchdog, e.g. {"stall_seconds": 600}, {} for the defaults. Default: None (no watchdog).
+        :param predict_resources: Request the time limit and memory per cpu predicted from earlier runs of the same
+        app, resolution, tool, ranks and compiler, instead of the defaults. Default: True.
+        :param targets: Candidate partitions/reservations, e.g. [{"partition": "kurs00054", "reservation": "kurs00054",
+        "account": "kurs00054"}, {"partition": "test24", "account": "kurs00054"}]. The job goes to the one, where it is
+        expected to start first (SLURM.advisor). Default: None (the target of DefaultPEngSlurmConfig).
+        :param nodes: Nodes of the job. Default: None (as many as the ranks need, one for 96 ranks).
+        :param ranks_per_node: MPI ranks per node, nodes * ranks_per_node must be num_mpi_ranks. Default: None
+        (the nodes are filled up).
+        :param cpus_per_rank: Cores per MPI rank, e.g. 2 to leave every other core idle. Default: 1.
+        :param distribution: The --distribution of the ranks over the nodes and sockets, e.g. "block:cyclic".
+        Default: None (SLURM's default).
+        :param hint: The --hint for the binding, e.g. "nomultithread". Default: None.
+        """
         self.app = app
         self.resolution = resolution
         self.compiler = compiler
         self.num_mpi_ranks = num_mpi_ranks
         self.own_build = own_build
-        self.runner = runner
+        # job geometry
+        if nodes and ranks_per_node and nodes * ranks_per_node != num_mpi_ranks:
+            raise ValueError(f"{nodes} nodes with {ranks_per_node} ranks each are not {num_mpi_ranks} ranks.")
+        if ranks_per_node and not nodes:
+            nodes = math.ceil(num_mpi_ranks / ranks_per_node)
+        self.nodes = nodes
+        self.ranks_per_node = ranks_per_node
+        self.cpus_per_rank = cpus_per_rank
+        self.distribution = distribution
+        self.hint = hint
+        # the launcher places the ranks like the job geometry
+        self.runner = f"{runner}{self.launcher_flags(runner)}"
         self.home_dir = os.path.expanduser('~')
         self.default_run_command = run_command
         self.run_command = f"{self.runner} -n {self.num_mpi_ranks} {self.home_dir}/{executable_path[self.app]} {self.default_run_command}"
         self.cleanup_build = cleanup_build
+        self.sample_interval = sample_interval
+        self.petsc_log_view = petsc_log_view
+        self.watchdog = watchdog
+        self.predict_resources = predict_resources
+        self.targets = targets
+        self.advisor = SchedulerAdvisor(targets) if targets else None
+        self.advice = None
+        # index of the run in a batch allocation, None for an own job
+        self.step_index = None
         self.execution_command = []
         self.jobfile = None
         self.builder = builder
@@ -94,6 +160,38 @@ class BaseRun:
         if vanilla:
             self.add_tool("VANILLA")
 
+    @property
+    def cores(self) -> int:
+        """
+        Cores of the job: MPI ranks times cores per rank.
+        """
+        return self.num_mpi_ranks * self.cpus_per_rank
+
+    def launcher_flags(self, launcher: str) -> str:
+        """
+        Flags of the launcher for the job geometry, with a leading space. srun takes the SLURM options, OpenMPI's
+        mpirun maps the ranks per node and binds them to cpus_per_rank cores each. Distribution and hint are
+        options of the job, mpirun does not get them.
+        """
+        flags = []
+        if launcher.split(" ")[0] == "srun":
+            if self.nodes:
+                flags.append(f"--nodes={self.nodes}")
+            if self.ranks_per_node:
+                flags.append(f"--ntasks-per-node={self.ranks_per_node}")
+            flags.append(f"--cpus-per-task={self.cpus_per_rank}")
+            if self.distribution:
+                flags.append(f"--distribution={self.distribution}")
+            if self.hint:
+                flags.append(f"--hint={self.hint}")
+        elif launcher.split(" ")[0] == "mpirun":
+            pe = f":PE={self.cpus_per_rank}" if self.cpus_per_rank > 1 else ""
+            if self.ranks_per_node:
+                flags.append(f"--map-by ppr:{self.ranks_per_node}:node{pe}")
+            elif pe:
+                flags.append(f"--map-by slot{pe}")
+        return "".join(f" {flag}" for flag in flags)
+
     def add_tool(self, name: str):
         """
         Adds a tool to the naming scheme.
@@ -101,6 +199,14 @@ class BaseRun:
         self.jobname_skeleton = f"{self.jobname_skeleton}_{name}"
         self.out_path = f"{default_out_dir}/{self.jobname_skeleton}"
 
+    @property
+    def tool(self) -> str:
+        """
+        The tool of the naming scheme, e.g. VANILLA.
+        """
+        parts = self.jobname_skeleton.split(".")[0].split("_")
+        return parts[4] if len(parts) > 4 else None
+
     def add_command(self, command: str, bevor: bool = True):
         """
         adds a command.
@@ -129,29 +235,90 @@ class BaseRun:
         """
         self.run_command = f"{self.runner} -{flag} {value} -n {self.num_mpi_ranks} {self.home_dir}/{executable_path[self.app]} {self.default_run_command}"
 
+    def add_app_argument(self, argument: str):
+        """
+        Adds an argument to the command line of the app itself, e.g. PETSc options. Keeps prefixes and pipes of
+        the run command.
+        """
+        extended = f"{self.default_run_command} {argument}"
+        self.run_command = self.run_command.replace(self.default_run_command, extended)
+        self.default_run_command = extended
+
     def __add_execution_command(self, commands):
         """
         Adds a commands to add to execution. Helper: Everything must be in ONE subprocess call, otherwise it messes up env vars.
         """
         self.execution_command.extend(commands)
 
+    @property
+    def job_id_variable(self) -> str:
+        """
+        The job id in the job script: the one of the job, or ALLOCATION_ID.INDEX for a job step.
+        """
+        return "$SLURM_JOB_ID" if self.step_index is None else f"$SLURM_JOB_ID.{self.step_index}"
+
+    def sampler_command(self) -> str:
+        """
+        Returns the command to start the node sampler in the background of the job.
+        """
+        std_out_path = self.slurm_configuration.get_config()["std_out_path"]
+        return f"python3 {sampler_path} --interval {self.sample_interval} " \
+               f"--out {self.out_path}/{self.jobname_skeleton}.samples " \
+               f"--stdout {std_out_path}.{self.job_id_variable} " \
+               f"--match {os.path.basename(executable_path[self.app])} &"
+
+    def fingerprint_command(self) -> str:
+        """
+        Returns the command to write the environment fingerprint of the compute node into the OUT dir.
+        """
+        return f"python3 {fingerprint_path} --out {self.out_path}/{self.jobname_skeleton}.fingerprint " \
+               f"--executable {self.home_dir}/{executable_path[self.app]}"
+
     def setup_slurm_config(self):
         """
         Sets up the slurm config. Has to be called bevor accessing the slurm config.
         """
         if not self.slurm_configuration:
+            resources = {}
+            if self.predict_resources:
+                prediction = ResourcePredictor().predict(app=self.app, model=self.resolution, tool=self.tool,
+                                                         mpi_num_ranks=self.num_mpi_ranks, compiler=self.compiler)
+                print(f"Requesting {prediction['time_str']} and {prediction['mem_per_cpu']} MB per cpu "
+                      f"(predicted from {len(prediction['jobs'])} earlier runs: time {prediction['time_predicted']}, "
+                      f"memory {prediction['mem_predicted']}).")
+                resources = {"time_str": prediction["time_str"], "mem_per_cpu": prediction["mem_per_cpu"]}
             self.slurm_configuration = DefaultPEngSlurmConfig(
                 job_name=self.jobname_skeleton,
                 output_directory=default_out_dir,
                 job_file_directory=self.home_dir + "/" + model_setup_path[self.resolution],
-                num_mpi_ranks=self.num_mpi_ranks
+                num_mpi_ranks=self.num_mpi_ranks,
+                nodes=self.nodes,
+                ranks_per_node=self.ranks_per_node,
+                cpus_per_rank=self.cpus_per_rank,
+                distribution=self.distribution,
+                hint=self.hint,
+                **resources
             )
+            if self.advisor:
+                self.advice = self.advisor.advise(cores=self.cores,
+                                                  time_str=resources.get("time_str", default_time_str))
+                if self.advice:
+                    print(f"Submitting to partition {self.advice['partition']} (reservation "
+                          f"{self.advice.get('reservation')}), expected wait {self.advice['adjusted_wait']:.0f} s.")
+                    self.slurm_configuration.set_target(partition=self.advice["partition"],
+                                                        reservation=self.advice.get("reservation"),
+                                                        account=self.advice.get("account"))
+                else:
+                    print("No eligible target, submitting to the default target.")
 
     def prepare(self):
         """
         Builds the ISSM build.
         """
         self.setup_slurm_config()
+        if self.petsc_log_view:
+            # the job name is final now, the log goes next to the out files
+            self.add_app_argument(f"-log_view :{self.out_path}/{self.jobname_skeleton}.petsc-log")
         # make out dir, just in case something else puts stuff there
         self.slurm_configuration.make_dirs()
         if self.own_build:
@@ -176,10 +343,20 @@ class BaseRun:
         else:
             self.__add_execution_command(self.builder.load_modules(active=False))
         # generate job_script:
+        # first, what the job runs on: node, cpu, frequencies, modules, libraries
+        self.slurm_configuration.add_command(self.fingerprint_command())
         for command in self.__commands_bevor:
             self.slurm_configuration.add_command(command)
         # add run command
+        if self.sample_interval:
+            self.slurm_configuration.add_command(self.sampler_command())
+            self.slurm_configuration.add_command("SAMPLER_PID=$!")
         self.slurm_configuration.add_command(self.run_command)
+        if self.step_index is not None:
+            # the exit code of the app, for the .step file
+            self.slurm_configuration.add_command("STEP_EXIT_CODE=$?")
+        if self.sample_interval:
+            self.slurm_configuration.add_command("kill $SAMPLER_PID")
         for command in self.__commands_after:
             print("command: ", command)
             self.slurm_configuration.add_command(command)
@@ -218,19 +395,110 @@ class BaseRun:
             print("Result: ", res)
             res = res.split("Submitted batch job")[1]
             job_id = int(res.split(" ")[1].split("\n")[0])
-        return self.slurm_configuration.wait(job_id)
+        if self.advice:
+            self.advisor.record_submission(job_id, self.advice)
+        config = self.slurm_configuration.get_config()
+        history = History()
+        # the number of steps does not depend on the tool
+        baseline = history.baseline(app=self.app, model=self.resolution, compiler=self.compiler,
+                                    mpi_num_ranks=self.num_mpi_ranks)
+        # live progress of the job, next to the other jobs the driver waits for
+        progress = JobProgress(f"{config['std_out_path']}.{job_id}", name=self.jobname_skeleton,
+                               total_steps=round(baseline["steps"]) if baseline and baseline["steps"] else None)
+        hooks = [progress]
+        if self.watchdog is not None:
+            # the speed only compares to earlier runs of the same tool, the overhead of e.g. valgrind or -pg would
+            # look like a slow run; runs without tool overhead share their baseline
+            if self.tool not in [None, "VANILLA", "MPI-COMPARE"]:
+                baseline = history.baseline(app=self.app, model=self.resolution, compiler=self.compiler,
+                                            mpi_num_ranks=self.num_mpi_ranks, tools=[self.tool])
+            hooks.append(self.make_watchdog(job_id, baseline))
+        progress_board.add(job_id, progress)
+        try:
+            return self.slurm_configuration.wait(job_id, hooks=hooks)
+        finally:
+            progress_board.remove(job_id)
+
+    def make_watchdog(self, job_id, baseline: dict = None) -> Watchdog:
+        """
+        The watchdog for the job.
+        :param baseline: Of earlier runs of the same app, model, compiler, ranks and tool, as from History.baseline.
+        """
+        config = self.slurm_configuration.get_config()
+        if baseline is None:
+            print(f"No earlier runs of {self.jobname_skeleton}, the watchdog does not check the speed.")
+        return Watchdog(f"{config['std_out_path']}.{job_id}", f"{config['std_err_path']}.{job_id}",
+                        baseline=baseline, **self.watchdog)
+
+    def as_step(self, index: int, mpi: str = "pmix"):
+        """
+        Makes the run a job step of a batch allocation (Runs.batch.BatchAllocation): the app is started with srun in
+        the allocation instead of mpirun in an own job. Its job id is ALLOCATION_ID.INDEX.
+        :param index: Index of the run in the allocation.
+        :param mpi: The --mpi plugin of srun. Default: pmix.
+        """
+        self.step_index = index
+        step_runner = f"srun --exclusive --mpi={mpi} --job-name={self.jobname_skeleton}{self.launcher_flags('srun')}"
+        self.run_command = self.run_command.replace(f"{self.runner} ", f"{step_runner} ", 1)
+        self.runner = step_runner
+        # the allocation is placed and watched as a whole
+        self.advisor = None
+        self.advice = None
+        if self.watchdog is not None:
+            print(f"{self.jobname_skeleton}: no watchdog for job steps, a step can not be cancelled on its own.")
+            self.watchdog = None
+
+    def step_commands(self) -> List[str]:
+        """
+        The commands of the run as job step, in a subshell, with its own out and err files and its start and end
+        in a .step file. Call prepare() first.
+        """
+        config = self.slurm_configuration.get_config()
+        job_id = self.job_id_variable
+        step_file = f"{self.out_path}/{self.jobname_skeleton}.step.{job_id}"
+        # environment of the run: its modules and the issm-load.sh of its build, set -u does not hold for them
+        body = ["set +u"] + self.slurm_configuration.get_module_commands()
+        body += [command.rstrip("\n") for command in self.execution_command if command.strip()]
+        body += ["set -u", f"cd {self.home_dir}/{model_setup_path[self.resolution]}",
+                 f"echo \"index {self.step_index}\" > {step_file}",
+                 f"echo \"start $(date +%s.%N)\" >> {step_file}",
+                 "{"]
+        body += [command.rstrip("\n") for command in self.slurm_configuration.get_commands()]
+        body += [f"}} >> {config['std_out_path']}.{job_id} 2>> {config['std_err_path']}.{job_id}",
+                 f"echo \"exit_code $STEP_EXIT_CODE\" >> {step_file}",
+                 f"echo \"end $(date +%s.%N)\" >> {step_file}"]
+        return ["("] + [f"    {command}" for command in body] + [")"]
+
+    def remove_build(self):
+        """
+        Removes the build of the app.
+        """
+        os.remove(f"{self.home_dir}/{executable_path[self.app]}")  # the executable
+        os.remove(f"{self.home_dir}/{source_path[self.app]}/issm-load.sh")  # issm-load.sh
+        os.remove(f"{self.home_dir}/{source_path[self.app]}/issmModule.lua")  # issmMoudle.lua
+        subprocess.run(["bash", "-c", f"rm -r {self.home_dir}/{source_path[self.app]}/bin"])
 
     def cleanup(self, job_id: int, remove_build: bool = False):
+        # accounting of the job: elapsed time and peak memory, for the prediction of later runs
+        try:
+            # a job step is accounted in its allocation, the analyzer picks the step by its name
+            job_accounting = accounting.sacct(str(job_id).split(".")[0])
+            with open(f"{self.out_path}/{self.jobname_skeleton}.sacct.{job_id}", "w") as f:
+                f.write(job_accounting)
+            if self.advice:
+                # how long the job actually waited, for the next advice
+                wait = accounting.parse_sacct(job_accounting).get("wait_seconds")
+                if wait is not None:
+                    self.advisor.record_actual(job_id, wait)
+        except CommandExecutionException as e:
+            print(f"No accounting for job {job_id}: {e}")
         # back up job file to the OUT dir
         slurm_path = self.slurm_configuration.get_slurm_file_path()
         subprocess.run(["cp", f"{slurm_path}.sh", f"{self.out_path}/{self.jobname_skeleton}.job.{job_id}"])
         # Clean up job file (leave model dirs clean)
         os.remove(self.slurm_configuration.get_slurm_file_path() + ".sh")
         if remove_build:
-            os.remove(f"{self.home_dir}/{executable_path[self.app]}")  # the executable
-            os.remove(f"{self.home_dir}/{source_path[self.app]}/issm-load.sh")  # issm-load.sh
-            os.remove(f"{self.home_dir}/{source_path[self.app]}/issmModule.lua")  # issmMoudle.lua
-            subprocess.run(["bash", "-c", f"rm -r {self.home_dir}/{source_path[self.app]}/bin"])
+            self.remove_build()
         if not is_active["build"]:
             self.builder.cleanup_build()
         # move results into specific folder with job_id
@@ -268,6 +536,8 @@ class GProfRun(BaseRun):
         :param resolution: The resolution to use.
         :param gprof_out_filename: You can give a alternative file name for the gprof output.
         Otherwise, it will be based on the jobname, to adhere to the naming scheme of everything else.
+        :param parallel_sum: Every rank writes its own profile. The profile file is the sum of them, the per rank
+        profiles and the executable are kept in the OUT dir for the load imbalance analysis.
         """
         self.par_sum = parallel_sum
         builder = GProfBuilder(app, source_path[app])
@@ -300,13 +570,27 @@ class GProfRun(BaseRun):
             self.add_command(f"gprof {self.home_dir}/{executable_path[self.app]} gmon.sum > {gprof_file}", bevor=False)
         else:
             self.add_command(f"gprof {self.home_dir}/{executable_path[self.app]} > {gprof_file}", bevor=False)
+        # source locations of the functions, to correlate the profile with source lines
+        symbols_file = f"{self.out_path}/{file_name.rsplit('.', 1)[0]}.symbols"
+        self.add_command(f"nm -C -l --defined-only {self.home_dir}/{executable_path[self.app]} > {symbols_file}",
+                         bevor=False)
 
     def cleanup(self, job_id, remove_build: bool = False):
+        skeleton = self.jobname_skeleton
+        if self.par_sum:
+            # the per rank profiles can only be read with the exact executable, keep it next to them
+            shutil.copy(f"{self.home_dir}/{executable_path[self.app]}", f"{self.out_path}/{skeleton}.exe")
         super().cleanup(job_id, remove_build)
-        # remove gmon.out files
+        model_dir = f"{self.home_dir}/{model_setup_path[self.resolution]}"
         if self.par_sum:
-            os.remove(f"{self.home_dir}/{model_setup_path[self.resolution]}/gmon.out-*")
-            os.remove(f"{self.home_dir}/{model_setup_path[self.resolution]}/gmon.sum")
+            # keep the per rank gmon files (gmon.out-.<pid>) for the imbalance analysis, the pid identifies the rank
+            for file in glob.glob(f"{model_dir}/gmon.out-*"):
+                pid = file.rsplit(".", 1)[-1]
+                shutil.move(file, f"{self.out_path}/{skeleton}.gmon-{pid}")
+            try:
+                os.remove(f"{model_dir}/gmon.sum")
+            except FileNotFoundError:
+                print("GMON.SUM file cannot be deleted, it does not exist.")
         else:
             try:
                 os.remove(f"{self.home_dir}/{model_setup_path[self.resolution]}/gmon.out")
@@ -349,6 +633,38 @@ class CompilerVectorizationReportRun(BaseRun):
                                                      )
         self.builder = builder
 
+    def __optimization_records(self):
+        """
+        Finds the LLVM optimization records of the build in the source tree.
+        """
+        records = []
+        for root, dirs, files in os.walk(f"{self.home_dir}/{source_path[self.app]}"):
+            for file in files:
+                if file.endswith(".opt.yaml"):
+                    records.append(os.path.join(root, file))
+        return sorted(records)
+
+    def prepare(self):
+        if self.compiler == Compiler.LLVM:
+            # remove records of earlier builds, so they do not end up in this report
+            for record in self.__optimization_records():
+                os.remove(record)
+        super().prepare()
+
+    def cleanup(self, job_id: int, remove_build: bool = False):
+        # collect the records before the build gets removed
+        records = self.__optimization_records() if self.compiler == Compiler.LLVM else []
+        super().cleanup(job_id, remove_build)
+        if not records:
+            return
+        # one YAML stream with all records, the documents are independent of each other
+        skeleton = self.jobname_skeleton.split(".")[0]  # cut off job-id again
+        with open(f"{self.out_path}/{skeleton}.opt-yaml", "wb") as out:
+            for record in records:
+                with open(record, "rb") as f:
+                    shutil.copyfileobj(f, out)
+                os.remove(record)
+
 
 class CallgrindRun(BaseRun):
     """
@@ -402,6 +718,27 @@ class MPIRun(BaseRun):
         self.add_tool("MPI-COMPARE")
 
 
+class ScalingRun(BaseRun):
+    """
+    A point of an inter-node scaling study: the app on nodes * ranks_per_node ranks, with the PETSc log view for
+    the communication share.
+    """
+    def __init__(self, app: App, resolution: Resolution, nodes: int = 1, ranks_per_node: int = 96,
+                 study: str = "strong", *args, **kwargs):
+        """
+        Constructor.
+        :param nodes: Nodes of the run.
+        :param ranks_per_node: MPI ranks per node.
+        :param study: "strong" (same resolution on every node count) or "weak" (the resolution grows with the nodes).
+        """
+        if study not in ["strong", "weak"]:
+            raise ValueError(f"Unknown scaling study: {study}")
+        kwargs.setdefault("petsc_log_view", True)
+        super().__init__(app, resolution, num_mpi_ranks=nodes * ranks_per_node, nodes=nodes,
+                         ranks_per_node=ranks_per_node, vanilla=False, *args, **kwargs)
+        self.add_tool(f"SCALING-{study.upper()}")
+
+
 class ScorePRun(BaseRun):
 
     # With PAPI: export SCOREP_METRIC_PAPI=PAPI_TOT_INS,PAPI_FP_INS
@@ -427,11 +764,23 @@ class ScorePRun(BaseRun):
     # Use papi_avail, to check for metrics. Remember to module load papi
     # may use tool "likwid" to check the hardware specs
 
-    def __init__(self, app: App, resolution: Resolution, compiler_instrumentation=True, user_instrumentation=False, *args, **kwargs):
+    def __init__(self, app: App, resolution: Resolution, compiler_instrumentation=True, user_instrumentation=False,
+                 papi_metrics: list = None, *args, **kwargs):
+        """
+        Constructor.
+        :param papi_metrics: PAPI counters to record, e.g. ["PAPI_DP_OPS", "PAPI_L3_TCM"] for the roofline.
+        """
         super().__init__(app, resolution, *args, **kwargs, vanilla=False)
+        papi_metrics = papi_metrics if papi_metrics else []
         self.builder = ScorePBuilder(app, source_path[app], compiler_instrumentation=compiler_instrumentation,
-                                     user_instrumentation=user_instrumentation)
+                                     user_instrumentation=user_instrumentation, papi_metrics=papi_metrics)
         self.add_tool("SCORE-P")
+        if papi_metrics:
+            # the metrics are read at runtime, so they have to be set in the job, not only for the build
+            self.add_command(f"export SCOREP_METRIC_PAPI={','.join(papi_metrics)}")
+            self.setup_slurm_config()
+            self.slurm_configuration.set_system_info(uses_module_system=True, purge_modules_at_start=False)
+            self.slurm_configuration.add_module(name="papi")
 
     def cleanup(self, job_id: int, remove_build: bool = False):
         # move score-p folder to OUT
@@ -483,3 +832,184 @@ class CachegrindRun(BaseRun):
         skeleton = self.jobname_skeleton.split(".")[0]  # cut off job-id again
         subprocess.run(["mv", f"{self.home_dir}/{model_setup_path[self.resolution]}/{cachegrind_file}",
                         f"{self.out_path}/{skeleton}.cachegrind-out"])
+
+
+class MassifRun(BaseRun):
+    """
+    Valgrind massif run. Profiles the heap of a subset of the MPI ranks.
+    """
+
+    def __init__(self, app: App, resolution: Resolution, massif_ranks: int = 1, detailed_freq: int = 10,
+                 max_snapshots: int = 100, threshold: float = 1.0, *args, **kwargs):
+        """
+        Constructor.
+        :param app: The app to run.
+        :param resolution: The resolution of the model to run.
+        :param massif_ranks: Number of ranks to run under massif. The other ranks run without valgrind,
+        so the job does not slow down as much as a full valgrind run.
+        :param detailed_freq: Every n-th snapshot is a detailed one (with allocation tree), massifs --detailed-freq.
+        :param max_snapshots: Maximum number of snapshots massif keeps, massifs --max-snapshots.
+        :param threshold: Allocation sites below this percentage of the heap are summarized, massifs --threshold.
+        """
+        super().__init__(app, resolution, builder=None, vanilla=False, *args, **kwargs)
+        # callgrind like builder, because it uses -g flag
+        self.builder = CallgrindBuilder(app, source_path[app])
+        self.add_tool("VALGRIND-MASSIF")
+        self.massif_ranks = min(massif_ranks, self.num_mpi_ranks)
+        massif = f"valgrind --tool=massif --detailed-freq={detailed_freq} --max-snapshots={max_snapshots} " \
+                 f"--threshold={threshold} --massif-out-file=massif.out.%p"
+        executable = f"{self.home_dir}/{executable_path[self.app]} {self.default_run_command}"
+        # MPMD syntax: the first ranks run under massif, the rest runs plain
+        self.run_command = f"{self.runner} -n {self.massif_ranks} {massif} {executable}"
+        if self.num_mpi_ranks > self.massif_ranks:
+            self.run_command += f" : -n {self.num_mpi_ranks - self.massif_ranks} {executable}"
+        self.add_command("ms_print massif.out.*", bevor=False)
+        # add valgrind module
+        self.setup_slurm_config()  # setup slurm config upfront of prepare()
+        self.slurm_configuration.set_system_info(uses_module_system=True, purge_modules_at_start=False)
+        self.slurm_configuration.add_module(name="valgrind", version="3.16.1")
+
+    def cleanup(self, job_id: int, remove_build: bool = False):
+        super().cleanup(job_id, remove_build)
+        # backup every massif file to out dir, the pid stays as identifier of the rank
+        skeleton = self.jobname_skeleton.split(".")[0]  # cut off job-id again
+        for file in os.listdir(f"{self.home_dir}/{model_setup_path[self.resolution]}"):
+            if file.startswith("massif.out."):
+                pid = file.split(".")[-1]
+                subprocess.run(["mv", f"{self.home_dir}/{model_setup_path[self.resolution]}/{file}",
+                                f"{self.out_path}/{skeleton}.massif-out-{pid}"])
+
+
+class PGORun(BaseRun):
+    """
+    Profile guided optimization run. do_run() does all three PGO phases:
+    1. Builds an instrumented binary and runs it on the training resolution. Every rank writes its own profile data.
+    2. Merges the profile data of all ranks, at the end of the training job.
+    3. Rebuilds with the merged profile and runs on the target resolution.
+    With plain_baseline, the plain build runs on the target resolution too, so the analyzer can compare both.
+    """
+
+    def __init__(self, app: App, resolution: Resolution, training_resolution: Resolution = Resolution.G4000,
+                 profile_dir: str = None, plain_baseline: bool = True, *args, **kwargs):
+        """
+        Constructor.
+        :param app: The app to run.
+        :param resolution: The target resolution, the PGO build is measured on.
+        :param training_resolution: The resolution of the training run. Default: G4000.
+        :param profile_dir: Directory for the profile data. Default: ~/pgo-profiles/APP-COMPILER.
+        :param plain_baseline: Also run the plain build on the target resolution. Default: True.
+        """
+        super().__init__(app, resolution, builder=None, vanilla=False, *args, **kwargs)
+        self.add_tool("PGO")
+        self.training_resolution = training_resolution
+        self.plain_baseline = plain_baseline
+        self.profile_dir = profile_dir if profile_dir else f"{self.home_dir}/pgo-profiles/{self.app}-{self.compiler}"
+        self.builder = PGOBuilder(app, source_path[app], PGOBuilder.USE, self.profile_dir, compiler=self.compiler)
+        # the training and plain runs get the same settings
+        self.__args = args
+        self.__kwargs = kwargs
+
+    def training_run(self) -> BaseRun:
+        """
+        The instrumented training run. It merges the profile data of all ranks after the app finished.
+        """
+        builder = PGOBuilder(self.app, source_path[self.app], PGOBuilder.GENERATE, self.profile_dir,
+                             compiler=self.compiler)
+        training = BaseRun(self.app, self.training_resolution, builder=builder, vanilla=False,
+                           *self.__args, **self.__kwargs)
+        training.add_tool("PGO-TRAIN")
+        training.add_command(f"rm -rf {self.profile_dir}")
+        training.add_command(f"mkdir -p {self.profile_dir}")
+        if self.compiler == Compiler.LLVM:
+            # %p: every rank writes its own raw profile
+            training.add_command(f"export LLVM_PROFILE_FILE={self.profile_dir}/rank-%p.profraw")
+            training.add_run_command_flag(flag="x", value="LLVM_PROFILE_FILE")
+            training.add_command(f"llvm-profdata merge -o {self.profile_dir}/merged.profdata "
+                                 f"{self.profile_dir}/rank-*.profraw", bevor=False)
+        else:
+            # With 96 ranks writing the same gcda files on the shared file system, the counters get lost or
+            # corrupted. Every rank writes into its own directory instead, by setting GCOV_PREFIX per rank.
+            gcda_dir = builder.merged_profile(self.compiler)
+            strip = len(gcda_dir.strip("/").split("/"))
+            executable = f"{self.home_dir}/{executable_path[self.app]}"
+            training.run_command = training.run_command.replace(
+                executable,
+                f"bash -c 'GCOV_PREFIX={self.profile_dir}/rank-${{OMPI_COMM_WORLD_RANK:-$PMI_RANK}} "
+                f"GCOV_PREFIX_STRIP={strip} exec {executable} \"$@\"' {os.path.basename(executable)}")
+            # merge the ranks pairwise into the gcda dir
+            training.add_command(f"cp -r {self.profile_dir}/rank-0 {gcda_dir}", bevor=False)
+            training.add_command(f"for dir in {self.profile_dir}/rank-*; do "
+                                 f"[ \"$dir\" = \"{self.profile_dir}/rank-0\" ] && continue; "
+                                 f"gcov-tool merge {gcda_dir} $dir -o {gcda_dir}-tmp && "
+                                 f"rm -rf {gcda_dir} && mv {gcda_dir}-tmp {gcda_dir}; done", bevor=False)
+        training.add_command(f"rm -rf {self.profile_dir}/rank-*", bevor=False)
+        return training
+
+    def do_run(self):
+        """
+        Runs all PGO phases. Returns the results of the PGO run, and of the plain run if plain_baseline is set.
+        """
+        print(f"PGO phase 1 and 2: training on {self.training_resolution}, merging the profiles.")
+        self.training_run().do_run()
+        print(f"PGO phase 3: build with the profile, run on {self.resolution}.")
+        pgo_results = super().do_run()
+        if not self.plain_baseline:
+            return pgo_results
+        print(f"PGO baseline: plain build, run on {self.resolution}.")
+        plain = BaseRun(self.app, self.resolution, builder=BaseBuilder(self.app, source_path[self.app],
+                                                                        compiler=self.compiler),
+                        *self.__args, **self.__kwargs)
+        return [pgo_results, plain.do_run()]
+
+
+class CalibrationRun(BaseRun):
+    """
+    Measures the node, instead of running the app: memory bandwidth (STREAM copy and triad), flop peak (FMA kernel),
+    and MPI latency and bandwidth (ping-pong between the first and the last rank, allreduce over all ranks).
+    The kernels in Runs/calibration are compiled in the job, for the cpu of the node. The values go into the
+    .calibration file, the analyzer caches them per node type and uses them instead of lichtenberg_defaults.
+    App and resolution only name the job, the app is neither built nor run.
+    """
+
+    def __init__(self, app: App = App.ISSM_MINIAPP_THERMAL, resolution: Resolution = Resolution.G4000,
+                 stream_elements: int = 1 << 27, peak_iterations: int = 200000000, mpi_message_bytes: int = 1 << 22,
+                 *args, **kwargs):
+        """
+        Constructor.
+        :param stream_elements: Elements per STREAM array. Default: 2^27 doubles, 1 GiB per array, far beyond the caches.
+        :param peak_iterations: Iterations of the FMA kernel per thread.
+        :param mpi_message_bytes: Message size for the ping-pong bandwidth.
+        """
+        kwargs["own_build"] = False
+        kwargs["cleanup_build"] = False
+        compiler = kwargs.get("compiler", Compiler.GCC)
+        super().__init__(app, resolution, builder=CalibrationBuilder(app, compiler=compiler), vanilla=False,
+                         *args, **kwargs)
+        self.add_tool("CALIBRATION")
+        calibration_file = f"{self.out_path}/{self.jobname_skeleton}.calibration"
+        cc = "OMPI_CC=clang mpicc" if compiler == Compiler.LLVM else "mpicc"
+        self.add_command("CALIBRATION_DIR=$(mktemp -d)")
+        for kernel in ["stream", "peak", "mpi_bench"]:
+            self.add_command(f"{cc} {CalibrationBuilder.calibration_flags} {calibration_path}/{kernel}.c "
+                             f"-o $CALIBRATION_DIR/{kernel}")
+        # the node type, the cache is keyed by it
+        self.add_command(f"echo \"node_type $(lscpu | sed -n 's/^Model name:[[:space:]]*//p')\" > {calibration_file}")
+        self.add_command(f"echo \"node $(hostname)\" >> {calibration_file}")
+        self.add_command(f"echo \"cpu_count $(lscpu -p=SOCKET | grep -v '^#' | sort -u | wc -l)\" >> {calibration_file}")
+        self.add_command(f"echo \"cpu_cores_total $(lscpu -p=CORE | grep -v '^#' | sort -u | wc -l)\" "
+                         f">> {calibration_file}")
+        # bandwidth: threads spread over both sockets, flops: one thread per core
+        self.add_command(f"OMP_PROC_BIND=spread OMP_PLACES=cores $CALIBRATION_DIR/stream {stream_elements} "
+                         f">> {calibration_file}")
+        self.add_command(f"OMP_PROC_BIND=close OMP_PLACES=cores $CALIBRATION_DIR/peak {peak_iterations} "
+                         f">> {calibration_file}")
+        self.run_command = f"{self.runner} -n {self.num_mpi_ranks} $CALIBRATION_DIR/mpi_bench {mpi_message_bytes} " \
+                           f">> {calibration_file}"
+        self.add_command("rm -rf $CALIBRATION_DIR", bevor=False)
+        # compiler and MPI for the kernels
+        self.setup_slurm_config()
+        self.slurm_configuration.set_system_info(uses_module_system=True, purge_modules_at_start=False)
+        self.slurm_configuration.add_module(name="gcc", version=build_defaults["gcc_version"])
+        if compiler == Compiler.LLVM:
+            self.slurm_configuration.add_module(name="llvm", version=build_defaults["llvm_version"])
+        self.slurm_configuration.add_module(name="openmpi")
@@ -0,0 +1,151 @@
+"""
+Node-level sampler. Runs in the background of a SLURM job, next to the application, and writes one CSV line per sample.
+Started by the BaseRun, if a sample interval is given. Only uses the python standard library, because it runs
+on the compute node with whatever python3 is there.
+
+Usage: python3 sampler.py --interval 1 --out FILE --stdout JOB_STDOUT_FILE --match EXECUTABLE_NAME
+"""
+import argparse
+import glob
+import os
+import time
+
+header = ["time", "stdout_lines", "cpu_busy", "idle_cores", "mem_total_kB", "mem_available_kB",
+          "rss_kB", "freq_MHz", "core_busy"]
+idle_core_threshold = 0.1  # cores below 10% busy count as idle
+
+
+def read_cpu_times():
+    """
+    Reads /proc/stat. Returns a dict of cpu name: (busy jiffies, total jiffies).
+    """
+    times = {}
+    with open("/proc/stat", "r") as f:
+        for line in f:
+            if not line.startswith("cpu"):
+                break
+            elms = line.split()
+            values = [int(v) for v in elms[1:]]
+            # idle and iowait are not busy
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            times[elms[0]] = (sum(values) - idle, sum(values))
+    return times
+
+
+def read_meminfo():
+    """
+    Reads MemTotal and MemAvailable from /proc/meminfo in kB.
+    """
+    total, available = None, None
+    with open("/proc/meminfo", "r") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                total = int(line.split()[1])
+            elif line.startswith("MemAvailable:"):
+                available = int(line.split()[1])
+    return total, available
+
+
+def read_rank_rss(match: str):
+    """
+    Finds the processes of the application by its command line and returns a dict of pid: VmRSS in kB.
+    """
+    rss = {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmd = f.read().split(b"\0")[0].decode("utf-8", "ignore")
+            if not cmd.endswith(match):
+                continue
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss[int(pid)] = int(line.split()[1])
+                        break
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            # process ended while reading
+            continue
+    return rss
+
+
+def read_frequencies(cpu_freq_files):
+    """
+    Reads the current frequency of every core in MHz.
+    """
+    freqs = []
+    for path in cpu_freq_files:
+        try:
+            with open(path, "r") as f:
+                freqs.append(int(f.read()) // 1000)
+        except (FileNotFoundError, ValueError):
+            freqs.append(0)
+    return freqs
+
+
+class _LineCounter:
+    """
+    Counts the lines of a growing file, by only reading the appended bytes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.lines = 0
+
+    def count(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                new = f.read()
+        except FileNotFoundError:
+            return self.lines
+        self.offset += len(new)
+        self.lines += new.count(b"\n")
+        return self.lines
+
+
+def sample(interval: float, out: str, stdout: str, match: str):
+    """
+    Samples until killed.
+    """
+    cpu_freq_files = sorted(glob.glob("/sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_cur_freq"),
+                            key=lambda p: int(p.split("/")[5][3:]))
+    counter = _LineCounter(stdout)
+    last = read_cpu_times()
+    with open(out, "w", buffering=1) as f:
+        f.write(",".join(header) + "\n")
+        while True:
+            time.sleep(interval)
+            now = read_cpu_times()
+            busy = {}
+            for cpu, (b, t) in now.items():
+                delta_total = t - last[cpu][1] if cpu in last else 0
+                busy[cpu] = (b - last[cpu][0]) / delta_total if delta_total > 0 else 0.0
+            last = now
+            cores = [busy[cpu] for cpu in sorted(busy) if cpu != "cpu"]
+            total, available = read_meminfo()
+            rss = read_rank_rss(match)
+            row = [
+                f"{time.time():.3f}",
+                str(counter.count()),
+                f"{busy.get('cpu', 0.0):.3f}",
+                str(len([c for c in cores if c < idle_core_threshold])),
+                str(total),
+                str(available),
+                ";".join(f"{pid}:{kb}" for pid, kb in sorted(rss.items())),
+                ";".join(str(mhz) for mhz in read_frequencies(cpu_freq_files)),
+                ";".join(f"{c:.2f}" for c in cores),
+            ]
+            f.write(",".join(row) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Node-level time-series sampler.")
+    parser.add_argument("--interval", type=float, default=1.0, help="Sample interval in seconds.")
+    parser.add_argument("--out", required=True, help="CSV file to write the samples to.")
+    parser.add_argument("--stdout", required=True, help="The stdout file of the job, to align samples with.")
+    parser.add_argument("--match", required=True, help="Executable name of the ranks, to find their processes.")
+    args = parser.parse_args()
+    sample(args.interval, args.out, args.stdout, args.match)
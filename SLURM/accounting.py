@@ -0,0 +1,145 @@
+"""
+SLURM accounting of finished jobs: state, elapsed time and peak memory (MaxRSS) per job step, from "sacct".
+"""
+import re
+import subprocess
+from datetime import datetime
+from typing import Optional
+
+from SLURM.exceptions import CommandExecutionException
+
+sacct_fields = ["JobID", "JobName", "State", "Elapsed", "Timelimit", "MaxRSS", "ReqMem", "AllocCPUS", "NNodes",
+                "Submit", "Start", "Partition"]
+_memory = re.compile(r"^([\d.]+)([KMGT]?)[nc]?$")
+_memory_factor = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+
+
+def time_seconds(time_str: str) -> Optional[int]:
+    """
+    Seconds of a SLURM time: "mm", "mm:ss", "hh:mm:ss", "d-hh", "d-hh:mm" or "d-hh:mm:ss". None for empty,
+    "UNLIMITED" or unknown.
+    """
+    if not time_str:
+        return None
+    days = 0
+    if "-" in time_str:
+        days, time_str = time_str.split("-", 1)
+        try:
+            days = int(days)
+        except ValueError:
+            return None
+        parts = time_str.split(":")
+        # with days, the first part is hours
+        parts += ["0"] * (3 - len(parts))
+    else:
+        parts = time_str.split(":")
+        if len(parts) == 1:
+            # minutes only
+            parts = ["0", parts[0], "0"]
+        elif len(parts) == 2:
+            parts = ["0"] + parts
+    try:
+        hours, minutes, seconds = int(parts[0]), int(parts[1]), float(parts[2])
+    except (ValueError, IndexError):
+        return None
+    return int(((days * 24 + hours) * 60 + minutes) * 60 + seconds)
+
+
+def time_str(seconds: float) -> str:
+    """
+    SLURM time string "hh:mm:ss" (or "d-hh:mm:ss") of seconds.
+    """
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    text = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{days}-{text}" if days else text
+
+
+def memory_mb(memory: str) -> Optional[float]:
+    """
+    MB of a SLURM memory value, e.g. "123456K", "3800M", "3800Mc" (per cpu) or "4G". Without unit, it is KB.
+    """
+    match = _memory.match((memory or "").strip())
+    if not match:
+        return None
+    return float(match.group(1)) * _memory_factor[match.group(2) or "K"]
+
+
+def timestamp(text: str) -> Optional[float]:
+    """
+    Epoch seconds of a SLURM timestamp ("2021-07-01T12:00:00"), None for "Unknown" or "None".
+    """
+    try:
+        return datetime.fromisoformat(text.strip()).timestamp()
+    except ValueError:
+        return None
+
+
+def sacct(job_id) -> str:
+    """
+    The sacct lines of the job and its steps.
+    """
+    command = ["sacct", "-j", str(job_id), "--noheader", "--parsable2", f"--format={','.join(sacct_fields)}"]
+    try:
+        res = subprocess.run(command, stdout=subprocess.PIPE)
+    except FileNotFoundError:
+        raise CommandExecutionException(" ".join(command), non_zero=False, invalid=True)
+    if res.returncode != 0:
+        raise CommandExecutionException(" ".join(command))
+    return res.stdout.decode("utf-8")
+
+
+def parse_sacct(text: str, step_name: str = None, cpus_per_task: int = None) -> dict:
+    """
+    Reads sacct --parsable2 output with the sacct_fields. The job is the line without step suffix, the peak memory
+    is the largest MaxRSS of all steps (the batch step holds the mpirun ranks).
+    :param step_name: For a run in a batch allocation: the job name of its srun step. The state, elapsed time and
+    peak memory are then the ones of this step, the rest is the allocation's.
+    :param cpus_per_task: For a step: the cpus of one rank. The MaxRSS of a step is the one of its largest task, not
+    of all its cpus, so the memory per cpu is MaxRSS / cpus_per_task. Default: None, one cpu per rank.
+    """
+    job, steps = {}, []
+    for line in text.splitlines():
+        values = line.split("|")
+        if len(values) != len(sacct_fields):
+            continue
+        entry = dict(zip(sacct_fields, values))
+        step = {
+            "step": entry["JobID"],
+            "name": entry["JobName"],
+            "state": entry["State"].split(" ")[0],
+            "elapsed_seconds": time_seconds(entry["Elapsed"]),
+            "max_rss_mb": memory_mb(entry["MaxRSS"]),
+            "alloc_cpus": int(entry["AllocCPUS"]) if entry["AllocCPUS"].isdigit() else None,
+        }
+        if "." not in entry["JobID"]:
+            job = {
+                "job_id": entry["JobID"],
+                "state": step["state"],
+                "elapsed_seconds": step["elapsed_seconds"],
+                "time_limit_seconds": time_seconds(entry["Timelimit"]),
+                "requested_memory": entry["ReqMem"],
+                "alloc_cpus": step["alloc_cpus"],
+                "nodes": int(entry["NNodes"]) if entry["NNodes"].isdigit() else None,
+                "partition": entry["Partition"],
+            }
+            submit, start = timestamp(entry["Submit"]), timestamp(entry["Start"])
+            # time in the queue
+            job["wait_seconds"] = start - submit if submit is not None and start is not None else None
+        else:
+            steps.append(step)
+    if step_name is not None:
+        steps = [step for step in steps if step["name"] == step_name]
+        if job and steps:
+            job.update({"allocation_id": job["job_id"], "job_id": steps[0]["step"], "state": steps[0]["state"],
+                        "elapsed_seconds": steps[0]["elapsed_seconds"],
+                        "alloc_cpus": steps[0]["alloc_cpus"] or job["alloc_cpus"]})
+    rss = [step["max_rss_mb"] for step in steps if step["max_rss_mb"] is not None]
+    job["max_rss_mb"] = max(rss) if rss else None
+    if step_name is not None:
+        job["max_rss_mb_per_cpu"] = job["max_rss_mb"] / (cpus_per_task or 1) if job["max_rss_mb"] is not None else None
+    else:
+        job["max_rss_mb_per_cpu"] = job["max_rss_mb"] / job["alloc_cpus"] \
+            if job["max_rss_mb"] is not None and job.get("alloc_cpus") else None
+    job["steps"] = steps
+    return job
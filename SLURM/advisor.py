@@ -0,0 +1,291 @@
+"""
+Scheduler advisor: picks the partition/reservation, where a job is expected to start first. It reads the state of the
+partitions (sinfo), the expected starts of the pending jobs (squeue --start) and their priorities (sprio), and, if
+there are not enough idle cpus, the ends of the running jobs (squeue -t R). From these, it estimates the wait of the
+job for its cores and walltime, backfilling included. Estimated and actual waits are recorded, the estimates of a
+partition are corrected by how far off they were before.
+The commands are run by an injectable runner, e.g. stub_runner with recorded outputs for tests.
+"""
+import json
+import os
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+
+from SLURM.accounting import time_seconds, timestamp
+
+advice_file = os.path.expanduser("~/issm-output/scheduler-advice.json")
+# seconds added to estimated and actual waits for the correction, so estimates of 0 (start now) are corrected too
+wait_smoothing = 60
+
+sinfo_command = ["sinfo", "--noheader", "--format=%P|%a|%l|%D|%C"]
+squeue_command = ["squeue", "--noheader", "--start", "--format=%i|%P|%S|%C|%l|%r"]
+squeue_running_command = ["squeue", "--noheader", "-t", "R", "--format=%i|%P|%e|%C"]
+sprio_command = ["sprio", "--noheader", "--format=%i|%r|%Y"]
+
+
+def run_command(command: List[str]) -> str:
+    """
+    Output of the command, empty if it is not there or fails.
+    """
+    try:
+        res = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        print(f"{command[0]} not found.")
+        return ""
+    if res.returncode != 0:
+        print(f"{' '.join(command)} returned non-zero exit code.")
+        return ""
+    return res.stdout.decode("utf-8")
+
+
+def stub_runner(outputs: Dict[str, str]) -> Callable[[List[str]], str]:
+    """
+    Runner, that answers with recorded outputs by command name, e.g. {"sinfo": "...", "squeue": "...", "sprio": ""}.
+    The running jobs (squeue -t R) are answered by "squeue-running".
+    """
+    return lambda command: outputs.get("squeue-running" if command == squeue_running_command else command[0], "")
+
+
+def parse_sinfo(text: str) -> Dict[str, dict]:
+    """
+    Per partition: up, time limit (seconds, None for unlimited), nodes and allocated/idle/other/total cpus.
+    """
+    partitions = {}
+    for line in text.splitlines():
+        values = line.strip().split("|")
+        if len(values) != 5:
+            continue
+        name, available, limit, nodes, cpus = values
+        try:
+            allocated, idle, other, total = (int(c) for c in cpus.split("/"))
+        except ValueError:
+            continue
+        name = name.rstrip("*")
+        # a partition can be listed once per node state
+        partition = partitions.setdefault(name, {"up": available == "up", "time_limit": time_seconds(limit),
+                                                 "nodes": 0, "allocated_cpus": 0, "idle_cpus": 0,
+                                                 "other_cpus": 0, "total_cpus": 0})
+        partition["nodes"] += int(nodes) if nodes.isdigit() else 0
+        partition["allocated_cpus"] += allocated
+        partition["idle_cpus"] += idle
+        partition["other_cpus"] += other
+        partition["total_cpus"] += total
+    return partitions
+
+
+def parse_squeue_start(text: str) -> List[dict]:
+    """
+    The pending jobs: id, partition, expected start (epoch seconds or None), cpus, time limit and reason.
+    """
+    jobs = []
+    for line in text.splitlines():
+        values = line.strip().split("|")
+        if len(values) != 6:
+            continue
+        job_id, partition, start, cpus, limit, reason = values
+        jobs.append({
+            "job_id": job_id,
+            "partition": partition,
+            "start": timestamp(start),
+            "cpus": int(cpus) if cpus.isdigit() else 1,
+            "time_limit": time_seconds(limit),
+            "reason": reason,
+        })
+    return jobs
+
+
+def parse_squeue_running(text: str) -> List[dict]:
+    """
+    The running jobs: id, partition, expected end (epoch seconds or None) and cpus.
+    """
+    jobs = []
+    for line in text.splitlines():
+        values = line.strip().split("|")
+        if len(values) != 4:
+            continue
+        job_id, partition, end, cpus = values
+        jobs.append({
+            "job_id": job_id,
+            "partition": partition,
+            "end": timestamp(end),
+            "cpus": int(cpus) if cpus.isdigit() else 1,
+        })
+    return jobs
+
+
+def parse_sprio(text: str) -> Dict[str, float]:
+    """
+    Priority by job id.
+    """
+    priorities = {}
+    for line in text.splitlines():
+        values = line.strip().split("|")
+        if len(values) != 3:
+            continue
+        try:
+            priorities[values[0]] = float(values[2])
+        except ValueError:
+            continue
+    return priorities
+
+
+class SchedulerAdvisor:
+    """
+    Chooses between candidate targets, each a dict with "partition" and optional "reservation" and "account".
+    Reservations are estimated with the state of their partition.
+    """
+
+    def __init__(self, targets: List[dict], runner: Callable[[List[str]], str] = run_command,
+                 path: str = advice_file, clock=time.time):
+        """
+        Constructor.
+        :param targets: The candidates, e.g. [{"partition": "kurs00054", "reservation": "kurs00054",
+        "account": "kurs00054"}, {"partition": "test24", "account": "kurs00054"}].
+        :param runner: Runs a command, returns its output. Default: run_command.
+        :param path: The json file, estimated and actual waits are recorded in.
+        :param clock: Time source, epoch seconds.
+        """
+        self.targets = targets
+        self.runner = runner
+        self.path = path
+        self.clock = clock
+
+    def load(self) -> List[dict]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def save(self, records: List[dict]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # write and rename, a reader never sees a half written file
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(records, f, indent=4)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def correction(self, partition: str, records: List[dict]) -> float:
+        """
+        Median of actual / estimated wait of the earlier jobs of the partition, 1.0 without earlier jobs.
+        """
+        ratios = sorted((r["actual_wait"] + wait_smoothing) / (r["estimated_wait"] + wait_smoothing) for r in records
+                        if r["partition"] == partition and r.get("actual_wait") is not None
+                        and r.get("estimated_wait") is not None)
+        if not ratios:
+            return 1.0
+        mid = len(ratios) // 2
+        return ratios[mid] if len(ratios) % 2 else (ratios[mid - 1] + ratios[mid]) / 2
+
+    def free_at(self, partition: dict, running: List[dict], cores: int) -> float:
+        """
+        Seconds until enough cpus of the partition are free for the job, as its running jobs end.
+        """
+        free = partition["idle_cpus"]
+        if free >= cores:
+            return 0.0
+        now = self.clock()
+        ends = sorted((job["end"], job["cpus"]) for job in running if job["end"] is not None)
+        for end, cpus in ends:
+            free += cpus
+            if free >= cores:
+                return max(0.0, end - now)
+        # jobs without known end hold the rest, at least until the last known end
+        return max([0.0] + [end - now for end, _ in ends])
+
+    def estimate(self, partition: dict, pending: List[dict], priorities: Dict[str, float], cores: int,
+                 seconds: int, priority: float = None, running: List[dict] = None) -> Optional[float]:
+        """
+        Expected wait in seconds on the partition, None if the job is not eligible there.
+        :param partition: As from parse_sinfo.
+        :param pending: The pending jobs of the partition, as from parse_squeue_start.
+        :param priority: Priority of the job. Default: the median priority of the pending jobs, a new job has
+        no age yet.
+        :param running: The running jobs of the partition, as from parse_squeue_running. Needed, if there are not
+        enough idle cpus. Default: None, no running jobs.
+        """
+        if not partition["up"] or partition["total_cpus"] < cores:
+            return None
+        if partition["time_limit"] is not None and partition["time_limit"] < seconds:
+            return None
+        now = self.clock()
+        known = sorted(priorities[job["job_id"]] for job in pending if job["job_id"] in priorities)
+        if priority is None and known:
+            priority = known[len(known) // 2]
+        # the jobs, the scheduler starts bevor this one
+        ahead = [job for job in pending
+                 if priority is None or priorities.get(job["job_id"], priority) >= priority]
+        starts = [job["start"] - now for job in ahead if job["start"] is not None]
+        if partition["idle_cpus"] >= cores:
+            # backfill: starts now, if it ends bevor the next job ahead needs the cpus
+            if not starts or seconds <= min(starts):
+                return 0.0
+        # after the jobs ahead, or their work spread over the partition, if their starts are not known, and not
+        # bevor the running jobs freed enough cpus
+        spread = sum(job["cpus"] * (job["time_limit"] or seconds) for job in ahead) / partition["total_cpus"]
+        return max([0.0, spread, self.free_at(partition, running if running else [], cores)] + starts)
+
+    def advise(self, cores: int, time_str: str, priority: float = None) -> Optional[dict]:
+        """
+        The target with the earliest expected start, None if no target is eligible.
+        :param cores: Cpus of the job.
+        :param time_str: Time limit of the job.
+        :return: The target, with "estimated_wait" (seconds), "adjusted_wait" (corrected by the earlier records)
+        and the estimates of all targets.
+        """
+        seconds = time_seconds(time_str)
+        partitions = parse_sinfo(self.runner(sinfo_command))
+        pending = parse_squeue_start(self.runner(squeue_command))
+        priorities = parse_sprio(self.runner(sprio_command))
+        # only queried, if a target has not enough idle cpus
+        running = None
+        records = self.load()
+        estimates = []
+        for target in self.targets:
+            name = target["partition"]
+            if name not in partitions:
+                print(f"Partition {name} not in sinfo, skipped.")
+                continue
+            if partitions[name]["idle_cpus"] < cores and running is None:
+                running = parse_squeue_running(self.runner(squeue_running_command))
+            wait = self.estimate(partitions[name], [job for job in pending if job["partition"] == name],
+                                 priorities, cores, seconds, priority,
+                                 [job for job in running if job["partition"] == name] if running else None)
+            if wait is None:
+                print(f"Partition {name} is not eligible for {cores} cores and {time_str}.")
+                continue
+            adjusted = max(0.0, (wait + wait_smoothing) * self.correction(name, records) - wait_smoothing)
+            estimates.append(dict(target, estimated_wait=wait, adjusted_wait=adjusted))
+        if not estimates:
+            return None
+        best = min(estimates, key=lambda e: e["adjusted_wait"])
+        return dict(best, cores=cores, time_str=time_str, candidates=estimates)
+
+    def record_submission(self, job_id, advice: dict) -> None:
+        """
+        Records the chosen target and its estimated wait.
+        """
+        records = self.load()
+        records.append({
+            "job_id": str(job_id),
+            "partition": advice["partition"],
+            "reservation": advice.get("reservation"),
+            "account": advice.get("account"),
+            "cores": advice["cores"],
+            "time_str": advice["time_str"],
+            "estimated_wait": advice["estimated_wait"],
+            "adjusted_wait": advice["adjusted_wait"],
+            "submitted_at": self.clock(),
+            "actual_wait": None,
+        })
+        self.save(records)
+
+    def record_actual(self, job_id, actual_wait: float) -> None:
+        """
+        Records the actual wait of a job, e.g. from sacct Submit and Start.
+        """
+        records = self.load()
+        for record in records:
+            if record["job_id"] == str(job_id):
+                record["actual_wait"] = actual_wait
+        self.save(records)
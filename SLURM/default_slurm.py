@@ -1,5 +1,9 @@
 from SLURM.slurm import SlurmConfiguration, MailType
 
+# used, if there are no earlier runs to predict the time and memory of a job from
+default_time_str = "00:30:00"
+default_mem_per_cpu = 3800
+
 
 class DefaultPEngSlurmConfig(SlurmConfiguration):
     """Holds the default SLURM job for the PEng seminar. All the paths will be derived from the job name."""
@@ -8,7 +12,14 @@ class DefaultPEngSlurmConfig(SlurmConfiguration):
                  job_name: str,
                  output_directory: str = "/home/kurse/kurs00054/jo83xafu/issm-output/OUT",
                  job_file_directory: str = "/home/kurse/kurs00054/jo83xafu",
-                 num_mpi_ranks: int = 96):
+                 num_mpi_ranks: int = 96,
+                 time_str: str = default_time_str,
+                 mem_per_cpu: int = default_mem_per_cpu,
+                 nodes: int = None,
+                 ranks_per_node: int = None,
+                 cpus_per_rank: int = 1,
+                 distribution: str = None,
+                 hint: str = None):
         """
         Constructor.
         :param job_name: The jobs name. Use the job name wisely: Give info about the run, everything will be constructed upon this.
@@ -17,7 +28,14 @@ class DefaultPEngSlurmConfig(SlurmConfiguration):
         Defaults to /home/kurse/kurs00054/jo83xafu/output-dir/OUT. The job name will be added as an sub-directory.
         :param job_file_directory: The directory the job file goes in. Give without trailing slash.
         Defaults to: /home/kurse/kurs00054/jo83xafu/jobfiles. NOT USED ANYMORE!
-        :param num_mpi_ranks: The number of mpi ranks
+        :param num_mpi_ranks: The number of mpi ranks, one task each.
+        :param time_str: Time limit of the job. Default: default_time_str.
+        :param mem_per_cpu: Memory per cpu in MB. Default: default_mem_per_cpu.
+        :param nodes: Number of nodes. Default: None (as many as the ranks need).
+        :param ranks_per_node: MPI ranks per node. Default: None (SLURM fills the nodes).
+        :param cpus_per_rank: Cores per MPI rank. Default: 1.
+        :param distribution: The --distribution of the ranks, e.g. "block:cyclic". Default: None.
+        :param hint: The --hint for the binding, e.g. "nomultithread". Default: None.
         """
         # Manage file names:
         slurm_script_file = f"{job_file_directory}/{job_name}"
@@ -29,11 +47,15 @@ class DefaultPEngSlurmConfig(SlurmConfiguration):
                          job_name=job_name,
                          std_out_path=std_out_path,
                          std_err_path=std_err_path,
-                         time_str="00:30:00",
-                         mem_per_cpu=3800,
-                         number_of_tasks=1,
-                         number_of_cores_per_task=num_mpi_ranks,
+                         time_str=time_str,
+                         mem_per_cpu=mem_per_cpu,
+                         number_of_tasks=num_mpi_ranks,
+                         number_of_cores_per_task=cpus_per_rank,
                          cpu_frequency_str="Medium-Medium",
+                         nodes=nodes,
+                         number_of_tasks_per_node=ranks_per_node,
+                         distribution=distribution,
+                         hint=hint,
                          partition="kurs00054",
                          reservation="kurs00054",
                          account="kurs00054",
@@ -0,0 +1,166 @@
+"""
+Live progress of running jobs. The std out of every job is tailed by byte offset, so each tick only reads what was
+appended since the last one, and parsed with the TimestepParser of the StdFileAnalyzer. All jobs are shown in one
+compact status view: state, step, step rate and ETA.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from Analyzer.timesteps import TimestepParser
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class FileTail:
+    """
+    Reads the lines, that were appended to a file since the last read. Keeps the byte offset, so the file is never
+    read twice. A line, that is still being written, is returned on the next read, when it is complete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.__rest = b""
+
+    def read_lines(self) -> List[str]:
+        """
+        The new complete lines. Empty, if the file is not there (yet) or did not grow.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size < self.offset:
+            # truncated or replaced, start over
+            self.offset = 0
+            self.__rest = b""
+        if size == self.offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        self.offset += len(data)
+        lines = (self.__rest + data).split(b"\n")
+        self.__rest = lines.pop()
+        return [line.decode("utf-8", "replace") + "\n" for line in lines]
+
+
+class JobProgress:
+    """
+    Progress of one job, from its std out.
+    """
+
+    def __init__(self, out_path: str, name: str = "", total_steps: int = None, clock=time.time):
+        """
+        Constructor.
+        :param out_path: The std out file of the job (with job id).
+        :param name: Shown in the status view, e.g. the job name.
+        :param total_steps: Expected number of timesteps, e.g. from earlier runs. Apps that print "iteration i/n"
+        lines (ISSM 4.18) override it. Without it, there is no ETA.
+        :param clock: Time source, seconds.
+        """
+        self.tail = FileTail(out_path)
+        self.name = name
+        self.expected_steps = total_steps
+        self.clock = clock
+        self.parser = TimestepParser()
+        self.state = None
+        # when the timesteps were seen starting
+        self.step_seen: List[float] = []
+
+    @property
+    def steps(self) -> int:
+        return len(self.parser.series)
+
+    @property
+    def total_steps(self) -> Optional[int]:
+        return self.parser.series.total_steps or self.expected_steps
+
+    def update(self) -> List[str]:
+        """
+        Reads and parses the new lines of the out file.
+        :return: The new lines.
+        """
+        now = self.clock()
+        lines = self.tail.read_lines()
+        for line in lines:
+            if self.parser.feed(line):
+                self.step_seen.append(now)
+        return lines
+
+    def seconds_per_step(self, min_steps: int = 1) -> Optional[float]:
+        """
+        Wall clock seconds per timestep, since the first step that was seen. Includes the running step, so a step,
+        that does not end, makes it grow.
+        :param min_steps: Steps after the first one, before there is a rate.
+        """
+        if len(self.step_seen) <= min_steps:
+            return None
+        return (self.clock() - self.step_seen[0]) / (len(self.step_seen) - 1)
+
+    def eta(self) -> Optional[float]:
+        """
+        Seconds until the last timestep is done, None if the rate or the number of steps is not known.
+        """
+        per_step, total = self.seconds_per_step(), self.total_steps
+        if per_step is None or not total:
+            return None
+        return max(total - self.steps, 0) * per_step
+
+    def status(self) -> str:
+        total = self.total_steps
+        step = f"{self.steps}/{total}" if total else f"{self.steps}"
+        percent = f"{100 * min(self.steps / total, 1.0):5.1f}%" if total else "     "
+        per_step = self.seconds_per_step()
+        rate = f"{per_step:8.2f} s/step" if per_step is not None else "       - s/step"
+        return f"{self.state or '-':<10} step {step:>9} {percent} {rate}  ETA {format_seconds(self.eta())}"
+
+    def __call__(self, job_id, state: str, waited: int) -> None:
+        """
+        Hook for SlurmConfiguration.wait: updates the progress and prints the status view. Never cancels the job.
+        """
+        self.state = state
+        self.update()
+        board.print()
+        return None
+
+
+class ProgressBoard:
+    """
+    The progress of all jobs, that are waited for. Jobs waited for in several threads share the board.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, JobProgress] = {}
+        self.__lock = threading.Lock()
+
+    def add(self, job_id, progress: JobProgress) -> None:
+        with self.__lock:
+            self.jobs[str(job_id)] = progress
+
+    def remove(self, job_id) -> None:
+        with self.__lock:
+            self.jobs.pop(str(job_id), None)
+
+    def render(self) -> str:
+        with self.__lock:
+            jobs = list(self.jobs.items())
+        width = max([len(progress.name) for _, progress in jobs] + [4])
+        lines = [f"{'JOBID':>10} {'NAME':<{width}} {'STATE':<10} PROGRESS"]
+        for job_id, progress in jobs:
+            lines.append(f"{job_id:>10} {progress.name:<{width}} {progress.status()}")
+        return "\n".join(lines)
+
+    def print(self) -> None:
+        print(f"{self.render()}\n")
+
+
+# one board for all jobs of the driver
+board = ProgressBoard()
@@ -1,9 +1,10 @@
 # from __future__ import annotations
 
+import json
 import os
 import subprocess
 import time
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Callable
 
 from SLURM.exceptions import ModuleDependencyConflict, ScriptNotFoundException, CommandExecutionException
 
@@ -72,6 +73,8 @@ class SlurmConfiguration:
                  mem_per_cpu: int,
                  number_of_tasks: int, number_of_cores_per_task: int,
                  cpu_frequency_str: Optional[str] = None,
+                 nodes: Optional[int] = None, number_of_tasks_per_node: Optional[int] = None,
+                 distribution: Optional[str] = None, hint: Optional[str] = None,
                  partition: Optional[str] = None, reservation: Optional[str] = None, account: Optional[str] = None,
                  job_array_start: Optional[int] = None, job_array_end: Optional[int] = None, job_array_step: int = 1,
                  exclusive: bool = False,
@@ -100,6 +103,11 @@ class SlurmConfiguration:
         :param cpu_frequency_str: Set this to ensure the processors run on equal speeds
         (disables all fancy overclocking, hyperboots, ... features), the --cpu-freq setting.
         Do not specify if you do not want a fixed cpu speed. Default: None.
+        :param nodes: Number of nodes, the -N or --nodes setting. Default: None (as many as the tasks need).
+        :param number_of_tasks_per_node: Tasks per node, the --ntasks-per-node setting. Default: None.
+        :param distribution: Placement of the tasks on the nodes and sockets, the -m or --distribution setting,
+        e.g. "block:cyclic". Default: None.
+        :param hint: Task binding hint, the --hint setting, e.g. "nomultithread" or "compute_bound". Default: None.
         :param partition: Partition for the job, -p or --partition setting. Default: None.
         :param reservation: Reservation for the job, the --reservation setting. Default: None.
         :param account: Allocation for the job, the -A option. Default: None.
@@ -124,6 +132,10 @@ class SlurmConfiguration:
         :param use_set_u: If the commands "set -u" should be added to your SLURM job file. Default: False.
         """
         self.job_id = None
+        # state of the job at the last squeue check
+        self.job_state = None
+        # why the job was cancelled, if it was
+        self.cancel_reason = None
         self.__slurm_script_file = slurm_script_file
         self.__job_name = job_name
         self.__std_out_path = std_out_path
@@ -133,6 +145,11 @@ class SlurmConfiguration:
         self.__number_of_tasks = number_of_tasks
         self.__number_of_cores_per_task = number_of_cores_per_task
         self.__cpu_frequency_str = cpu_frequency_str
+        self.__nodes = None
+        self.__number_of_tasks_per_node = None
+        self.__distribution = None
+        self.__hint = None
+        self.set_geometry(nodes, number_of_tasks_per_node, distribution, hint)
         self.__partition = partition
         self.__reservation = reservation
         self.__account = account
@@ -195,6 +212,34 @@ class SlurmConfiguration:
         self.__check_dirs_to_out = check_dirs_to_out
         self.__use_set_u = use_set_u
 
+    def set_target(self, partition: Optional[str] = None, reservation: Optional[str] = None,
+                   account: Optional[str] = None) -> None:
+        """
+        Sets where the job goes.
+        :param partition: Partition for the job, -p or --partition setting.
+        :param reservation: Reservation for the job, the --reservation setting.
+        :param account: Allocation for the job, the -A option.
+        :return: void.
+        """
+        self.__partition = partition
+        self.__reservation = reservation
+        self.__account = account
+
+    def set_geometry(self, nodes: Optional[int] = None, number_of_tasks_per_node: Optional[int] = None,
+                     distribution: Optional[str] = None, hint: Optional[str] = None) -> None:
+        """
+        Sets how the tasks are spread over the nodes.
+        :param nodes: Number of nodes, the -N or --nodes setting.
+        :param number_of_tasks_per_node: Tasks per node, the --ntasks-per-node setting.
+        :param distribution: Placement of the tasks, the -m or --distribution setting, e.g. "block:cyclic".
+        :param hint: Task binding hint, the --hint setting, e.g. "nomultithread".
+        :return: void.
+        """
+        self.__nodes = nodes
+        self.__number_of_tasks_per_node = number_of_tasks_per_node
+        self.__distribution = distribution
+        self.__hint = hint
+
     def set_job_array(self, start: Optional[int] = None, end: Optional[int] = None, step: int = 1) -> None:
         """
         Set job array settings. This will set the self.__job_array variable.
@@ -221,9 +266,14 @@ class SlurmConfiguration:
             "std_err_path": self.__std_err_path,
             "job_time_limit": self.__time_str,
             "mem_per_cpu": self.__mem_per_cpu,
-            "mpi_num_ranks": self.__number_of_cores_per_task,
+            # one task per MPI rank
+            "mpi_num_ranks": self.__number_of_tasks,
             "number_of_tasks": self.__number_of_tasks,
             "number_of_cores_per_task": self.__number_of_cores_per_task,
+            "nodes": self.__nodes,
+            "number_of_tasks_per_node": self.__number_of_tasks_per_node,
+            "distribution": self.__distribution,
+            "hint": self.__hint,
             "cpu_frequency_setting": self.__cpu_frequency_str,
         }
 
@@ -256,6 +306,27 @@ class SlurmConfiguration:
         """
         self.__commands.append(command)
 
+    def get_commands(self) -> List[str]:
+        """
+        The commands of the job, e.g. to run them as job step in another job.
+        """
+        return list(self.__commands)
+
+    def get_module_commands(self) -> List[str]:
+        """
+        The module purge and load commands of the job, in the order they are written to the script. Empty, if the
+        module system is not in use.
+        """
+        if not self.__uses_module_system:
+            return []
+        commands = ["module purge"] if self.__purge_modules_at_start else []
+        for module in self.__modules:
+            if module.version:
+                commands.append(f"module load {module.name}/{module.version}")
+            else:
+                commands.append(f"module load {module.name}")
+        return commands
+
     def clear_commands(self) -> None:
         """
         Clears commands.
@@ -401,21 +472,24 @@ class SlurmConfiguration:
 
                 f.write("\n### Compute settings:\n")
                 f.write(f"#SBATCH --mem-per-cpu={self.__mem_per_cpu}\n")
-                f.write(f"#SBATCH --ntasks={self.__number_of_cores_per_task}\n")
-                f.write(f"#SBATCH --cpus-per-task={self.__number_of_tasks}\n")
+                f.write(f"#SBATCH --ntasks={self.__number_of_tasks}\n")
+                f.write(f"#SBATCH --cpus-per-task={self.__number_of_cores_per_task}\n")
+                if self.__nodes:
+                    f.write(f"#SBATCH --nodes={self.__nodes}\n")
+                if self.__number_of_tasks_per_node:
+                    f.write(f"#SBATCH --ntasks-per-node={self.__number_of_tasks_per_node}\n")
+                if self.__distribution:
+                    f.write(f"#SBATCH --distribution={self.__distribution}\n")
+                if self.__hint:
+                    f.write(f"#SBATCH --hint={self.__hint}\n")
                 if self.__exclusive:
                     f.write("#SBATCH --exclusive\n")
                 f.write(f"#SBATCH --cpu-freq={self.__cpu_frequency_str}\n")
 
                 f.write("\n### MODULE SYSTEM ###\n")
                 if self.__uses_module_system:
-                    if self.__purge_modules_at_start:
-                        f.write("module purge\n")
-                    for module in self.__modules:
-                        if module.version:
-                            f.write(f"module load {module.name}/{module.version}\n")
-                        else:
-                            f.write(f"module load {module.name}\n")
+                    for command in self.get_module_commands():
+                        f.write(f"{command}\n")
                     f.write("\n")
                 else:
                     f.write("### Module System not in use.\n")
@@ -484,6 +558,8 @@ class SlurmConfiguration:
         sq = sq.stdout.decode("utf-8")
         for line in sq.splitlines():
             job_id_squeue, state, time_elapsed = line.split(" ")
+            if str(job_id) == job_id_squeue:
+                self.job_state = state
             # Lichtenbergs SLURM outputs something like "COMPLETI", not COMPLETED:
             if str(job_id) == job_id_squeue and "COMP" in state:
                 print(f"Your Job {job_id_squeue} is COMPLETED (Time spent: {time_elapsed} min, total: {waited_time} sec).")
@@ -497,14 +573,45 @@ class SlurmConfiguration:
         print(f"SUMMARY: Your Job {job_id} has finished running, total time for {waited_time} seconds.\n")
         return True
 
-    def wait(self, job_id):
+    def cancel_file(self, job_id) -> str:
+        """
+        Path of the file with the reason, why the job was cancelled. Next to the std out file, so it is moved and
+        analyzed with it.
+        """
+        return f"{os.path.splitext(self.__std_out_path)[0]}.cancel.{job_id}"
+
+    def scancel(self, job_id, reason: dict) -> None:
+        """
+        Cancels the job via "scancel", and records the reason in the cancel file.
+        :param reason: Why, e.g. {"reason": "stall", "message": "No output for 900 seconds."}
+        :return: void.
+        """
+        print(f"Cancelling job {job_id}: {reason.get('message', reason.get('reason'))}")
+        res = subprocess.run(["scancel", str(job_id)])
+        if res.returncode != 0:
+            raise CommandExecutionException(f"scancel {job_id}")
+        self.cancel_reason = dict(reason, job_id=str(job_id), state=self.job_state, cancelled_at=time.time())
+        with open(self.cancel_file(job_id), "w") as f:
+            json.dump(self.cancel_reason, f, indent=4)
+
+    def wait(self, job_id, hooks: Optional[List[Callable[[int, str, int], Optional[dict]]]] = None):
         """
         Wait for the SLURM job to finish execution.
+        :param hooks: Called on every squeue check with job id, job state and waited seconds, e.g. a
+        SLURM.watchdog.Watchdog. If a hook returns a reason, the job is cancelled and the reason recorded.
         :return: It will return the paths to the result files of the job.
         """
         self.job_id = job_id
+        hooks = list(hooks) if hooks else []
         waited = 0
         while not self.__check_squeue(job_id, waited):
+            for hook in hooks:
+                reason = hook(job_id, self.job_state, waited)
+                if reason:
+                    self.scancel(job_id, reason)
+                    # wait for the job to end, its files are still written
+                    hooks = []
+                    break
             time.sleep(SQUEUE_CHECK_INTERVAL)
             waited += SQUEUE_CHECK_INTERVAL
         return int(self.job_id), f"{self.__std_out_path}.{job_id}", f"{self.__std_err_path}.{job_id}"
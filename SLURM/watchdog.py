@@ -0,0 +1,91 @@
+"""
+Early-abort watchdog for running jobs. It tails the out and err files of a job while it runs and cancels the job,
+if the app crashed, stopped writing output, or its timesteps are far slower than the baseline of earlier runs of
+the same configuration. The allocation goes back to the queue instead of idling until the time limit.
+"""
+import re
+import time
+from typing import List, Optional
+
+from SLURM.progress import FileTail, JobProgress
+
+# lines, after which the app does not do anything useful anymore
+crash_signatures = [
+    re.compile(r"Segmentation fault|SIGSEGV|signal 11\b"),
+    re.compile(r"Bus error|SIGBUS|Floating point exception|SIGFPE"),
+    re.compile(r"MPI_ABORT was invoked|BAD TERMINATION|exited on signal"),
+    re.compile(r"\[\d+\]PETSC ERROR"),
+    re.compile(r"terminate called after throwing|ISSM Error|Aborted \(core dumped\)"),
+    re.compile(r"oom-kill|Out of memory|out of memory", re.IGNORECASE),
+]
+
+
+class Watchdog:
+    """
+    Hook for SlurmConfiguration.wait: called on every squeue check, returns the reason to cancel the job, or None.
+    """
+
+    def __init__(self, out_path: str, err_path: str, baseline: Optional[dict] = None, stall_seconds: int = 900,
+                 slowdown_factor: float = 3.0, min_steps: int = 3, signatures: List[re.Pattern] = None,
+                 clock=time.time):
+        """
+        Constructor.
+        :param out_path: The std out file of the job (with job id).
+        :param err_path: The std err file of the job (with job id).
+        :param baseline: The baseline of the configuration, as from Management.history.History.baseline.
+        Without baseline (or seconds_per_step), the speed is not checked.
+        :param stall_seconds: Cancel, if neither out nor err grew for this many seconds while running. Default: 900.
+        :param slowdown_factor: Cancel, if the seconds per timestep are more than this factor over the baseline.
+        Default: 3.0.
+        :param min_steps: Timesteps to see, before the speed is judged. Default: 3.
+        :param signatures: Regular expressions for crashes. Default: crash_signatures.
+        :param clock: Time source, seconds.
+        """
+        self.progress = JobProgress(out_path, clock=clock)
+        self.err_tail = FileTail(err_path)
+        self.baseline = baseline
+        self.stall_seconds = stall_seconds
+        self.slowdown_factor = slowdown_factor
+        self.min_steps = min_steps
+        self.signatures = signatures if signatures is not None else crash_signatures
+        self.clock = clock
+        self.last_progress = None
+        self.reason = None
+
+    def _crash(self, lines: List[str], file: str) -> Optional[dict]:
+        for line in lines:
+            for signature in self.signatures:
+                if signature.search(line):
+                    return {"reason": "crash", "message": f"Crash signature in {file}: {line.strip()}",
+                            "line": line.strip()}
+        return None
+
+    def check(self, job_id, state: str, waited: int) -> Optional[dict]:
+        """
+        :return: {"reason": "crash"/"stall"/"slow", "message": ...} to cancel the job, None to let it run.
+        """
+        if state is None or not (state == "R" or "RUN" in state):
+            # pending, configuring or completing: nothing to judge (squeue prints "R" or "RUNNING")
+            return None
+        now = self.clock()
+        if self.last_progress is None:
+            self.last_progress = now
+        out_lines, err_lines = self.progress.update(), self.err_tail.read_lines()
+        if out_lines or err_lines:
+            self.last_progress = now
+        reason = self._crash(err_lines, "err") or self._crash(out_lines, "out")
+        if reason is None and now - self.last_progress > self.stall_seconds:
+            reason = {"reason": "stall", "message": f"No output for {now - self.last_progress:.0f} seconds "
+                                                    f"(limit {self.stall_seconds})."}
+        per_step = self.progress.seconds_per_step(self.min_steps)
+        expected = self.baseline.get("seconds_per_step") if self.baseline else None
+        if reason is None and per_step and expected and per_step > self.slowdown_factor * expected:
+            reason = {"reason": "slow", "message": f"{per_step:.2f} s per timestep, baseline {expected:.2f} s "
+                                                   f"(limit {self.slowdown_factor}x).",
+                      "seconds_per_step": per_step, "baseline": self.baseline}
+        if reason is not None:
+            reason.update({"steps": self.progress.steps, "waited": waited})
+            self.reason = reason
+        return reason
+
+    __call__ = check